@@ -0,0 +1,176 @@
+'''asyncio client for the Google Reader API'''
+
+import asyncio
+from collections import OrderedDict
+
+from asyncrestclient import asyncRestClient
+from googlereader import GoogleReaderClient
+from fanout import FetchResult, FetchTimeout
+from restclient import RestError
+
+
+class AsyncGoogleReaderClient(GoogleReaderClient, asyncRestClient):
+    '''
+    Google Reader client for use from an asyncio event loop. It has the same
+    methods as GoogleReaderClient, sharing all of its url and parameter
+    building, but every method returns an awaitable. Login is not performed
+    on construction, await login() first:
+
+        client = AsyncGoogleReaderClient(cfg)
+        await client.login()
+        counts = await client.get_unread_count()
+    '''
+    def __init__(self, config):
+        if 'write_behind' in config:
+            raise ValueError('write_behind is not supported by the asyncio client')
+        GoogleReaderClient.__init__(self, dict(config, defer_login=True, lazy_login=False))
+
+    async def close(self):
+        '''Closes the aiohttp session if this client created it'''
+        await asyncRestClient.close(self)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def iter_items(self, state=None, label=None, feed_id=None, page_size=100,
+        limit=None, order='n', exclude_state=None, prefetch=False, use_atom=False):
+        '''Asynchronous generator counterpart of GoogleReaderClient.iter_items'''
+        def fetch(continuation, num):
+            return self._fetch_page(state, label, feed_id, num, order,
+                exclude_state, continuation, use_atom=use_atom)
+
+        count = 0
+        page = await fetch(None, page_size if limit is None else min(page_size, limit))
+        while True:
+            if not isinstance(page, dict):
+                raise RestError(page)
+            continuation = page.get('continuation')
+            items = page['items']
+            page = None
+            num = page_size if limit is None else min(page_size, limit - count - len(items))
+            pending = None
+            if continuation is not None and num > 0:
+                pending = fetch(continuation, num)
+                if prefetch:
+                    pending = asyncio.ensure_future(pending)
+            try:
+                for item in items:
+                    if limit is not None and count >= limit:
+                        return
+                    count += 1
+                    yield item
+                items = None
+                if pending is None:
+                    return
+                page = await pending
+                pending = None
+            finally:
+                if asyncio.isfuture(pending):
+                    pending.cancel()
+                elif pending is not None:
+                    pending.close()
+
+    async def fetch_all_feeds(self, num=20, concurrency=8, timeout=None, cancel=None, feed_ids=None):
+        '''
+        Asynchronous generator counterpart of GoogleReaderClient.fetch_all_feeds.
+        cancel is an asyncio.Event
+        '''
+        if feed_ids is None:
+            subscriptions = await self.get_subscription_list()
+            feed_ids = [s['id'] for s in subscriptions['subscriptions']]
+        semaphore = asyncio.Semaphore(concurrency)
+        loop = asyncio.get_event_loop()
+
+        async def fetch(feed_id):
+            async with semaphore:
+                if cancel is not None and cancel.is_set():
+                    return None
+                start = loop.time()
+                try:
+                    contents = await asyncio.wait_for(self.get_feed_contents(feed_id, num), timeout)
+                    if not isinstance(contents, dict):
+                        raise RestError(contents)
+                    return FetchResult(feed_id, contents, None, loop.time() - start)
+                except asyncio.TimeoutError:
+                    return FetchResult(feed_id, None, FetchTimeout(feed_id), loop.time() - start)
+                except Exception as e:
+                    return FetchResult(feed_id, None, e, loop.time() - start)
+
+        tasks = [asyncio.ensure_future(fetch(feed_id)) for feed_id in dict.fromkeys(feed_ids)]
+        try:
+            for task in asyncio.as_completed(tasks):
+                result = await task
+                if result is not None:
+                    yield result
+                if cancel is not None and cancel.is_set():
+                    return
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _apply_edits(self, edits, concurrency=8, timeout=None, cancel=None):
+        '''
+        Coroutine counterpart of GoogleReaderClient._apply_edits, used by
+        import_OPML and reconcile. cancel is an asyncio.Event
+        '''
+        semaphore = asyncio.Semaphore(concurrency)
+        loop = asyncio.get_event_loop()
+
+        async def apply(key):
+            edit = edits[key]
+            async with semaphore:
+                if cancel is not None and cancel.is_set():
+                    return None
+                start = loop.time()
+                try:
+                    response = await asyncio.wait_for(self.edit_subscription(edit.feed_id, edit.title,
+                        edit.add_labels, edit.remove_labels, edit.action), timeout)
+                    return FetchResult(key, self._check_edit(response), None, loop.time() - start)
+                except asyncio.TimeoutError:
+                    return FetchResult(key, None, FetchTimeout(key), loop.time() - start)
+                except Exception as e:
+                    return FetchResult(key, None, e, loop.time() - start)
+
+        results = await asyncio.gather(*[apply(key) for key in edits])
+        return OrderedDict(zip(edits, results))
+
+    async def search(self, query, scope='all', target=None, num=20, chunk_size=20, concurrency=4):
+        '''Asynchronous generator counterpart of GoogleReaderClient.search'''
+        response = await self._search_ids(query, scope, target, num)
+        if not isinstance(response, dict):
+            raise RestError(response)
+        ids = [str(r['id']) for r in response['results']]
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def hydrate(chunk):
+            async with semaphore:
+                return await self._hydrate(chunk)
+
+        tasks = [asyncio.ensure_future(hydrate(tuple(ids[i:i + chunk_size])))
+            for i in range(0, len(ids), chunk_size)]
+        try:
+            for task in asyncio.as_completed(tasks):
+                for item in await task:
+                    yield item
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def search_local(self, query, scope='all', target=None, num=20, fallback=True):
+        '''Coroutine counterpart of GoogleReaderClient.search_local'''
+        index = self.get_search_index()
+        if index is not None:
+            items = index.search(query, scope, target, num)
+            if items or not fallback:
+                return items
+        elif not fallback:
+            raise ValueError('search_local needs the search_index config key or fallback')
+        items = []
+        async for item in self.search(query, scope, target, num):
+            items.append(item)
+            if len(items) == num:
+                break
+        return items
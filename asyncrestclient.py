@@ -0,0 +1,205 @@
+'''asyncio based counterpart of restClient. Requires Python 3.5+ and aiohttp'''
+
+import asyncio
+import inspect
+from time import time
+import aiohttp
+
+from instrumentation import RequestEvent, endpoint_name
+from restclient import restClient
+
+
+class asyncResponse(object):
+    '''Fully read aiohttp response exposing the attributes restClient uses'''
+    def __init__(self, status, headers, body):
+        self.status_int = status
+        self.headers = dict((k.lower(), v) for k, v in headers.items())
+        self.body = body
+
+
+class asyncRestClient(restClient):
+    """Client object for making requests from an asyncio event loop."""
+    def __init__(self, config):
+        '''
+        Sets up config. An aiohttp session can be shared between clients via
+        the 'session' key. 'max_in_flight' bounds concurrent requests and is
+        either a number or an asyncio.Semaphore shared between clients.
+        'cache', 'json_decoder', 'xml_parser' and 'hooks' are as for
+        restClient; events have no connection phases. Rate limiting, retries
+        and coalescing are configured as for restClient, see _setup_limits
+        '''
+        self._config = config
+        self._pool = None
+        self._setup_responses(config)
+        self._session = config['session'] if 'session' in config else None
+        self.__owns_session = self._session is None
+        max_in_flight = config['max_in_flight'] if 'max_in_flight' in config else 100
+        self.__max_in_flight = max_in_flight
+        self.__semaphore = None if isinstance(max_in_flight, int) else max_in_flight
+        self._setup_limits(config)
+        # futures of the GETs in flight when coalescing, by request
+        self.__in_flight = {} if self._coalescer is not None else None
+        # futures of the calls shared through _share, by key
+        self.__shared = {}
+
+    async def request(self, method, uri, headers={}, body=None, deserialize=True, stream=False, **params):
+        '''Wrapper method around aiohttp client. Deserializes response'''
+        if stream:
+            raise ValueError('Streamed responses are not supported by the asyncio client')
+        if self.__in_flight is None or method != 'GET':
+            return await self.__request(method, uri, headers, body, deserialize, params)
+        key = self._coalesce_key(uri, deserialize, headers, params)
+        pending = self.__in_flight.get(key)
+        if pending is None:
+            pending = asyncio.ensure_future(self.__request(method, uri, headers, body, deserialize, params))
+            self.__in_flight[key] = pending
+            pending.add_done_callback(lambda f: self.__in_flight.pop(key, None))
+        # a cancelled caller must not cancel the request shared with others
+        return await asyncio.shield(pending)
+
+    async def __request(self, method, uri, headers, body, deserialize, params):
+        '''Sends a request, reporting it to the hooks'''
+        if self._session is None:
+            self._session = aiohttp.ClientSession()
+        if self.__semaphore is None:
+            self.__semaphore = asyncio.Semaphore(self.__max_in_flight)
+        event = RequestEvent(method, endpoint_name(uri)) if self._hooks else None
+        start = time()
+        try:
+            response, ttfb = await self.__fetch(method, uri, headers, body, params)
+        except Exception as e:
+            if event is not None:
+                event.error = e
+                event.total = time() - start
+                self._emit(event)
+            raise
+        if event is None:
+            return self._deserialize_response(response) if deserialize is True else response
+        received = time()
+        self._measure(event, response, body)
+        event.ttfb = ttfb
+        result = self._deserialize_response(response) if deserialize is True else response
+        event.deserialize = time() - received
+        event.total = time() - start
+        self._emit(event)
+        return result
+
+    async def __fetch(self, method, uri, headers, body, params):
+        '''
+        Sends a request, through the cache if it has a ttl. Returns the
+        response and its ttfb, 0 when answered from the cache
+        '''
+        ttl = self._cache.ttl_for(uri) if self._cache is not None and method == 'GET' else None
+        if ttl is None:
+            return await self.__transport(method, uri, headers, body, params)
+        # a cache buster would give every request a new key
+        params.pop('ck', None)
+        key = self._cache.key(uri, params, headers)
+        entry, fresh = self._cache.get(key)
+        ttfb = 0.0
+        if not fresh:
+            if entry is not None:
+                headers = dict(headers)
+                headers.update(self._cache.validators(entry))
+            response, ttfb = await self.__transport('GET', uri, headers, None, params)
+            if response.status_int == 304 and entry is not None:
+                entry = self._cache.revalidated(key, ttl, entry)
+            elif response.status_int == 200:
+                entry = self._cache.store(key, ttl, 200, response.headers, response.body)
+            else:
+                return response, ttfb
+        return asyncResponse(entry['status'], entry['headers'], entry['body']), ttfb
+
+    async def __transport(self, method, uri, headers, body, params):
+        '''
+        Sends a request once the rate limits allow it, retrying GETs
+        according to the retry policy. Returns the response and its ttfb
+        '''
+        retry = self._retry if method == 'GET' else None
+        attempt = 0
+        while True:
+            wait = self._throttle_delay(uri)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            try:
+                response, ttfb = await self.__send(method, uri, headers, body, params)
+            except Exception as e:
+                if retry is None or not retry.should_retry(attempt, error=e,
+                        errors=(EnvironmentError, aiohttp.ClientError)):
+                    raise
+                await asyncio.sleep(retry.delay(attempt))
+            else:
+                if retry is None or not retry.should_retry(attempt, response):
+                    return response, ttfb
+                await asyncio.sleep(retry.delay(attempt, response))
+            attempt += 1
+
+    async def __send(self, method, uri, headers, body, params):
+        '''Sends one request over the aiohttp session'''
+        async with self.__semaphore:
+            start = time()
+            if method == 'GET':
+                pending = self._session.request(
+                    method,
+                    uri,
+                    headers=headers,
+                    params=dict((k, str(v)) for k, v in params.items()))
+            elif method == 'POST':
+                pending = self._session.request(
+                    method,
+                    uri,
+                    headers=headers,
+                    data=body)
+            async with pending as r:
+                ttfb = time() - start
+                return asyncResponse(r.status, r.headers, await r.text()), ttfb
+
+    async def close(self):
+        '''Closes the aiohttp session if this client created it'''
+        if self._session is not None and self.__owns_session:
+            await self._session.close()
+            self._session = None
+
+    def _then(self, result, callback):
+        '''Chains callback onto a pending result'''
+        async def chain():
+            value = await result if inspect.isawaitable(result) else result
+            value = callback(value)
+            if inspect.isawaitable(value):
+                value = await value
+            return value
+        return chain()
+
+    def _gather(self, results):
+        '''Runs several pending requests concurrently'''
+        async def gather():
+            return list(await asyncio.gather(*results))
+        return gather()
+
+    def _share(self, key, func):
+        '''
+        Awaits func(), or while one for key is pending joins it. The call is
+        started when the result is first awaited
+        '''
+        async def call():
+            result = func()
+            return await result if inspect.isawaitable(result) else result
+        async def join():
+            pending = self.__shared.get(key)
+            if pending is None:
+                pending = self.__shared[key] = asyncio.ensure_future(call())
+                pending.add_done_callback(lambda f: self.__shared.pop(key, None))
+            # a cancelled caller must not cancel the call shared with others
+            return await asyncio.shield(pending)
+        return join()
+
+    def _spawn(self, target):
+        '''Schedules target on the running event loop, ignoring any failure'''
+        async def run():
+            try:
+                result = target()
+                if inspect.isawaitable(result):
+                    await result
+            except Exception:
+                pass
+        asyncio.ensure_future(run())
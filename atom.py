@@ -0,0 +1,144 @@
+'''Incremental parsing of Google Reader atom feeds'''
+
+import calendar
+import re
+import time
+
+ATOM_NS = '{http://www.w3.org/2005/Atom}'
+READER_NS = '{http://www.google.com/schemas/reader/atom/}'
+
+_ATOM_ROOT = re.compile(r'<(\w+:)?feed[\s>]')
+
+
+def is_atom(head):
+    '''Checks if the start of an xml body is an atom feed'''
+    if not isinstance(head, type(u'')):
+        head = head.decode('utf-8', 'ignore')
+    return _ATOM_ROOT.search(head[:2048]) is not None
+
+
+def parse_timestamp(value):
+    '''Converts an atom date into seconds since the epoch'''
+    return calendar.timegm(time.strptime(value[:19], '%Y-%m-%dT%H:%M:%S'))
+
+
+class _ChunkReader(object):
+    '''File-like object reading from an iterable of chunks'''
+    def __init__(self, chunks):
+        self.__chunks = iter(chunks)
+        self.__buffer = b''
+
+    def read(self, size=-1):
+        while size < 0 or len(self.__buffer) < size:
+            try:
+                chunk = next(self.__chunks)
+            except StopIteration:
+                break
+            self.__buffer += chunk.encode('utf-8') if isinstance(chunk, type(u'')) else chunk
+        if size < 0:
+            size = len(self.__buffer)
+        data, self.__buffer = self.__buffer[:size], self.__buffer[size:]
+        return data
+
+
+class AtomItemStream(object):
+    '''
+    Iterates the entries of an atom feed as dicts shaped like the items of
+    json stream/contents responses. The document is parsed with iterparse
+    and each entry is freed once converted so memory use does not grow with
+    the size of the feed. Feed level fields, eg 'continuation', are
+    available from the fields attribute once iteration has finished.
+    '''
+    def __init__(self, chunks, close=None):
+        '''chunks is an iterable of str or utf-8 bytes pieces of the body'''
+        self.fields = {}
+        self.__close = close
+        self.__items = self.__parse(_ChunkReader(chunks))
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self.__items)
+    next = __next__
+
+    def close(self):
+        '''Stops parsing and releases the underlying connection'''
+        self.__items.close()
+        if self.__close is not None:
+            self.__close()
+            self.__close = None
+
+    def __parse(self, source):
+        '''Generator yielding an item at the end of each entry element'''
+        # imported on first use as most responses are json
+        try:
+            import xml.etree.cElementTree as ElementTree
+        except ImportError:
+            import xml.etree.ElementTree as ElementTree
+        root = None
+        depth = 0
+        for event, element in ElementTree.iterparse(source, events=('start', 'end')):
+            if event == 'start':
+                if root is None:
+                    root = element
+                depth += 1
+                continue
+            depth -= 1
+            if depth != 1:
+                continue
+            if element.tag == ATOM_NS + 'entry':
+                yield self.__item(element)
+            else:
+                self.__field(element)
+            # drop parsed children of the feed element
+            root.clear()
+        if self.__close is not None:
+            self.__close()
+            self.__close = None
+
+    def __field(self, element):
+        '''Stores a feed level element'''
+        if element.tag == READER_NS + 'continuation':
+            self.fields['continuation'] = element.text
+        elif element.tag == ATOM_NS + 'id':
+            self.fields['id'] = element.text
+        elif element.tag == ATOM_NS + 'title':
+            self.fields['title'] = element.text
+        elif element.tag == ATOM_NS + 'updated':
+            self.fields['updated'] = parse_timestamp(element.text)
+
+    def __item(self, entry):
+        '''Converts an entry element into a json shaped item'''
+        item = {
+            'id': entry.findtext(ATOM_NS + 'id'),
+            'categories': [c.get('term') for c in entry.findall(ATOM_NS + 'category')],
+            'title': entry.findtext(ATOM_NS + 'title', ''),
+            'alternate': self.__links(entry)}
+        crawl_time = entry.get(READER_NS + 'crawl-timestamp-msec')
+        if crawl_time is not None:
+            item['crawlTimeMsec'] = crawl_time
+        for name in ('published', 'updated'):
+            value = entry.findtext(ATOM_NS + name)
+            if value:
+                item[name] = parse_timestamp(value)
+        for name in ('summary', 'content'):
+            element = entry.find(ATOM_NS + name)
+            if element is not None:
+                item[name] = {'direction': 'ltr', 'content': element.text or ''}
+        author = entry.findtext(ATOM_NS + 'author/' + ATOM_NS + 'name')
+        if author is not None:
+            item['author'] = author
+        source = entry.find(ATOM_NS + 'source')
+        if source is not None:
+            links = self.__links(source)
+            item['origin'] = {
+                'streamId': source.get(READER_NS + 'stream-id'),
+                'title': source.findtext(ATOM_NS + 'title', ''),
+                'htmlUrl': links[0]['href'] if links else ''}
+        return item
+
+    def __links(self, element):
+        '''Returns the alternate links of an element'''
+        return [{'href': l.get('href'), 'type': l.get('type', 'text/html')}
+            for l in element.findall(ATOM_NS + 'link') if l.get('rel', 'alternate') == 'alternate']
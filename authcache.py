@@ -0,0 +1,99 @@
+'''Encrypted on-disk cache of login sessions. Requires cryptography'''
+
+import binascii
+import hashlib
+import hmac
+import json
+import os
+from time import time
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+except ImportError:
+    Fernet = None
+
+
+def generate_key():
+    '''Returns a new key for AuthCache, to be kept outside the cache directory'''
+    if Fernet is None:
+        raise ImportError('AuthCache requires the cryptography package')
+    return Fernet.generate_key()
+
+
+def _verifier(password, salt):
+    '''Returns a salted, slow hash of password for checking it later'''
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, 20000)
+    return binascii.hexlify(digest).decode('ascii')
+
+
+class AuthCache(object):
+    '''
+    Keeps the SID cookie and user id of logged in accounts in a directory,
+    one file per account named by a hash of the username and encrypted with
+    key (see generate_key), so workers can skip ClientLogin on start. Entries
+    expire ttl seconds after login; SIDs last around two weeks. When stored
+    with the password a salted hash of it is kept, and the session is only
+    returned to callers giving the same password. Pass it to clients as the
+    'auth_cache' config key
+    '''
+    def __init__(self, path, key, ttl=14 * 24 * 3600, clock=time):
+        if Fernet is None:
+            raise ImportError('AuthCache requires the cryptography package')
+        self.__path = path
+        self.__fernet = Fernet(key)
+        self.__ttl = ttl
+        self.__clock = clock
+        if not os.path.isdir(path):
+            os.makedirs(path, 0o700)
+
+    def get(self, username, password=None):
+        '''
+        Returns the cached auth of username, or None if missing, expired or,
+        when password is given, stored for another or no password
+        '''
+        filename = self.__filename(username)
+        try:
+            with open(filename, 'rb') as f:
+                entry = json.loads(self.__fernet.decrypt(f.read()).decode('utf-8'))
+        except (IOError, OSError):
+            return None
+        except (InvalidToken, ValueError):
+            # written with another key or corrupt
+            self.delete(username)
+            return None
+        if entry['username'] != username or entry['expires'] <= self.__clock():
+            return None
+        if password is not None:
+            if 'verifier' not in entry or not hmac.compare_digest(entry['verifier'],
+                    _verifier(password, binascii.unhexlify(entry['salt']))):
+                return None
+        return {'sid': entry['sid'], 'user_id': entry['user_id']}
+
+    def set(self, username, auth, password=None):
+        '''
+        Stores the auth returned by GoogleReaderClient.get_auth for username,
+        with a hash of the password it was logged in with if given
+        '''
+        entry = {
+            'username': username,
+            'sid': auth['sid'],
+            'user_id': auth['user_id'],
+            'expires': self.__clock() + self.__ttl}
+        if password is not None:
+            salt = os.urandom(16)
+            entry['salt'] = binascii.hexlify(salt).decode('ascii')
+            entry['verifier'] = _verifier(password, salt)
+        data = self.__fernet.encrypt(json.dumps(entry).encode('utf-8'))
+        filename = self.__filename(username)
+        fd = os.open(filename + '.tmp', os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.rename(filename + '.tmp', filename)
+
+    def delete(self, username):
+        try:
+            os.remove(self.__filename(username))
+        except OSError:
+            pass
+
+    def __filename(self, username):
+        return os.path.join(self.__path, hashlib.sha256(username.encode('utf-8')).hexdigest())
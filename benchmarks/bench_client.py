@@ -0,0 +1,131 @@
+'''
+Drives GoogleReaderClient and GoogleFeedReader through the local fake
+server and reports throughput, p50/p99 latency and peak memory per
+operation
+
+    python benchmarks/bench_client.py [--latency ms] [--iterations n]
+        [--items n] [--summary-bytes n] [--restkit]
+        [--save results.json] [--compare baseline.json]
+
+Operations are timed without tracing first, then run again a few times
+under tracemalloc for their peak memory. With --compare, operations more
+than 20% slower at p50 or heavier at peak than the baseline are listed
+and the exit status is 1.
+'''
+
+import argparse
+import json
+import os
+import sys
+import tracemalloc
+from time import time
+
+sys.path.insert(0, os.path.join(os.path.realpath(os.path.dirname(__file__)), '..'))
+
+from fakeserver import FakeReaderServer
+from googlereader import GoogleReaderClient, GoogleFeedReader
+
+REGRESSION = 1.2
+
+
+def operations(client):
+    '''Returns the (name, callable) operations to measure'''
+    item_ids = ['tag:google.com,2005:reader/item/%016x' % i for i in range(500)]
+    return [
+        ('login', client.login),
+        ('unread_count', client.get_unread_count),
+        ('subscription_list', client.get_subscription_list),
+        ('feed_contents_20', lambda: client.get_feed_contents('feed/http://feeds0.example.com/rss', 20)),
+        ('reading_list_1000', lambda: client.get_unread_items(1000)),
+        ('iter_items_1000', lambda: sum(1 for i in client.iter_items(page_size=100, limit=1000))),
+        ('iter_items_1000_stream', lambda: sum(1 for i in client.iter_items(page_size=100, limit=1000, stream=True))),
+        ('mark_as_read_500', lambda: client.mark_as_read_bulk(item_ids)),
+        ('search_100', lambda: list(client.search('lorem', num=100))),
+        ('feed_reader_unread_100', lambda: GoogleFeedReader(client).get_unread_items(100)),
+    ]
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def measure(func, iterations, memory_iterations=3):
+    '''Returns throughput, p50 and p99 latency and peak traced memory of func'''
+    func()
+    latencies = []
+    start = time()
+    for i in range(iterations):
+        begin = time()
+        func()
+        latencies.append(time() - begin)
+    elapsed = time() - start
+    peak = 0
+    for i in range(memory_iterations):
+        tracemalloc.start()
+        func()
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return {
+        'ops_per_sec': iterations / elapsed,
+        'p50_ms': percentile(latencies, 0.5) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'peak_kb': peak / 1024.0}
+
+
+def compare(results, baseline):
+    '''Returns descriptions of the regressions against baseline'''
+    regressions = []
+    for name, result in sorted(results.items()):
+        if name not in baseline:
+            continue
+        for key in ('p50_ms', 'peak_kb'):
+            if result[key] > baseline[name][key] * REGRESSION:
+                regressions.append('%s %s %.1f -> %.1f' % (name, key, baseline[name][key], result[key]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--latency', type=float, default=0.0, help='server latency in ms')
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--items', type=int, default=2000, help='items in the fake reading list')
+    parser.add_argument('--summary-bytes', type=int, default=2000)
+    parser.add_argument('--restkit', action='store_true', help='use the restkit transport instead of the pool')
+    parser.add_argument('--save', help='write the results as json')
+    parser.add_argument('--compare', help='json results to compare against')
+    args = parser.parse_args()
+
+    server = FakeReaderServer(latency=args.latency / 1000, total_items=args.items,
+        summary_bytes=args.summary_bytes).start()
+    config = {
+        'username': 'bench',
+        'password': 'bench',
+        'client_id': 'bench',
+        'base_url': server.url}
+    if not args.restkit:
+        config['pool'] = {}
+    client = GoogleReaderClient(config)
+
+    results = {}
+    print('%-24s %10s %10s %10s %10s' % ('operation', 'ops/s', 'p50 ms', 'p99 ms', 'peak KB'))
+    for name, func in operations(client):
+        results[name] = measure(func, args.iterations)
+        print('%-24s %10.1f %10.2f %10.2f %10.1f' % (name, results[name]['ops_per_sec'],
+            results[name]['p50_ms'], results[name]['p99_ms'], results[name]['peak_kb']))
+    server.stop()
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f))
+        for regression in regressions:
+            print('REGRESSION %s' % regression)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
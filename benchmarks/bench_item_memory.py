@@ -0,0 +1,53 @@
+'''
+Compares the memory held by GoogleFeedReader items in the slotted
+GoogleReaderFeedItem model against the previous per-item dict model
+
+    python benchmarks/bench_item_memory.py [num_items] [summary_bytes]
+'''
+
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.realpath(os.path.dirname(__file__)), '..'))
+
+import fixtures
+from googlereader import GoogleReaderFeedItem
+
+
+class DictFeedItem(object):
+    '''The previous item model, copying fields into a per-item dict'''
+    def __init__(self, item, g):
+        self.__client = g
+        self.data = {}
+        for p in ['updated', 'author', 'title', 'alternate', 'comments', 'summary', 'crawlTimeMsec', 'annotations', 'published', 'id', 'categories', 'likingUsers']:
+            if p in item:
+                self.data[p] = item[p]
+
+
+def measure(model, num_items, summary_bytes):
+    '''Returns the bytes retained by num_items items once responses are dropped'''
+    tracemalloc.start()
+    items = {}
+    for start in range(0, num_items, 1000):
+        page = fixtures.stream_contents(min(1000, num_items - start), summary_bytes, start, num_feeds=200)
+        for item in page['items']:
+            items[item['id']] = model(item, None)
+        page = None
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return retained
+
+
+def main(num_items=20000, summary_bytes=2000):
+    print('%d items, %d byte summaries' % (num_items, summary_bytes))
+    results = {}
+    for model in (DictFeedItem, GoogleReaderFeedItem):
+        results[model] = measure(model, num_items, summary_bytes)
+        print('%-22s %10.1f MB %8d bytes/item' % (
+            model.__name__, results[model] / 1e6, results[model] // num_items))
+    print('ratio %.2f' % (float(results[DictFeedItem]) / results[GoogleReaderFeedItem]))
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,40 @@
+'''
+Compares the installed json decoders on Google Reader payloads
+
+    python benchmarks/bench_json.py [recorded_response.json ...]
+
+Recorded response bodies can be passed as arguments; otherwise payloads
+generated by fixtures.py are used.
+'''
+
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.realpath(os.path.dirname(__file__)), '..'))
+
+import fixtures
+from jsonbackend import available_decoders, benchmark
+
+
+def main(paths):
+    if paths:
+        payloads = [open(p).read() for p in paths]
+    else:
+        payloads = [
+            json.dumps(fixtures.stream_contents(20)),
+            json.dumps(fixtures.stream_contents(1000)),
+            json.dumps(fixtures.unread_count(2000)),
+            json.dumps(fixtures.subscription_list(2000))]
+    size = sum(len(p) for p in payloads)
+    timings = benchmark(payloads, available_decoders(), repeat=10)
+    fastest = min(timings.values())
+    print('%d payloads, %.1f MB' % (len(payloads), size / 1e6))
+    print('%-12s %10s %10s %8s' % ('decoder', 'ms', 'MB/s', 'relative'))
+    for name in sorted(timings, key=timings.get):
+        print('%-12s %10.2f %10.1f %8.2f' % (
+            name, timings[name] * 1000, size / 1e6 / timings[name], timings[name] / fastest))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
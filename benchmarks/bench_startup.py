@@ -0,0 +1,129 @@
+'''
+Measures the cold start cost of GoogleReaderClient: importing googlereader,
+constructing a client and its first request, logging in, against the local
+fake server. Each run is a fresh interpreter
+
+    python benchmarks/bench_startup.py [--runs n] [--latency ms]
+        [--eager] [--pool] [--save results.json] [--compare baseline.json]
+
+By default the client is built with lazy_login, as CLI tools and short lived
+handlers should; --eager logs in at construction instead. Requests go through
+restkit, or the connection pool with --pool or when restkit is not installed. Medians are
+reported along with the slow to import modules a bare import loaded. With
+--compare, phases more than 20% slower than the baseline are listed and the
+exit status is 1.
+'''
+
+import argparse
+import importlib
+import json
+import os
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.join(os.path.realpath(os.path.dirname(__file__)), '..'))
+
+from fakeserver import FakeReaderServer
+
+ROOT = os.path.join(os.path.realpath(os.path.dirname(__file__)), '..')
+REGRESSION = 1.2
+# modules that should only be imported when used
+HEAVY_MODULES = ['restkit', 'anyjson', 'cryptography', 'xml.etree.ElementTree', 'aiohttp', 'asyncio']
+
+CHILD = '''
+import json, sys
+from time import time
+start = time()
+import googlereader
+imported = time()
+modules = [name for name in %(heavy)r if name in sys.modules]
+client = googlereader.GoogleReaderClient(json.loads(sys.argv[1]))
+constructed = time()
+client.get_unread_count()
+requested = time()
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'construct_ms': (constructed - imported) * 1000,
+    'first_request_ms': (requested - constructed) * 1000,
+    'total_ms': (requested - start) * 1000,
+    'modules': modules}))
+'''
+
+
+def run_once(config):
+    '''Runs a fresh interpreter, returning its timings'''
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join([ROOT] + ([env['PYTHONPATH']] if 'PYTHONPATH' in env else []))
+    output = subprocess.check_output(
+        [sys.executable, '-c', CHILD % {'heavy': HEAVY_MODULES}, json.dumps(config)],
+        cwd=ROOT, env=env)
+    return json.loads(output.decode('utf-8').strip().splitlines()[-1])
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def compare(results, baseline):
+    '''Returns descriptions of the regressions against baseline'''
+    regressions = []
+    for key in ('import_ms', 'construct_ms', 'first_request_ms', 'total_ms'):
+        if key in baseline and results[key] > baseline[key] * REGRESSION:
+            regressions.append('%s %.1f -> %.1f' % (key, baseline[key], results[key]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0.0, help='server latency in ms')
+    parser.add_argument('--eager', action='store_true', help='log in at construction')
+    parser.add_argument('--pool', action='store_true', help='use the pool transport instead of restkit')
+    parser.add_argument('--save', help='write the results as json')
+    parser.add_argument('--compare', help='json results to compare against')
+    args = parser.parse_args()
+
+    server = FakeReaderServer(latency=args.latency / 1000).start()
+    config = {
+        'username': 'bench',
+        'password': 'bench',
+        'client_id': 'bench',
+        'json_decoder': 'json',
+        'base_url': server.url}
+    if not args.eager:
+        config['lazy_login'] = True
+    if not args.pool:
+        try:
+            importlib.import_module('restkit')
+        except ImportError:
+            print('restkit is not installed, using the pool transport')
+            args.pool = True
+    if args.pool:
+        config['pool'] = {}
+    # the first run writes the bytecode caches
+    run_once(config)
+    runs = [run_once(config) for i in range(args.runs)]
+    server.stop()
+
+    results = {}
+    for key in ('import_ms', 'construct_ms', 'first_request_ms', 'total_ms'):
+        results[key] = median([run[key] for run in runs])
+        print('%-18s %10.2f' % (key, results[key]))
+    results['modules'] = runs[-1]['modules']
+    print('heavy modules loaded by import: %s' % (', '.join(results['modules']) or 'none'))
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f))
+        for regression in regressions:
+            print('REGRESSION %s' % regression)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
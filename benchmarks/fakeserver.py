@@ -0,0 +1,184 @@
+'''
+Local stand-in for the Google Reader API serving the payloads of
+fixtures.py, or recorded responses, with a configurable latency
+
+    python benchmarks/fakeserver.py [port] [latency_ms]
+
+Point a client at it with the 'base_url' config key.
+'''
+
+import json
+import os
+import sys
+import threading
+import time
+try:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import urlsplit, parse_qs
+except ImportError:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import urlsplit, parse_qs
+
+sys.path.insert(0, os.path.realpath(os.path.dirname(__file__)))
+
+import fixtures
+
+JSON_TYPE = 'text/javascript; charset=UTF-8'
+TEXT_TYPE = 'text/plain; charset=UTF-8'
+
+
+class _Handler(BaseHTTPRequestHandler):
+    '''Dispatches requests to the FakeReaderServer that owns the socket'''
+    protocol_version = 'HTTP/1.1'
+    # bodies over the write buffer size go out in several segments, don't
+    # let Nagle hold the last one back until the client's delayed ack
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.__respond('GET')
+
+    def do_POST(self):
+        self.__respond('POST')
+
+    def __respond(self, method):
+        parts = urlsplit(self.path)
+        params = parse_qs(parts.query)
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            params.update(parse_qs(self.rfile.read(length).decode('utf-8')))
+        status, content_type, body = self.server.reader.respond(method, parts.path, params)
+        if not isinstance(body, bytes):
+            body = body.encode('utf-8')
+        if self.server.reader.latency:
+            time.sleep(self.server.reader.latency)
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class _ThreadedServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class FakeReaderServer(object):
+    '''
+    Threaded HTTP server answering ClientLogin, token, user-info,
+    stream/contents, unread-count, subscription and tag lists, edit-tag,
+    search and stream/items/contents requests. Streams hold total_items
+    items of summary_bytes each, paged by the n and c parameters. Files in
+    recordings, named after the endpoint path below /reader, eg
+    api/0/unread-count, are served instead of generated payloads. Every
+    response is delayed by latency seconds. requests counts the requests
+    served by endpoint path
+    '''
+    def __init__(self, port=0, latency=0.0, total_items=1000, summary_bytes=2000,
+        num_feeds=100, recordings=None):
+        self.latency = latency
+        self.total_items = total_items
+        self.summary_bytes = summary_bytes
+        self.num_feeds = num_feeds
+        self.recordings = recordings
+        self.requests = {}
+        self.__lock = threading.Lock()
+        self.__pages = {}
+        self.__server = _ThreadedServer(('127.0.0.1', port), _Handler)
+        self.__server.reader = self
+        self.__thread = None
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:%s' % self.__server.server_port
+
+    def start(self):
+        self.__thread = threading.Thread(target=self.__server.serve_forever)
+        self.__thread.daemon = True
+        self.__thread.start()
+        return self
+
+    def stop(self):
+        self.__server.shutdown()
+        self.__server.server_close()
+
+    def respond(self, method, path, params):
+        '''Returns the status, content type and body answering a request'''
+        if path.startswith('/reader/'):
+            path = path[len('/reader'):]
+        endpoint = path
+        for prefix in ('/api/0/stream/contents/', '/atom/'):
+            if path.startswith(prefix):
+                endpoint = prefix[:-1]
+        with self.__lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+        recorded = self.__recorded(path)
+        if recorded is not None:
+            return 200, TEXT_TYPE if not recorded.lstrip().startswith('{') else JSON_TYPE, recorded
+        if endpoint == '/accounts/ClientLogin':
+            return 200, TEXT_TYPE, 'SID=fakesid\nLSID=fakelsid\nAuth=fakeauth\n'
+        if endpoint == '/api/0/token':
+            return 200, TEXT_TYPE, 'faketoken'
+        if endpoint == '/api/0/user-info':
+            return 200, JSON_TYPE, json.dumps({'userId': fixtures.USER_ID, 'userName': 'Fake'})
+        if endpoint == '/api/0/stream/contents':
+            num = int(params.get('n', ['20'])[0])
+            start = int(params.get('c', ['0'])[0])
+            return 200, JSON_TYPE, self.__page(num, start)
+        if endpoint == '/api/0/unread-count':
+            return 200, JSON_TYPE, json.dumps(fixtures.unread_count(self.num_feeds))
+        if endpoint == '/api/0/subscription/list':
+            return 200, JSON_TYPE, json.dumps(fixtures.subscription_list(self.num_feeds))
+        if endpoint == '/api/0/tag/list':
+            return 200, JSON_TYPE, json.dumps(fixtures.tag_list())
+        if endpoint in ('/api/0/edit-tag', '/api/0/subscription/edit', '/api/0/tag/edit', '/api/0/disable-tag'):
+            return 200, TEXT_TYPE, 'OK'
+        if endpoint == '/api/0/search/items/ids':
+            return 200, JSON_TYPE, json.dumps(fixtures.search_ids(int(params.get('num', ['20'])[0])))
+        if endpoint == '/api/0/stream/items/contents':
+            items = [fixtures.item(int(i) & 0xffffffffffffffff, int(i) % self.num_feeds, self.summary_bytes)
+                for i in params.get('i', [])]
+            return 200, JSON_TYPE, json.dumps({'items': items})
+        return 404, TEXT_TYPE, 'Not found'
+
+    def __recorded(self, path):
+        '''Returns the recorded body for path, if any'''
+        if self.recordings is None:
+            return None
+        filename = os.path.join(self.recordings, path.lstrip('/'))
+        if not os.path.isfile(filename):
+            return None
+        with open(filename) as f:
+            return f.read()
+
+    def __page(self, num, start):
+        '''Returns a stream/contents page, generated once per offset and size'''
+        key = (num, start)
+        with self.__lock:
+            page = self.__pages.get(key)
+        if page is None:
+            num = max(0, min(num, self.total_items - start))
+            end = start + num
+            page = json.dumps(fixtures.stream_contents(num, self.summary_bytes, start, self.num_feeds,
+                continuation=str(end) if end < self.total_items else None))
+            with self.__lock:
+                self.__pages[key] = page
+        return page
+
+
+if __name__ == '__main__':
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8080
+    latency = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.0
+    server = FakeReaderServer(port, latency)
+    print('Serving a fake Google Reader on %s' % server.url)
+    try:
+        server.start()
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
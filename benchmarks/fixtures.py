@@ -0,0 +1,83 @@
+'''Payloads shaped like Google Reader API responses for benchmarks'''
+
+USER_ID = '01234567890123456789'
+
+
+def feed_id(i):
+    return 'feed/http://feeds%s.example.com/rss' % i
+
+
+def item(i, feed=0, summary_bytes=2000):
+    '''Returns one stream/contents item'''
+    paragraph = 'Lorem ipsum dolor sit amet, consectetur adipiscing elit. '
+    return {
+        'crawlTimeMsec': str(1262304000000 + i),
+        'id': 'tag:google.com,2005:reader/item/%016x' % i,
+        'categories': [
+            'user/%s/state/com.google/reading-list' % USER_ID,
+            'user/%s/state/com.google/fresh' % USER_ID,
+            'user/%s/label/folder%s' % (USER_ID, feed % 10)],
+        'title': 'Item title number %s' % i,
+        'published': 1262304000 + i,
+        'updated': 1262304000 + i,
+        'alternate': [{'href': 'http://feeds%s.example.com/item/%s' % (feed, i), 'type': 'text/html'}],
+        'summary': {
+            'direction': 'ltr',
+            'content': '<p>%s</p>' % (paragraph * (summary_bytes // len(paragraph) + 1))[:summary_bytes]},
+        'author': 'Author %s' % (i % 50),
+        'likingUsers': [],
+        'comments': [],
+        'annotations': [],
+        'origin': {
+            'streamId': feed_id(feed),
+            'title': 'Example feed %s' % feed,
+            'htmlUrl': 'http://feeds%s.example.com/' % feed}}
+
+
+def stream_contents(num_items=100, summary_bytes=2000, start=0, num_feeds=20, continuation=None):
+    '''Returns a stream/contents page'''
+    page = {
+        'direction': 'ltr',
+        'id': 'user/%s/state/com.google/reading-list' % USER_ID,
+        'title': 'Reading list',
+        'updated': 1262304000,
+        'items': [item(i, i % num_feeds, summary_bytes) for i in range(start, start + num_items)]}
+    if continuation is not None:
+        page['continuation'] = continuation
+    return page
+
+
+def unread_count(num_feeds=100):
+    '''Returns an unread-count response'''
+    counts = [{
+        'id': feed_id(i),
+        'count': i % 30,
+        'newestItemTimestampUsec': str(1262304000000000 + i)} for i in range(num_feeds)]
+    counts.append({
+        'id': 'user/%s/state/com.google/reading-list' % USER_ID,
+        'count': sum(c['count'] for c in counts),
+        'newestItemTimestampUsec': '1262304000000000'})
+    return {'max': 1000, 'unreadcounts': counts}
+
+
+def subscription_list(num_feeds=100):
+    '''Returns a subscription/list response'''
+    return {'subscriptions': [{
+        'id': feed_id(i),
+        'title': 'Example feed %s' % i,
+        'categories': [{'id': 'user/%s/label/folder%s' % (USER_ID, i % 10), 'label': 'folder%s' % (i % 10)}],
+        'sortid': '%08X' % i,
+        'firstitemmsec': '1262304000000',
+        'htmlUrl': 'http://feeds%s.example.com/' % i} for i in range(num_feeds)]}
+
+
+def tag_list(num_labels=10):
+    '''Returns a tag/list response'''
+    tags = [{'id': 'user/%s/state/com.google/starred' % USER_ID, 'sortid': 'FFFFFFFF'}]
+    tags.extend({'id': 'user/%s/label/folder%s' % (USER_ID, i), 'sortid': '%08X' % i, 'shared': False} for i in range(num_labels))
+    return {'tags': tags}
+
+
+def search_ids(num_results=20):
+    '''Returns a search/items/ids response'''
+    return {'results': [{'id': str(1000000 + i)} for i in range(num_results)]}
@@ -0,0 +1,190 @@
+'''Response caching for read-only endpoints'''
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from time import time
+
+
+class MemoryCache(object):
+    '''LRU cache of entries bounded by the total size of their bodies'''
+    def __init__(self, max_bytes=8 * 1024 * 1024):
+        self.__max_bytes = max_bytes
+        self.__entries = OrderedDict()
+        self.__size = 0
+        self.evictions = 0
+
+    def get(self, key):
+        entry = self.__entries.pop(key, None)
+        if entry is not None:
+            self.__entries[key] = entry
+        return entry
+
+    def set(self, key, entry):
+        self.delete(key)
+        if entry['size'] > self.__max_bytes:
+            return
+        self.__entries[key] = entry
+        self.__size += entry['size']
+        while self.__size > self.__max_bytes:
+            old_key, old_entry = self.__entries.popitem(last=False)
+            self.__size -= old_entry['size']
+            self.evictions += 1
+
+    def delete(self, key):
+        entry = self.__entries.pop(key, None)
+        if entry is not None:
+            self.__size -= entry['size']
+
+    def size(self):
+        return self.__size
+
+
+class DiskCache(object):
+    '''Stores entries as json files in a directory'''
+    def __init__(self, path):
+        self.__path = path
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+    def get(self, key):
+        try:
+            with open(self.__filename(key)) as f:
+                return json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+
+    def set(self, key, entry):
+        filename = self.__filename(key)
+        with open(filename + '.tmp', 'w') as f:
+            json.dump(entry, f)
+        os.rename(filename + '.tmp', filename)
+
+    def delete(self, key):
+        try:
+            os.remove(self.__filename(key))
+        except OSError:
+            pass
+
+    def __filename(self, key):
+        return os.path.join(self.__path, key)
+
+
+class ResponseCache(object):
+    '''
+    Caches GET responses for endpoints with a configured ttl. ttls maps a
+    url path fragment, eg '/api/0/tag/list', to the seconds a response is
+    served without contacting the server. Once stale, responses carrying an
+    ETag or Last-Modified header are revalidated with a conditional request.
+    Entries are held in an in-memory LRU of max_bytes and, if path is given,
+    also written to disk.
+    '''
+    def __init__(self, ttls=None, max_bytes=8 * 1024 * 1024, path=None):
+        self.__ttls = ttls or {}
+        self.__memory = MemoryCache(max_bytes)
+        self.__disk = DiskCache(path) if path is not None else None
+        self.__lock = threading.Lock()
+        # bumped by invalidate, per ttls fragment
+        self.__generations = {}
+        self.__stats = {
+            'hits': 0,
+            'misses': 0,
+            'revalidations': 0}
+
+    def ttl_for(self, uri):
+        '''Returns the ttl configured for uri, or None if it is not cached'''
+        for fragment in self.__ttls:
+            if fragment in uri:
+                return self.__ttls[fragment]
+        return None
+
+    def key(self, uri, params, headers):
+        '''Builds a cache key from the request, separating users by cookie'''
+        parts = [uri, headers.get('Cookie', ''), self.__generation(uri)] + \
+            ['%s=%s' % (k, params[k]) for k in sorted(params)]
+        return hashlib.sha1('\n'.join(str(p) for p in parts).encode('utf-8')).hexdigest()
+
+    def invalidate(self, uri):
+        '''
+        Stops serving the cached responses of the endpoint of uri, eg after
+        a write changed it. Their keys change, leaving old entries to be
+        evicted. The count of invalidations keying entries is kept in memory
+        only, so after a restart entries written to disk before an
+        invalidation are served again until their ttl expires
+        '''
+        for fragment in self.__ttls:
+            if fragment in uri:
+                with self.__lock:
+                    self.__generations[fragment] = self.__generations.get(fragment, 0) + 1
+
+    def __generation(self, uri):
+        '''Returns how many times the endpoint of uri was invalidated'''
+        for fragment in self.__ttls:
+            if fragment in uri:
+                return self.__generations.get(fragment, 0)
+        return 0
+
+    def get(self, key):
+        '''Returns (entry, is_fresh) for key, entry being None on a miss'''
+        with self.__lock:
+            entry = self.__memory.get(key)
+            if entry is None and self.__disk is not None:
+                entry = self.__disk.get(key)
+                if entry is not None:
+                    self.__memory.set(key, entry)
+            if entry is None:
+                self.__stats['misses'] += 1
+                return None, False
+            fresh = entry['expires'] > time()
+            if fresh:
+                self.__stats['hits'] += 1
+            elif entry['etag'] is None and entry['last_modified'] is None:
+                self.__stats['misses'] += 1
+                return None, False
+            return entry, fresh
+
+    def validators(self, entry):
+        '''Returns the conditional request headers to revalidate entry'''
+        headers = {}
+        if entry['etag'] is not None:
+            headers['If-None-Match'] = entry['etag']
+        if entry['last_modified'] is not None:
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def store(self, key, ttl, status, headers, body):
+        '''Caches a response, returning the new entry'''
+        entry = {
+            'expires': time() + ttl,
+            'etag': headers.get('etag'),
+            'last_modified': headers.get('last-modified'),
+            'status': status,
+            'headers': dict(headers),
+            'body': body,
+            'size': len(body)}
+        self.__save(key, entry)
+        return entry
+
+    def revalidated(self, key, ttl, entry):
+        '''Extends the lifetime of entry after a 304 Not Modified'''
+        entry = dict(entry, expires=time() + ttl)
+        self.__save(key, entry)
+        with self.__lock:
+            self.__stats['revalidations'] += 1
+        return entry
+
+    def stats(self):
+        '''Returns hit, miss, revalidation and eviction counters'''
+        with self.__lock:
+            stats = dict(self.__stats)
+            stats['evictions'] = self.__memory.evictions
+            stats['bytes'] = self.__memory.size()
+        return stats
+
+    def __save(self, key, entry):
+        with self.__lock:
+            self.__memory.set(key, entry)
+            if self.__disk is not None:
+                self.__disk.set(key, entry)
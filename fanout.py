@@ -0,0 +1,141 @@
+'''Bounded parallel execution of independent requests'''
+
+import threading
+from time import time
+try:
+    from Queue import Queue, Empty
+except ImportError:
+    from queue import Queue, Empty
+
+
+class FetchTimeout(Exception):
+    '''Set as the error of a task that did not finish within its timeout'''
+    pass
+
+
+class FetchResult(object):
+    '''Outcome of one task: its key, result or error and latency in seconds'''
+    __slots__ = ('key', 'result', 'error', 'latency')
+
+    def __init__(self, key, result, error, latency):
+        self.key = key
+        self.result = result
+        self.error = error
+        self.latency = latency
+
+    def __repr__(self):
+        return 'FetchResult(%r, error=%r, latency=%.3f)' % (self.key, self.error, self.latency)
+
+
+def in_background(target):
+    '''
+    Runs target on a daemon thread. Returns a callable that waits for it,
+    returning its result or raising its error
+    '''
+    outcome = {}
+    def run():
+        try:
+            outcome['result'] = target()
+        except Exception as e:
+            outcome['error'] = e
+    worker = threading.Thread(target=run)
+    worker.daemon = True
+    worker.start()
+    def wait():
+        worker.join()
+        if 'error' in outcome:
+            raise outcome['error']
+        return outcome['result']
+    return wait
+
+
+def fan_out(func, keys, concurrency=8, timeout=None, cancel=None):
+    '''
+    Calls func(key) for every key on up to concurrency worker threads and
+    yields a FetchResult as each call completes. keys may be any iterable,
+    including a generator still producing keys: workers take the next key
+    when they become free, so the first calls start before all keys are
+    known. A call running longer than timeout seconds is reported with a
+    FetchTimeout error and its eventual result discarded; its worker stays
+    busy until the call returns, so the transport should have a socket
+    timeout too. Setting the cancel event, or closing the generator, stops
+    workers picking up further keys.
+    '''
+    keys = iter(keys)
+    seen = set()
+    results = Queue()
+    stop = threading.Event()
+    running = {}
+    exhausted = []
+    lock = threading.Lock()
+
+    def stopped():
+        return stop.is_set() or (cancel is not None and cancel.is_set())
+
+    def next_key():
+        '''Returns the next key not seen yet and its start time'''
+        with lock:
+            try:
+                for key in keys:
+                    if key not in seen:
+                        seen.add(key)
+                        running[key] = time()
+                        return key, running[key]
+            except Exception as e:
+                # the keys iterable itself failed, raised by the consumer
+                results.put(e)
+            if not exhausted:
+                exhausted.append(True)
+                # wake the consumer up to notice
+                results.put(None)
+        raise StopIteration
+
+    def work():
+        while not stopped():
+            try:
+                key, start = next_key()
+            except StopIteration:
+                return
+            try:
+                results.put(FetchResult(key, func(key), None, time() - start))
+            except Exception as e:
+                results.put(FetchResult(key, None, e, time() - start))
+
+    for i in range(concurrency):
+        worker = threading.Thread(target=work)
+        worker.daemon = True
+        worker.start()
+
+    try:
+        while not stopped():
+            with lock:
+                done = exhausted and not running
+            if done and results.empty():
+                break
+            wait = 0.5
+            if timeout is not None:
+                now = time()
+                with lock:
+                    overdue = [(k, now - running[k]) for k in running if now - running[k] >= timeout]
+                    for key, elapsed in overdue:
+                        del running[key]
+                    if running:
+                        wait = min(wait, timeout - (now - min(running.values())))
+                for key, elapsed in overdue:
+                    yield FetchResult(key, None, FetchTimeout(key), elapsed)
+            try:
+                result = results.get(timeout=max(wait, 0.01))
+            except Empty:
+                continue
+            if result is None:
+                continue
+            if isinstance(result, Exception):
+                raise result
+            with lock:
+                if result.key not in running:
+                    # already reported as timed out
+                    continue
+                del running[result.key]
+            yield result
+    finally:
+        stop.set()
@@ -1,8 +1,45 @@
 '''Client for the Google Reader API'''
 
 import re
-from restclient import restClient
+import threading
+import zlib
+from collections import OrderedDict
+from restclient import restClient, RestError
+from fanout import fan_out, in_background
+from itertools import islice
+from jsonstream import ItemStream
+from labelindex import LabelIndex
+from opml import read_opml
+from ratelimit import Coalescer
+from scheduler import RefreshScheduler
+from subscriptions import SUBSCRIBE, SubscriptionEdit, plan_subscriptions
+from tokenmanager import TokenManager
+from writequeue import READ, WriteBehindQueue
 from time import time
+try:
+    from urllib import urlencode
+except ImportError:
+    from urllib.parse import urlencode
+try:
+    from sys import intern
+except ImportError:
+    pass
+
+
+def _short_id(item_id):
+    '''Converts a long form item id into the signed decimal form used by search'''
+    value = int(item_id.rsplit('/', 1)[1], 16)
+    return str(value - (1 << 64) if value >= 1 << 63 else value)
+
+
+def _intern(value):
+    '''Interns repeated strings shared by many items'''
+    try:
+        return intern(value)
+    except TypeError:
+        # python 2 only interns byte strings
+        return value
+
 
 # http://code.google.com/p/pyrfeed/wiki/GoogleReaderAPI
 class GoogleReaderClient(restClient):
@@ -51,29 +88,96 @@ class GoogleReaderClient(restClient):
     __STATE_FOLDER_ITEMS = 'user/%s/label/%s'
     __FEED_ID = 'feed/%s'
 
+    # search scopes and the stream they search, formatted with the user id and target
+    __SEARCH_SCOPES = {
+        'all': None,
+        'read': __STATE_READ_ITEMS,
+        'starred': __STATE_STARRED_ITEMS,
+        'shared': __STATE_SHARED_ITEMS,
+        'followed': __STATE_FOLLOWED_ITEMS,
+        'notes': __STATE_NOTE_ITEMS,
+        'folder': __STATE_FOLDER_ITEMS,
+        'feed': '%s'}
+
     __SEARCH_CONTENTS_URL = __READER_URL + '/api/0/stream/items/contents?ck=%s&client=%s'
+    __FORM_HEADERS = {'Content-Type':'application/x-www-form-urlencoded; charset=utf-8'}
     __EXPORT_OPML = __READER_URL + '/subscriptions/export'
 
+    # seconds responses of read-only endpoints are cached for
+    _CACHE_TTLS = {
+        '/api/0/subscription/list': 300,
+        '/api/0/tag/list': 300,
+        '/api/0/preference/list': 3600,
+        '/api/0/stream/details': 3600}
+
     def __init__(self, config):
-        restClient.__init__(self, config)
+        super(GoogleReaderClient, self).__init__(config)
 
         self.__username = config['username'] if 'username' in config else None
         self.__password = config['password'] if 'password' in config else None
         self.__client_id = config['client_id'] if 'client_id' in config else None
         self.__response_format = config['response_format'] if ('response_format' in config and config['response_format'] in ['json', 'xml']) else 'json'
-        self.__token = None
+        self.__token_manager = TokenManager(
+            self.__update_token,
+            ttl=config['token_ttl'] if 'token_ttl' in config else 1800,
+            refresh_margin=config['token_refresh_margin'] if 'token_refresh_margin' in config else 300,
+            then=self._then,
+            spawn=self._spawn,
+            share=self._share)
+        self.__edit_batch_size = config['edit_batch_size'] if 'edit_batch_size' in config else 250
+        self.__defer_login = config['defer_login'] if 'defer_login' in config else False
+        self.__lazy_login = config['lazy_login'] if 'lazy_login' in config else False
+        self.__lazy_logins = Coalescer()
+        self.__search_cache_size = config['search_cache_size'] if 'search_cache_size' in config else 1000
+        self.__hydrated = OrderedDict()
+        self.__hydrated_lock = threading.Lock()
         self.__google_reader_cookie_id = None
         self.__user_id = None
-
-        if (self.__username is not None and self.__password is not None):
-            self.__login()
-
-    def __login(self):
+        auth_cache = config['auth_cache'] if 'auth_cache' in config else None
+        if isinstance(auth_cache, dict):
+            # cryptography is slow to import, leave it out unless used
+            from authcache import AuthCache
+            auth_cache = AuthCache(**auth_cache)
+        self.__auth_cache = auth_cache
+        search_index = config['search_index'] if 'search_index' in config else None
+        if search_index is True:
+            search_index = {}
+        if isinstance(search_index, dict):
+            # sqlite3 is only needed by clients searching locally
+            from searchindex import open_index
+            search_index = open_index(**search_index)
+        self.__search_index = search_index
+
+        if 'base_url' in config:
+            # point the urls at another server, eg a local stand-in for benchmarks
+            google_url = self.__GOOGLE_URL
+            for name, value in vars(GoogleReaderClient).items():
+                if isinstance(value, str) and value.startswith(google_url):
+                    setattr(self, name, config['base_url'] + value[len(google_url):])
+
+        auth = config['auth'] if 'auth' in config else None
+        if auth is None and self.__auth_cache is not None and self.__username is not None:
+            auth = self.__auth_cache.get(self.__username, self.__password)
+        if auth is not None:
+            # reuse a session from get_auth() instead of logging in
+            self.__google_reader_cookie_id = auth['sid']
+            self.__user_id = auth['user_id']
+        elif (self.__username is not None and self.__password is not None
+                and not self.__defer_login and not self.__lazy_login):
+            self.login()
+
+        # created last as journaled edits may be flushed straight away
+        write_behind = config['write_behind'] if 'write_behind' in config else None
+        if write_behind is True:
+            write_behind = {}
+        self.__write_queue = WriteBehindQueue(self, **write_behind) if write_behind is not None else None
+
+    def login(self):
         '''
         Login to Google Reader
         '''
         # request without serialization as response is cookie data not json
-        response = self.request(
+        return self._then(self.request(
             'POST',
             self.__LOGIN_URL,
             body={
@@ -83,40 +187,146 @@ class GoogleReaderClient(restClient):
                 'source': self.__client_id,
                 'continue': self.__GOOGLE_URL},
             deserialize=False
-            )
+            ), self.__on_login)
+
+    def get_auth(self):
+        '''
+        Returns the SID cookie and user id of a logged in client, which can
+        be passed as the 'auth' config key to skip login, or None
+        '''
+        if self.__user_id is None:
+            return None
+        return {'sid': self.__google_reader_cookie_id, 'user_id': self.__user_id}
 
+    def __on_login(self, response):
+        '''Stores the SID cookie from a ClientLogin response'''
         #pre-check first for HTTP 200 (needed?)
         if response.status_int == 200 and response.body.startswith('SID='):
             self.__google_reader_cookie_id = str(re.search('SID=(\S*)',
                 response.body).group(1))
-            self.__user_id = self.__get_user_info()
-            return True
+            return self._then(self.__get_user_info(), self.__on_user_info)
+        if self.__auth_cache is not None:
+            self.__auth_cache.delete(self.__username)
         return False
 
+    def __on_user_info(self, user_id):
+        '''Stores the user id once logged in'''
+        self.__user_id = user_id
+        if self.__auth_cache is not None:
+            self.__auth_cache.set(self.__username, self.get_auth(), self.__password)
+        return True
+
+    def request(self, method, uri, headers={}, body=None, deserialize=True, stream=False, **params):
+        '''Sends a request, logging in again when the session is rejected and resending it unless
+        it is a POST, which __post_with_token resends with a new token. See 'lazy_login' in readme.md'''
+        if self.__lazy_login and uri != self.__LOGIN_URL and uri != self.__USER_INFO_URL:
+            return self.__request_after_login(method, uri, headers, body, deserialize, stream, params)
+        sid = self.__google_reader_cookie_id
+        result = super(GoogleReaderClient, self).request(method, uri, headers, body, deserialize, stream, **params)
+        if self.__password is None or 'Cookie' not in headers or uri == self.__USER_INFO_URL:
+            return result
+
+        def check(result):
+            if getattr(result, 'status_int', None) != 401 or \
+                    result.headers.get('x-reader-google-bad-token') == 'true':
+                # only the edit token is stale, the session is fine
+                return result
+            def resend(logged_in):
+                if logged_in is not True or method == 'POST':
+                    return result
+                return super(GoogleReaderClient, self).request(method, uri,
+                    self.__build_request_headers(dict(headers)), body, deserialize, stream, **params)
+            if self.__google_reader_cookie_id != sid:
+                # another request logged in again meanwhile
+                return resend(True)
+            # requests rejected together share one login
+            return self._then(self._share('relogin', self.__relogin), resend)
+
+        return self._then(result, check)
+
+    def __relogin(self):
+        '''Logs in again after the session was rejected, dropping the edit token of the old session'''
+        def logged_in(result):
+            if result is True:
+                self.__token_manager.invalidate()
+            return result
+        return self._then(self.login(), logged_in)
+
+    def __request_after_login(self, method, uri, headers, body, deserialize, stream, params):
+        '''Logs in once, shared by the requests made meanwhile, then sends the request'''
+        if self.__lazy_login and self.__user_id is None and self.__password is not None:
+            self.__lazy_logins.do('login', self.login)
+        # only the first request tries, later failures are handled as rejected sessions
+        self.__lazy_login = False
+        if 'Cookie' in headers:
+            headers = self.__build_request_headers(dict(headers))
+        return self.request(method, uri, headers, body, deserialize, stream, **params)
+
+    def __user(self):
+        '''Returns the user id for stream ids, or '-', the logged in user, until known'''
+        return self.__user_id if self.__user_id is not None else '-'
+
     def __get_user_info(self):
         ''' Get user info eg client id'''
-        user_info = self.request(
+        return self._then(self.request(
             'GET',
             self.__USER_INFO_URL,
             headers=self.__build_request_headers(),
             ck=str(int(time())),
-            client=self.__client_id)
-
-        return user_info['userId']
+            client=self.__client_id), lambda user_info: user_info['userId'])
 
     def __update_token(self):
         ''' Gets a updated token'''
         headers = self.__build_request_headers()
-        token_data = self.request(
+        return self._then(self.request(
             'GET',
             self.__TOKEN_URL,
             headers=headers,
             client=self.__client_id,
             output=self.__response_format,
             ck=str(int(time())),
-            deserialize=False)
-        self.__token = token_data.body
-        return self.__token
+            deserialize=False), self.__on_token)
+
+    def __on_token(self, response):
+        '''Returns the token of a token response, raising a RestError for any other'''
+        if not self._is_response(response, 200):
+            raise RestError(response)
+        return response.body
+
+    def __is_token_rejected(self, response):
+        '''Checks if a write was refused because of a stale token'''
+        if not hasattr(response, 'status_int'):
+            return False
+        return response.status_int == 401 or \
+            response.headers.get('x-reader-google-bad-token') == 'true'
+
+    def __post_with_token(self, url, args, headers=None, retry=True):
+        '''
+        POSTs args with the cached edit token. If the server rejects the
+        token the request is retried exactly once with a fresh one
+        '''
+        def post(token):
+            if isinstance(args, dict):
+                body = dict(args, T=token)
+            else:
+                body = '%s&T=%s' % (args, token) if args else 'T=%s' % token
+            return self._then(self.request(
+                'POST',
+                url,
+                body=body,
+                headers=self.__build_request_headers(dict(headers or {}))), check)
+
+        def check(response):
+            if retry and self.__is_token_rejected(response):
+                self.__token_manager.invalidate()
+                return self.__post_with_token(url, args, headers, False)
+            return response
+
+        return self._then(self.__token_manager.get_token(), post)
+
+    def get_token_stats(self):
+        '''Returns counters for token cache hits and refreshes'''
+        return dict(self.__token_manager.stats)
 
     def __build_request_headers(self, headers=None):
         '''Populates correct headers to make authorised requests'''
@@ -127,22 +337,17 @@ class GoogleReaderClient(restClient):
         return headers
 
     def __edit_item_state(self, item_id, label, action, feed_url=None):
-        ''' Edits a specific item by adding or removing a tag'''
-        self.__update_token()
+        ''' Edits a specific item by adding or removing a label or state'''
         args = {
             'i': item_id,
-            'T': self.__token}
-        if feed_url is None:
-            args[action] = 'user/-/label/'+label
-        else:
+            action: self.__tag_id(label)}
+        if feed_url is not None:
             args['s'] = feed_url if feed_url.startswith('feed/') else self.__FEED_ID % feed_url
-            args[action] = self.__STATE_READ_ITEMS % self.__user_id
 
-        return self.request(
-            'POST',
+        return self._then(self.__post_with_token(
             self.__EDIT_TAG_URL+'?client='+self.__client_id,
-            body=args,
-            headers=self.__build_request_headers())
+            args), lambda response: self.__items_tagged(response, [item_id],
+                args.get(self.__ADD_ACTION), args.get(self.__REMOVE_ACTION)))
 
     def __edit_subscription(self, feed_title=None, feed_url=None, label=None,
         label_action=None, action=None):
@@ -151,51 +356,72 @@ class GoogleReaderClient(restClient):
         """
 
         if feed_title and feed_url:
-            self.__update_token()
             args = {
                 's': feed_url if feed_url.startswith('feed/') else self.__FEED_ID % feed_url,
                 't': feed_title,
-                'ac': action,
-                'T': self.__token}
+                'ac': action}
             # add or remove label if edit action
             if action is self.__EDIT_ACTION:
                 if label and label_action:
                     args[label_action] = 'user/-/label/'+label
-            return self.request(
-                'POST',
+            return self._then(self.__post_with_token(
                 self.__SUBSCRIPTION_URL+'?client='+self.__client_id,
-                body=args,
-                headers=self.__build_request_headers())
+                args), self.__lists_changed)
+
+    def edit_subscription(self, feed_url, title=None, add_labels=None, remove_labels=None, action='edit'):
+        '''
+        Subscribes to (action 'subscribe'), unsubscribes from ('unsubscribe')
+        or edits a feed in a single request, setting its title and adding
+        and removing any number of labels, given as names or tag ids
+        '''
+        args = [
+            ('s', feed_url if feed_url.startswith('feed/') else self.__FEED_ID % feed_url),
+            ('ac', action)]
+        if title is not None:
+            args.append(('t', title))
+        args += [(self.__ADD_ACTION, self.__tag_id(l)) for l in self.__as_list(add_labels)]
+        args += [(self.__REMOVE_ACTION, self.__tag_id(l)) for l in self.__as_list(remove_labels)]
+        # urlencode needs byte strings for non ascii titles on python 2
+        args = [(k, v if isinstance(v, str) else v.encode('utf-8')) for k, v in args]
+        return self._then(self.__post_with_token(
+            self.__SUBSCRIPTION_URL+'?client='+self.__client_id,
+            urlencode(args),
+            self.__FORM_HEADERS), self.__lists_changed)
+
+    def invalidate_lists(self):
+        '''Drops the cached subscription and tag lists, eg after changes made elsewhere'''
+        self.__lists_changed(None)
+
+    def __lists_changed(self, response):
+        '''
+        Drops the cached subscription and tag lists after a write, as
+        subscribing, labelling or deleting a tag can change either
+        '''
+        if self._cache is not None:
+            self._cache.invalidate(self.__SUBSCRIPTION_LIST_URL)
+            self._cache.invalidate(self.__TAG_LIST_URL)
+        return response
 
     def edit_folder_or_tag(self, folder__tag_id, is_public=False):
         ''' Make a folder public or private  '''
-        self.__update_token()
         args = {
             's': folder__tag_id,
             'pub': str(is_public).lower(),
-            'T': self.__token,
             't': folder__tag_id}
-        return self.request(
-            'POST',
+        return self._then(self.__post_with_token(
             self.__EDIT_FOLDER_URL+'?client='+self.__client_id,
-            body=args,
-            headers=self.__build_request_headers())
+            args), self.__lists_changed)
 
     def subscribe_to_feed(self, feed_title, feed_url, quickAdd=False):
         ''' Adds a feed '''
         # Use quick add url; returns feed information
         if quickAdd is True:
-            if self.__token == None:
-                self.__update_token()
             args={
-                'T': self.__token,
                 'quickadd': feed_url}
 
-            return self.request(
-                'POST',
+            return self._then(self.__post_with_token(
                 self.__SUBSCRIPTION_URL_QUICK+'?client=%s&ck=%s' % (self.__client_id, str(int(time()))),
-                body=args,
-                headers=self.__build_request_headers())
+                args), self.__lists_changed)
         else:
             response = self.__edit_subscription(
                 feed_title,
@@ -232,24 +458,120 @@ class GoogleReaderClient(restClient):
 
     def add_tag(self, item_id, tag):
         '''Add a label or tag onto a specific item '''
+        if self.__write_queue is not None:
+            return self.__queue_edit(item_id, tag, True)
         return self.__edit_item_state(item_id, tag, self.__ADD_ACTION)
 
     def remove_tag(self, item_id, tag):
         '''Remove a label or tag onto a specific item '''
+        if self.__write_queue is not None:
+            return self.__queue_edit(item_id, tag, False)
         return self.__edit_item_state(item_id, tag, self.__REMOVE_ACTION)
 
+    def __queue_edit(self, item_id, tag, add, feed_url=None):
+        '''Queues an item edit on the write-behind queue, acknowledging it as the server would'''
+        stream_id = None
+        if feed_url is not None:
+            stream_id = feed_url if feed_url.startswith('feed/') else self.__FEED_ID % feed_url
+        if add:
+            self.__write_queue.add(item_id, tag, stream_id)
+        else:
+            self.__write_queue.remove(item_id, tag, stream_id)
+        return self.__items_tagged('OK', [item_id], tag if add else None, None if add else tag)
+
+    def flush_writes(self):
+        '''
+        Sends the edits queued by the 'write_behind' config key now,
+        returning how many failed and stay queued
+        '''
+        return self.__write_queue.flush() if self.__write_queue is not None else 0
+
+    def close(self):
+        '''
+        Sends the edits queued by the 'write_behind' config key, returning
+        how many failed, and stops its background thread
+        '''
+        return self.__write_queue.close() if self.__write_queue is not None else 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def get_write_stats(self):
+        '''Returns write-behind queue depth, counters and flush latencies, or None without one'''
+        return self.__write_queue.get_stats() if self.__write_queue is not None else None
+
+    def edit_tags_bulk(self, items, add=None, remove=None, batch_size=None):
+        '''Adds and/or removes tags on many items in one edit-tag request per batch,
+        returning a list of (item_ids, response) tuples'''
+        if batch_size is None:
+            batch_size = self.__edit_batch_size
+        if batch_size < 1:
+            raise ValueError('batch_size must be at least 1')
+        if not self.__as_list(add) and not self.__as_list(remove):
+            raise ValueError('No tag to add or remove')
+        tag_args = [(self.__ADD_ACTION, self.__tag_id(t)) for t in self.__as_list(add)] + \
+            [(self.__REMOVE_ACTION, self.__tag_id(t)) for t in self.__as_list(remove)]
+        items = list(items)
+        results = []
+        for start in range(0, len(items), batch_size):
+            item_ids = []
+            args = []
+            for item in items[start:start + batch_size]:
+                item_id, stream_id = item if isinstance(item, tuple) else (item, None)
+                item_ids.append(item_id)
+                args.append(('i', item_id))
+                if stream_id is not None:
+                    args.append(('s', stream_id))
+            results.append(self._then(self.__post_with_token(
+                self.__EDIT_TAG_URL+'?client='+self.__client_id,
+                urlencode(args + tag_args),
+                self.__FORM_HEADERS), lambda response, item_ids=item_ids: (item_ids,
+                    self.__items_tagged(response, item_ids, add, remove))))
+        return self._gather(results)
+
+    def __items_tagged(self, response, item_ids, add, remove):
+        '''Records a successful item tag edit in the search index'''
+        if self.__search_index is not None and response == 'OK':
+            for tag in self.__as_list(add):
+                self.__search_index.set_tag(item_ids, tag, True)
+            for tag in self.__as_list(remove):
+                self.__search_index.set_tag(item_ids, tag, False)
+        return response
+
+    def mark_as_read_bulk(self, items, batch_size=None):
+        '''Marks many items as read using batched edit-tag requests'''
+        if self.__write_queue is not None:
+            item_ids = []
+            for item in items:
+                item_id, stream_id = item if isinstance(item, tuple) else (item, None)
+                self.__queue_edit(item_id, READ, True, stream_id)
+                item_ids.append(item_id)
+            return [(item_ids, 'OK')]
+        return self.edit_tags_bulk(
+            items,
+            add=self.__STATE_READ_ITEMS % self.__user(),
+            batch_size=batch_size)
+
+    def __tag_id(self, tag):
+        '''Expands a label name into a full tag id'''
+        return tag if tag.startswith('user/') else 'user/-/label/'+tag
+
+    def __as_list(self, value):
+        '''Wraps a single value into a list'''
+        if value is None:
+            return []
+        return list(value) if isinstance(value, (list, tuple, set)) else [value]
+
     def delete_tag(self, tag):
         '''Disable tag'''
-        self.__update_token()
-
-        return self.request(
-            'POST',
+        return self._then(self.__post_with_token(
             self.__DISABLE_TAG_URL+'?client='+self.__client_id,
-            body={
-                's': tag if tag.startswith('user/') else self.__DELETE_TAG_ACTION % (self.__user_id, tag),
-                'ac': 'disable-tags',
-                'T': self.__token},
-            headers=self.__build_request_headers())
+            {
+                's': tag if tag.startswith('user/') else self.__DELETE_TAG_ACTION % (self.__user(), tag),
+                'ac': 'disable-tags'}), self.__lists_changed)
 
     def get_subscription_list(self):
         ''' Returns full list of subscribed feeds'''
@@ -299,21 +621,83 @@ class GoogleReaderClient(restClient):
             ck=str(int(time())),
             client=self.__client_id)
 
-    def get_feed_contents(self, feed_id, num=20, order='n', use_atom=False):
-        return self.request(
+    def get_feed_contents(self, feed_id, num=20, order='n', use_atom=False, continuation=None, stream=False):
+        params = {}
+        if continuation is not None:
+            params['c'] = continuation
+        return self._then(self.request(
             'GET',
             self.__FEED_CONTENTS_URL % (feed_id) if use_atom is False else self.__ATOM_FEED_URL % feed_id,
             headers=self.__build_request_headers(),
             r=order,
             n=num,
             ck=str(int(time())),
-            client=self.__client_id)
+            client=self.__client_id,
+            stream=stream,
+            **params), self.__index_items)
+
+    def fetch_all_feeds(self, num=20, concurrency=8, timeout=None, cancel=None, feed_ids=None):
+        '''Fetches every subscribed feed, or feed_ids, on concurrency threads,
+        yielding a fanout.FetchResult per feed as it completes'''
+        if feed_ids is None:
+            feed_ids = [s['id'] for s in self.get_subscription_list()['subscriptions']]
+        def fetch(feed_id):
+            contents = self.get_feed_contents(feed_id, num)
+            if not isinstance(contents, dict):
+                raise RestError(contents)
+            return contents
+        return fan_out(fetch, feed_ids, concurrency, timeout, cancel)
+
+    def import_OPML(self, source, concurrency=8, timeout=None, cancel=None):
+        '''Subscribes to the feeds of an OPML path or file on concurrency threads,
+        returning an OrderedDict of fanout.FetchResult by feed url'''
+        edits = OrderedDict((feed_url, SubscriptionEdit(feed_url, SUBSCRIBE, feed['title'], feed['labels']))
+            for feed_url, feed in read_opml(source).items())
+        return self._apply_edits(edits, concurrency, timeout, cancel)
+
+    def reconcile(self, desired_state, dry_run=False, prune=True, concurrency=8, timeout=None):
+        '''Makes the subscriptions match desired_state, sending only the feeds that
+        differ, see subscriptions.plan_subscriptions'''
+        if self._cache is not None:
+            self._cache.invalidate(self.__SUBSCRIPTION_LIST_URL)
+        def plan(subscriptions):
+            if not isinstance(subscriptions, dict):
+                raise RestError(subscriptions)
+            edits = plan_subscriptions(subscriptions['subscriptions'], desired_state, prune)
+            if dry_run:
+                return edits
+            return self._apply_edits(OrderedDict((edit.feed_id, edit) for edit in edits), concurrency, timeout)
+        return self._then(self.get_subscription_list(), plan)
+
+    def _apply_edits(self, edits, concurrency=8, timeout=None, cancel=None):
+        '''
+        Sends an OrderedDict of SubscriptionEdits on a pool of threads,
+        returning an OrderedDict of fanout.FetchResult, or None for edits
+        not sent because cancel was set, by the same keys
+        '''
+        def apply(key):
+            edit = edits[key]
+            return self._check_edit(self.edit_subscription(edit.feed_id, edit.title,
+                edit.add_labels, edit.remove_labels, edit.action))
+        report = OrderedDict((key, None) for key in edits)
+        for result in fan_out(apply, edits, concurrency, timeout, cancel):
+            report[result.key] = result
+        return report
+
+    def _check_edit(self, response):
+        '''Returns the OK of a successful edit, raising a RestError otherwise'''
+        if response != 'OK':
+            raise RestError(response)
+        return response
 
     def mark_as_read(self, feed_item_id, feed_url=None):
         '''
         Marks item as read
         '''
-        return self.__edit_item_state(feed_item_id, 'read', self.__ADD_ACTION, feed_url)
+        if self.__write_queue is not None:
+            return self.__queue_edit(feed_item_id, READ, True, feed_url)
+        return self.__edit_item_state(feed_item_id, self.__STATE_READ_ITEMS % self.__user(),
+            self.__ADD_ACTION, feed_url)
 
     def get_unread_count(self, get_all=False):
         '''
@@ -327,41 +711,97 @@ class GoogleReaderClient(restClient):
             output=self.__response_format,
             all=str(get_all).lower())
 
-    def get_items_by_state_or_label(self, state, num, order='n', exclude_state=None, label=None, feed_id=None, use_atom=False):
+    def get_items_by_state_or_label(self, state, num, order='n', exclude_state=None, label=None, feed_id=None, use_atom=False, continuation=None, stream=False, start_time=None):
         ''' Retrieves items by specified state or label using specified feed 
-        or reading list if not specified'''
+        or reading list if not specified. With stream set an ItemStream is
+        returned that decodes items as the response is read. start_time
+        (seconds since the epoch) limits results to items crawled since'''
         if label is None:
             if feed_id is not None and use_atom is True:
                 resource_url = self.__ATOM_FEED_URL % feed_id
             else:
-                resource_url = self.__FEED_ITEMS_BY_STATE_URL % (self.__user_id, state)
+                resource_url = self.__FEED_ITEMS_BY_STATE_URL % (self.__user(), state)
         else:
             if feed_id is not None and use_atom is True:
                 resource_url = self.__ATOM_FEED_URL % feed_id
             else:
-                resource_url = self.__FEED_ITEMS_BY_LABEL_URL % (self.__user_id, label)
+                resource_url = self.__FEED_ITEMS_BY_LABEL_URL % (self.__user(), label)
 
+        params = {}
         if exclude_state is not None:
-            response = self.request(
-                'GET',
-                resource_url,
-                headers=self.__build_request_headers(),
-                xt='user/-/state/com.google/%s' % exclude_state,
-                r=order,
-                n=num,
-                ck=str(int(time())),
-                client=self.__client_id)
-        else:
-            response = self.request(
-                'GET',
-                resource_url,
-                headers=self.__build_request_headers(),
-                r=order,
-                n=num,
-                ck=str(int(time())),
-                client=self.__client_id)
+            params['xt'] = 'user/-/state/com.google/%s' % exclude_state
+        if continuation is not None:
+            params['c'] = continuation
+        if start_time is not None:
+            params['ot'] = start_time
+        return self._then(self.request(
+            'GET',
+            resource_url,
+            headers=self.__build_request_headers(),
+            r=order,
+            n=num,
+            ck=str(int(time())),
+            client=self.__client_id,
+            stream=stream,
+            **params), self.__index_items)
+
+    def __index_items(self, response):
+        '''Adds the items of a decoded stream response to the search index'''
+        if self.__search_index is not None and isinstance(response, dict) and 'items' in response:
+            self.__search_index.add_items(response['items'])
         return response
 
+    def iter_items(self, state=None, label=None, feed_id=None, page_size=100,
+        limit=None, order='n', exclude_state=None, prefetch=False, stream=False,
+        use_atom=False):
+        '''Yields the items of a state, label or feed stream one at a time,
+        following continuation tokens up to limit'''
+        from atom import AtomItemStream
+        def fetch(continuation, num):
+            return self._fetch_page(state, label, feed_id, num, order,
+                exclude_state, continuation, stream, use_atom)
+
+        count = 0
+        page = fetch(None, page_size if limit is None else min(page_size, limit))
+        while True:
+            if isinstance(page, (ItemStream, AtomItemStream)):
+                items, continuation = page, None
+            elif isinstance(page, dict):
+                items, continuation = page['items'], page.get('continuation')
+            else:
+                raise RestError(page)
+            page = None
+            fetch_next = None
+            if prefetch and continuation is not None:
+                num = page_size if limit is None else min(page_size, limit - count - len(items))
+                if num > 0:
+                    fetch_next = in_background(lambda continuation=continuation, num=num: fetch(continuation, num))
+            try:
+                for item in items:
+                    if limit is not None and count >= limit:
+                        return
+                    count += 1
+                    yield item
+            finally:
+                if isinstance(items, (ItemStream, AtomItemStream)):
+                    items.close()
+            if isinstance(items, (ItemStream, AtomItemStream)):
+                continuation = items.fields.get('continuation')
+            items = None
+            num = page_size if limit is None else min(page_size, limit - count)
+            if continuation is None or num <= 0:
+                return
+            page = fetch_next() if fetch_next is not None else fetch(continuation, num)
+
+    def _fetch_page(self, state, label, feed_id, num, order, exclude_state, continuation, stream=False, use_atom=False):
+        '''Requests one page of a state, label or feed stream for iter_items'''
+        if feed_id is not None and state is None and label is None:
+            return self.get_feed_contents(feed_id, num, order, use_atom,
+                continuation=continuation, stream=stream)
+        return self.get_items_by_state_or_label(state or 'reading-list',
+            num, order, exclude_state, label, feed_id, use_atom,
+            continuation=continuation, stream=stream)
+
     def get_all_items(self, num=20, order='n', label=None, feed_id=None, use_atom=False):
         '''
         Get all items
@@ -436,87 +876,210 @@ class GoogleReaderClient(restClient):
         '''Search within read items for query'''
         return self.__search(
             query,
-            self.__STATE_READ_ITEMS % self.__user_id,
+            self.__STATE_READ_ITEMS % self.__user(),
             num)
 
     def search_starred_items(self, query, num=20):
         '''Search within starred items for query'''
         return self.__search(
             query,
-            self.__STATE_STARRED_ITEMS % self.__user_id,
+            self.__STATE_STARRED_ITEMS % self.__user(),
             num)
 
     def search_shared_items(self, query, num=20):
         '''Search within shared items for query'''
         return self.__search(
             query,
-            self.__STATE_SHARED_ITEMS % self.__user_id,
+            self.__STATE_SHARED_ITEMS % self.__user(),
             num)
 
     def search_followed_items(self, query, num=20):
         '''Search followed people for query'''
         return self.__search(
             query,
-            self.__STATE_FOLLOWED_ITEMS % self.__user_id,
+            self.__STATE_FOLLOWED_ITEMS % self.__user(),
             num)
 
     def search_folder(self, query, folder, num=20):
         '''Search within specified folder for query'''
         return self.__search(
             query,
-            self.__STATE_FOLDER_ITEMS % (self.__user_id, folder),
+            self.__STATE_FOLDER_ITEMS % (self.__user(), folder),
             num)
 
     def search_notes(self, query, num=20):
         '''Search within notes for query'''
         return self.__search(
             query,
-            self.__STATE_NOTE_ITEMS % self.__user_id,
+            self.__STATE_NOTE_ITEMS % self.__user(),
             num)
 
     def search_feed(self, query, feed_id, num=20):
         '''Search within specified feed for query'''
-        return self.__get_search_contents(self.__search(query, feed_id, num)['results'])
+        return self._then(self.__search(query, feed_id, num),
+            lambda response: self.__get_search_contents(response['results']))
 
     def __get_search_contents(self, content_ids):
-        self.__update_token()
-        self.debug(True)
+        return self.__post_with_token(
+            self.__SEARCH_CONTENTS_URL % (str(int(time())), self.__client_id),
+            urlencode([('i', i['id']) for i in content_ids]),
+            self.__FORM_HEADERS)
+
+    def search(self, query, scope='all', target=None, num=20, chunk_size=20, concurrency=4):
+        '''Searches scope for query, yielding the matching items with their
+        contents in order of arrival'''
+        ids = self._search_ids(query, scope, target, num, stream='results')
+        if not isinstance(ids, ItemStream):
+            raise RestError(ids)
+        # the ids are read on the worker threads, guard against closing mid read
+        lock = threading.Lock()
+        def chunks():
+            chunk = []
+            while True:
+                with lock:
+                    result = next(ids, None)
+                if result is None:
+                    break
+                chunk.append(str(result['id']))
+                if len(chunk) == chunk_size:
+                    yield tuple(chunk)
+                    chunk = []
+            if chunk:
+                yield tuple(chunk)
+        try:
+            for result in fan_out(self._hydrate, chunks(), concurrency):
+                if result.error is not None:
+                    raise result.error
+                for item in result.result:
+                    yield item
+        finally:
+            with lock:
+                ids.close()
+
+    def search_local(self, query, scope='all', target=None, num=20, fallback=True):
+        '''Searches the local 'search_index' for query, falling back to search
+        when nothing matches and fallback is set'''
+        if self.__search_index is not None:
+            items = self.__search_index.search(query, scope, target, num)
+            if items or not fallback:
+                return items
+        elif not fallback:
+            raise ValueError('search_local needs the search_index config key or fallback')
+        return list(islice(self.search(query, scope, target, num), num))
+
+    def get_search_index(self):
+        '''Returns the local search index, or None without the 'search_index' config key'''
+        return self.__search_index
+
+    def _search_ids(self, query, scope, target, num, stream=False):
+        '''Requests the ids of the items matching query within scope'''
+        if scope not in self.__SEARCH_SCOPES:
+            raise ValueError('Unknown search scope %s' % scope)
+        params = {}
+        search_type = self.__SEARCH_SCOPES[scope]
+        if scope == 'feed':
+            params['s'] = target
+        elif search_type is not None:
+            params['s'] = search_type % ((self.__user(), target) if scope == 'folder' else self.__user())
         return self.request(
-            'POST',
+            'GET',
+            self.__SEARCH_URL,
+            headers=self.__build_request_headers(),
+            q=query,
+            num=num,
+            client=self.__client_id,
+            output='json',
+            stream=stream,
+            **params)
+
+    def _hydrate(self, ids):
+        '''
+        Returns the items with the given search ids, fetching from
+        stream/items/contents only those not in the hydrated item cache
+        '''
+        items = {}
+        with self.__hydrated_lock:
+            for item_id in ids:
+                if item_id in self.__hydrated:
+                    items[item_id] = self.__hydrated.pop(item_id)
+                    self.__hydrated[item_id] = items[item_id]
+        missing = [i for i in ids if i not in items]
+        def store(response):
+            if missing:
+                if not isinstance(response, dict):
+                    raise RestError(response)
+                with self.__hydrated_lock:
+                    for item in response['items']:
+                        item_id = _short_id(item['id'])
+                        items[item_id] = self.__hydrated[item_id] = item
+                    while len(self.__hydrated) > self.__search_cache_size:
+                        self.__hydrated.popitem(last=False)
+                self.__index_items(response)
+            return [items[i] for i in ids if i in items]
+        if not missing:
+            return self._then(None, store)
+        return self._then(self.__post_with_token(
             self.__SEARCH_CONTENTS_URL % (str(int(time())), self.__client_id),
-            body = '%s&T=%s' %( ''.join(['i=%s&' % (i['id']) for i in content_ids]), self.__token),
-            headers=self.__build_request_headers({'Content-Type':'application/x-www-form-urlencoded; charset=utf-8'})
-        )
+            urlencode([('i', i) for i in missing]),
+            self.__FORM_HEADERS), store)
 
     def export_OPML(self):
-        return self.request(
+        return self._then(self.request(
             'GET',
             self.__EXPORT_OPML,
             headers=self.__build_request_headers(),
-            deserialize=False).body
+            deserialize=False), lambda response: response.body)
 
 # do we need these as we're just essentially getting a wrapper around a python dict?
 class GoogleFeedReader(object):
     """
         Essentially a collection of GoogleReaderFeedItem objects?
     """
-    def __init__(self, g):
+    def __init__(self, g, store=None):
+        '''store is an optional store.ItemStore serving items locally'''
         self.__client = g
+        self.__store = store
+        self.__scheduler = None
+        # shared with the feeds and folders, filled on first use
+        self.__index = LabelIndex()
+        self.__index_loaded = False
         self.num_unread = self.get_unread_number()
         self.unread_items = {}
         self.feeds = {}
-        
+
+    def get_label_index(self, refresh=False):
+        """
+        Returns the labelindex.LabelIndex of the subscriptions and labels,
+        loaded from the subscription and tag lists on first use, or again
+        when refresh is set, bypassing the response cache. Label edits made
+        through the feeds and folders of this reader update it as they
+        succeed
+        """
+        if refresh:
+            self.__client.invalidate_lists()
+        if refresh or not self.__index_loaded:
+            subscriptions = self.__client.get_subscription_list()
+            tags = self.__client.get_tag_list()
+            for response in (subscriptions, tags):
+                if not isinstance(response, dict):
+                    raise RestError(response)
+            self.__index.load(subscriptions['subscriptions'], tags['tags'])
+            self.__index_loaded = True
+        return self.__index
+
     def get_tags(self):
-        """docstring for get_tags"""
-        tags = []
-        gTags = self.__client.get_tag_list()
-        for t in gTags['tags']:
-            tags.append(GoogleReaderFolder(t, self.__client))
-        return tags
-    
+        """Returns a GoogleReaderFolder per tag, from the label index"""
+        return [GoogleReaderFolder(t, self.__client, self.__index) for t in self.get_label_index().tags()]
+
     def get_subscriptions(self):
-        """docstring for get_subscriptions"""
-        pass
+        """Returns a GoogleReaderFeed per subscription, from the label index"""
+        return [self.__add_feed(s) for s in self.get_label_index().feeds()]
+
+    def get_feeds_by_label(self, label):
+        """Returns the GoogleReaderFeeds with a label, from the label index"""
+        index = self.get_label_index()
+        subscriptions = [index.get_feed(feed_id) for feed_id in index.feeds_of(label)]
+        return [self.__add_feed(s) for s in subscriptions if s is not None]
     
     def export(self, filename):
         """docstring for export"""
@@ -531,45 +1094,107 @@ class GoogleFeedReader(object):
                 return u['count']
         return unread_counts['max']
 
-    def get_unread_items(self, num=20):
-        """docstring for get_unread_items"""
-        unread_items = self.__client.get_unread_items(num)
-        for u in unread_items['items']:
+    def get_unread_items(self, num=20, label=None, sync=True):
+        """
+        Gets unread items. With a store, items crawled since the last sync
+        are fetched (unless sync is False) and the rest are read locally
+        """
+        if self.__store is not None:
+            if sync:
+                self.sync()
+            items = self.__store.get_items(label=label, unread_only=True, num=num)
+        else:
+            items = self.__client.get_unread_items(num, label=label)['items']
+        for u in items:
             self.__add_feed(u['origin'])
             self.unread_items[u['id']] = GoogleReaderFeedItem(u, self.__client)
         return self.unread_items
 
+    def sync(self):
+        """Fetches items crawled since the last sync into the store"""
+        return self.__store.sync(self.__client)
+
+    def refresh(self, **options):
+        """
+        Fetches the feeds whose newest item changed since they were last
+        fetched, see scheduler.RefreshScheduler for the options, which are
+        used when first called. Returns the contents by feed id
+        """
+        if self.__scheduler is None:
+            self.__scheduler = RefreshScheduler(self.__client, **options)
+        contents = self.__scheduler.poll()
+        counts = self.__scheduler.counts
+        for stream_id in counts:
+            if stream_id.endswith('/reading-list'):
+                self.num_unread = counts[stream_id]
+        for feed_id in contents:
+            items = contents[feed_id]['items']
+            if self.__store is not None:
+                self.__store.add_items(items)
+            for u in items:
+                if 'origin' in u:
+                    self.__add_feed(u['origin'])
+                if not any(c.endswith('/state/com.google/read') for c in u.get('categories', [])):
+                    self.unread_items[u['id']] = GoogleReaderFeedItem(u, self.__client)
+        return contents
+
+    def mark_as_read(self, item_ids):
+        """Marks items as read, updating the store"""
+        item_ids = list(item_ids)
+        results = self.__client.mark_as_read_bulk(item_ids)
+        done = [i for batch, r in results if r == 'OK' for i in batch]
+        if self.__store is not None:
+            self.__store.set_read(done)
+        for item_id in done:
+            self.unread_items.pop(item_id, None)
+        return len(done) == len(item_ids)
+
     def subscribe(self, feed_url):
-        return self.__add_feed(self.__client.subscribe_to_feed('', feed_url, True))
-        
+        feed = self.__client.subscribe_to_feed('', feed_url, True)
+        self.__index.add_feed({'id': feed['streamId']})
+        return self.__add_feed(feed)
+
     def __add_feed(self, feed):
-        """Add feed"""
-        if feed['streamId'] not in self.feeds:
-            self.feeds[feed['streamId']] = GoogleReaderFeed(feed, self.__client)
-        return self.feeds[feed['streamId']]
+        """Add feed, given as an item origin or a subscription"""
+        stream_id = feed['streamId'] if 'streamId' in feed else feed['id']
+        if stream_id not in self.feeds:
+            self.feeds[stream_id] = GoogleReaderFeed(feed, self.__client, self.__index)
+        return self.feeds[stream_id]
             
 class GoogleReaderFeed(object):
     """GoogleReaderFeed"""
-    def __init__(self, feed, g):
-        '''get attributes of config and store?'''
+    def __init__(self, feed, g, index=None):
+        '''
+        feed is an item origin or a subscription. index is the reader's
+        labelindex.LabelIndex, kept in step with the edits made here
+        '''
         self.__client = g
+        self.__index = index
         self.data = {}
         self.data['title'] = feed['title'] if 'title' in feed else ''
-        self.data['streamId'] = feed['streamId'] if 'streamId' in feed else None
+        self.data['streamId'] = feed['streamId'] if 'streamId' in feed else feed.get('id')
         self.data['htmlUrl'] = feed['htmlUrl'] if 'htmlUrl' in feed else ''
         self.data['categories'] = {}
-        
+        for category in feed.get('categories', []):
+            if '/label/' in category['id']:
+                label = category.get('label') or category['id'].split('/label/', 1)[1]
+                self.data['categories'][label] = label
+
     def rename(self, new_title):
         r = self.__client.edit_feed_title(new_title, self.data['streamId'])
         if r == 'OK':
             self.data['title'] = new_title
+            if self.__index is not None:
+                self.__index.rename_feed(self.data['streamId'], new_title)
             return True
         else:
             return False
     
     def unsubscribe(self):
         r = self.__client.unsubscribe_from_feed(self.data['title'], self.data['streamId'])
-        return True if r == 'OK' else False        
+        if r == 'OK' and self.__index is not None:
+            self.__index.remove_feed(self.data['streamId'])
+        return True if r == 'OK' else False
 
     def get_details(self, get_trend_info=False):
         r = self.__client.get_feed_details(self.data['streamId'], get_trend_info)
@@ -587,6 +1212,8 @@ class GoogleReaderFeed(object):
         r = self.__client.add_label_to_feed(self.data['title'], self.data['streamId'], label)
         if r == 'OK':
             self.data['categories'][label] = label
+            if self.__index is not None:
+                self.__index.add(self.data['streamId'], label)
             return True
         else:
             return False
@@ -594,7 +1221,9 @@ class GoogleReaderFeed(object):
     def remove_label(self, label):
         r = self.__client.remove_label_from_feed(self.data['title'], self.data['streamId'], label)
         if r == 'OK':
-            del self.data['categories'][label]
+            self.data['categories'].pop(label, None)
+            if self.__index is not None:
+                self.__index.remove(self.data['streamId'], label)
             return True
         else: 
             return False
@@ -603,20 +1232,85 @@ class GoogleReaderFeed(object):
         return self.__client.search_feed(query, self.data['streamId'], num)
 
     def get_categories(self):
+        '''Returns the labels of the feed, from the label index once it knows the feed'''
+        if self.__index is not None and self.data['streamId'] in self.__index:
+            return dict((label, label) for label in self.__index.labels_of(self.data['streamId']))
         return self.data['categories']
 
 class GoogleReaderFeedItem(object):
-    '''GoogleReader Feed Item'''
-    
+    '''
+    GoogleReader Feed Item. Fields are held in slots instead of a per item
+    dict, repeated strings such as category ids and the origin stream id are
+    interned and large summary and content bodies are kept zlib compressed
+    until read. data rebuilds the dict of fields as found in the response
+    '''
+    __slots__ = ('__client', 'id', 'title', 'author', 'published', 'updated',
+        'crawlTimeMsec', 'stream_id', 'categories', 'alternate', 'comments',
+        'annotations', 'likingUsers', '__summary', '__content')
+    # bodies at least this many characters long are compressed
+    COMPRESS_SIZE = 256
+
     def __init__(self, item, g):
         '''get attributes of config and store?'''
         # ['origin', 'updated', 'author', 'title', 'alternate', 'comments', 'summary', 'crawlTimeMsec', 'annotations', 'published', 'id', 'categories', 'likingUsers']
         self.__client = g
-        self.data = {}
-        for p in ['updated', 'author', 'title', 'alternate', 'comments', 'summary', 'crawlTimeMsec', 'annotations', 'published', 'id', 'categories', 'likingUsers']:
+        for p in ['id', 'title', 'published', 'updated', 'crawlTimeMsec']:
             if p in item:
-                self.data[p] = item[p]
-            
+                setattr(self, p, item[p])
+        if 'author' in item:
+            self.author = _intern(item['author'])
+        if 'origin' in item:
+            self.stream_id = _intern(item['origin'].get('streamId'))
+        if 'categories' in item:
+            self.categories = tuple([_intern(c) for c in item['categories']])
+        if 'alternate' in item:
+            self.alternate = tuple([(a.get('href'), _intern(a.get('type', 'text/html'))) for a in item['alternate']])
+        for p in ['comments', 'annotations', 'likingUsers']:
+            if p in item:
+                setattr(self, p, tuple(item[p]))
+        if 'summary' in item:
+            self.__summary = self.__pack(item['summary'])
+        if 'content' in item:
+            self.__content = self.__pack(item['content'])
+
+    def __pack(self, body):
+        '''Compresses the content of a summary or content field if large'''
+        content = body.get('content', '')
+        if len(content) < self.COMPRESS_SIZE:
+            return (_intern(body.get('direction', 'ltr')), content, False)
+        return (_intern(body.get('direction', 'ltr')), zlib.compress(content.encode('utf-8')), True)
+
+    def __unpack(self, packed):
+        '''Rebuilds a summary or content field'''
+        direction, content, compressed = packed
+        if compressed:
+            content = zlib.decompress(content).decode('utf-8')
+        return {'direction': direction, 'content': content}
+
+    def get_summary(self):
+        return self.__unpack(self.__summary)
+    summary = property(get_summary)
+
+    def get_content(self):
+        return self.__unpack(self.__content)
+    content = property(get_content)
+
+    def get_data(self):
+        '''Returns the item fields as a dict'''
+        data = {}
+        for p in ['id', 'title', 'author', 'published', 'updated', 'crawlTimeMsec', 'summary', 'content', 'categories']:
+            if hasattr(self, p):
+                data[p] = getattr(self, p)
+        if 'categories' in data:
+            data['categories'] = list(data['categories'])
+        if hasattr(self, 'alternate'):
+            data['alternate'] = [{'href': href, 'type': t} for href, t in self.alternate]
+        for p in ['comments', 'annotations', 'likingUsers']:
+            if hasattr(self, p):
+                data[p] = list(getattr(self, p))
+        return data
+    data = property(get_data)
+
     def set_state(self, state):
         pass
 
@@ -631,17 +1325,27 @@ class GoogleReaderFeedItem(object):
 
 class GoogleReaderFolder(object):
     '''GoogleReaderFolder'''
-    def __init__(self, folder, g):
-        '''get attributes of config and store?'''
+    def __init__(self, folder, g, index=None):
+        '''folder is a tag list entry. index is the reader's labelindex.LabelIndex'''
         self.__client = g
+        self.__index = index
+        self.data = {}
         self.data['id'] = folder['id']
-        self.data['sortid'] = folder['sortid']
-        self.data['title'] = folder['title'] if 'title' in folder else self.id.split('/').pop()
+        self.data['sortid'] = folder['sortid'] if 'sortid' in folder else None
+        self.data['title'] = folder['title'] if 'title' in folder else folder['id'].split('/').pop()
+
+    def get_feeds(self):
+        '''Returns the ids of the feeds in the folder, from the label index'''
+        return self.__index.feeds_of(self.data['id']) if self.__index is not None else frozenset()
 
     def set_public(self, is_public):
         r = self.__client.edit_folder_or_tag(self.data['id'], is_public)
+        if r == 'OK' and self.__index is not None:
+            self.__index.set_shared(self.data['id'], is_public)
         return True if r == 'OK' else False
 
     def delete(self):
         r = self.__client.delete_tag(self.data['id'])
-        return True if r == 'OK' else False
\ No newline at end of file
+        if r == 'OK' and self.__index is not None:
+            self.__index.remove_label(self.data['id'])
+        return True if r == 'OK' else False
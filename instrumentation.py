@@ -0,0 +1,161 @@
+'''Per request instrumentation hooks and metric sinks'''
+
+import bisect
+import re
+import threading
+try:
+    from urlparse import urlsplit
+except ImportError:
+    from urllib.parse import urlsplit
+
+# phases of a request timed in a RequestEvent
+PHASES = ('dns', 'connect', 'tls', 'ttfb', 'deserialize', 'total')
+
+# upper bounds in seconds of the latency histogram buckets
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+
+# paths ending in a stream id, reported without it
+_STREAM_PATH = re.compile(r'^(/api/0/stream/contents|/atom)/.*$')
+
+
+def endpoint_name(uri):
+    '''Returns the API path of uri without the stream id, eg /api/0/stream/contents'''
+    path = urlsplit(uri).path
+    if path.startswith('/reader/'):
+        path = path[len('/reader'):]
+    return _STREAM_PATH.sub(r'\1', path)
+
+
+class RequestEvent(object):
+    '''
+    Measurements of one request passed to the hooks. Phases that were not
+    measured, eg the connection phases with the restkit transport or
+    deserialize for a streamed response, are None. error is the exception
+    raised by the transport, if any
+    '''
+    __slots__ = ('method', 'endpoint', 'status', 'bytes_out', 'bytes_in', 'error') + PHASES
+
+    def __init__(self, method, endpoint):
+        self.method = method
+        self.endpoint = endpoint
+        self.status = None
+        self.bytes_out = 0
+        self.bytes_in = None
+        self.error = None
+        for phase in PHASES:
+            setattr(self, phase, None)
+
+    def __repr__(self):
+        return 'RequestEvent(%s %s, status=%s, total=%s)' % (self.method, self.endpoint, self.status, self.total)
+
+
+class HistogramSink(object):
+    '''
+    Hook aggregating events into fixed bucket latency histograms per
+    endpoint and phase, plus request counts by status and byte totals.
+    Recording an event costs a bisect per measured phase under a lock
+    '''
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.__lock = threading.Lock()
+        self.__histograms = {}
+        self.__requests = {}
+        self.__bytes = {}
+
+    def __call__(self, event):
+        with self.__lock:
+            for phase in PHASES:
+                value = getattr(event, phase)
+                if value is None:
+                    continue
+                histogram = self.__histograms.get((event.endpoint, phase))
+                if histogram is None:
+                    histogram = self.__histograms[(event.endpoint, phase)] = [[0] * len(self.buckets), 0.0, 0]
+                histogram[0][bisect.bisect_left(self.buckets, value)] += 1
+                histogram[1] += value
+                histogram[2] += 1
+            status = event.status if event.error is None else 'error'
+            self.__requests[(event.endpoint, status)] = self.__requests.get((event.endpoint, status), 0) + 1
+            for direction, size in (('out', event.bytes_out), ('in', event.bytes_in)):
+                if size:
+                    self.__bytes[(event.endpoint, direction)] = self.__bytes.get((event.endpoint, direction), 0) + size
+
+    def percentile(self, endpoint, phase, q):
+        '''
+        Returns the upper bound of the bucket holding the q (0 to 1)
+        quantile of phase for endpoint, or None without measurements
+        '''
+        with self.__lock:
+            histogram = self.__histograms.get((endpoint, phase))
+            if histogram is None:
+                return None
+            counts, count = histogram[0], histogram[2]
+            rank = q * count
+            seen = 0
+            for bound, n in zip(self.buckets, counts):
+                seen += n
+                if seen >= rank and n:
+                    return bound
+        return self.buckets[-1]
+
+    def snapshot(self):
+        '''
+        Returns a copy of the data: 'histograms' maps (endpoint, phase) to
+        (bucket counts, sum, count), 'requests' maps (endpoint, status) to
+        a count and 'bytes' maps (endpoint, 'in' or 'out') to a byte total
+        '''
+        with self.__lock:
+            return {
+                'histograms': dict((k, (list(v[0]), v[1], v[2])) for k, v in self.__histograms.items()),
+                'requests': dict(self.__requests),
+                'bytes': dict(self.__bytes)}
+
+    def reset(self):
+        with self.__lock:
+            self.__histograms = {}
+            self.__requests = {}
+            self.__bytes = {}
+
+
+class PrometheusExporter(HistogramSink):
+    '''
+    HistogramSink rendering its data in the Prometheus text exposition
+    format, for serving from a /metrics handler
+    '''
+    def __init__(self, prefix='googlereader', buckets=BUCKETS):
+        HistogramSink.__init__(self, buckets)
+        self.prefix = prefix
+
+    def render(self):
+        '''Returns the metrics as Prometheus text'''
+        data = self.snapshot()
+        name = self.prefix + '_request_duration_seconds'
+        lines = [
+            '# HELP %s Time spent per request phase.' % name,
+            '# TYPE %s histogram' % name]
+        for (endpoint, phase), (counts, total, count) in sorted(data['histograms'].items()):
+            labels = 'endpoint="%s",phase="%s"' % (_escape(endpoint), phase)
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                lines.append('%s_bucket{%s,le="%s"} %d' % (name, labels, '+Inf' if bound == float('inf') else repr(bound), cumulative))
+            lines.append('%s_sum{%s} %r' % (name, labels, total))
+            lines.append('%s_count{%s} %d' % (name, labels, count))
+        name = self.prefix + '_requests_total'
+        lines.extend([
+            '# HELP %s Requests by endpoint and status.' % name,
+            '# TYPE %s counter' % name])
+        for (endpoint, status), count in sorted(data['requests'].items(), key=lambda i: (i[0][0], str(i[0][1]))):
+            lines.append('%s{endpoint="%s",status="%s"} %d' % (name, _escape(endpoint), status, count))
+        name = self.prefix + '_transferred_bytes_total'
+        lines.extend([
+            '# HELP %s Request and response body bytes by endpoint.' % name,
+            '# TYPE %s counter' % name])
+        for (endpoint, direction), size in sorted(data['bytes'].items()):
+            lines.append('%s{endpoint="%s",direction="%s"} %d' % (name, _escape(endpoint), direction, size))
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    '''Escapes a Prometheus label value'''
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
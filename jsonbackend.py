@@ -0,0 +1,105 @@
+'''Selection of the json decoder used to deserialize responses'''
+
+import json
+from time import time
+
+# module name and the name of its decode function, in order of preference
+DECODERS = [
+    ('orjson', 'loads'),
+    ('simdjson', 'loads'),
+    ('ujson', 'loads'),
+    ('cjson', 'decode'),
+    ('simplejson', 'loads'),
+    ('json', 'loads'),
+    ('anyjson', 'deserialize')]
+
+_fastest = None
+
+
+def available_decoders():
+    '''Returns a dict of the installed decoders by module name'''
+    decoders = {}
+    for module_name, function_name in DECODERS:
+        try:
+            module = __import__(module_name)
+        except ImportError:
+            continue
+        decoders[module_name] = getattr(module, function_name)
+    return decoders
+
+
+def sample_payload(num_items=20):
+    '''Builds a json body shaped like a stream/contents response'''
+    items = []
+    for i in range(num_items):
+        items.append({
+            'crawlTimeMsec': '1262304000%03d' % i,
+            'id': 'tag:google.com,2005:reader/item/%016x' % i,
+            'categories': ['user/01234567890123456789/state/com.google/reading-list',
+                'user/01234567890123456789/label/news'],
+            'title': 'Item title number %s' % i,
+            'published': 1262304000 + i,
+            'updated': 1262304000 + i,
+            'alternate': [{'href': 'http://example.com/%s' % i, 'type': 'text/html'}],
+            'summary': {'direction': 'ltr', 'content': '<p>%s</p>' % ('Lorem ipsum dolor sit amet. ' * 40)},
+            'author': 'Author %s' % i,
+            'origin': {'streamId': 'feed/http://example.com/rss', 'title': 'Example', 'htmlUrl': 'http://example.com/'}})
+    return json.dumps({
+        'direction': 'ltr',
+        'id': 'user/01234567890123456789/state/com.google/reading-list',
+        'title': 'Reading list',
+        'updated': 1262304000,
+        'items': items,
+        'continuation': 'CLm1pcrKoZ8C'})
+
+
+def benchmark(payloads, decoders=None, repeat=20):
+    '''
+    Times each decoder over the payloads, returning a dict of the best total
+    seconds taken per decoder. Decoders failing on a payload are left out
+    '''
+    decoders = decoders or available_decoders()
+    timings = {}
+    for name, decode in decoders.items():
+        try:
+            best = None
+            for i in range(repeat):
+                start = time()
+                for payload in payloads:
+                    decode(payload)
+                elapsed = time() - start
+                best = elapsed if best is None else min(best, elapsed)
+            timings[name] = best
+        except Exception:
+            continue
+    return timings
+
+
+def fastest_decoder():
+    '''Returns the fastest installed decoder, benchmarked once per process'''
+    global _fastest
+    if _fastest is None:
+        decoders = available_decoders()
+        timings = benchmark([sample_payload()], decoders, repeat=5)
+        _fastest = decoders[min(timings, key=timings.get)]
+    return _fastest
+
+
+def select_decoder(decoder=None):
+    '''
+    Resolves the 'json_decoder' config value: a callable is used as is, a
+    module name from DECODERS selects that decoder and None or 'auto'
+    selects the fastest one installed
+    '''
+    if callable(decoder):
+        return decoder
+    if decoder is None or decoder == 'auto':
+        return fastest_decoder()
+    # import only the named module, the others can be slow to import
+    for module_name, function_name in DECODERS:
+        if module_name == decoder:
+            try:
+                return getattr(__import__(module_name), function_name)
+            except ImportError:
+                break
+    raise ValueError('%s is not an installed json decoder' % decoder)
@@ -0,0 +1,124 @@
+'''Incremental decoding of stream/contents json responses'''
+
+import codecs
+import json
+import re
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+class ItemStream(object):
+    '''
+    Iterates the 'items' array, or the array under key, of a json response
+    one item at a time while the body is still being read, so only the item being decoded and the
+    unread part of the current chunk are held in memory. The remaining top
+    level fields, eg 'continuation' and 'updated', are available from the
+    fields attribute once iteration has finished.
+    '''
+    def __init__(self, chunks, close=None, key='items'):
+        '''chunks is an iterable of str or utf-8 bytes pieces of the body'''
+        self.fields = {}
+        self.__key = key
+        self.__chunks = iter(chunks)
+        self.__close = close
+        self.__decoder = json.JSONDecoder()
+        self.__utf8 = codecs.getincrementaldecoder('utf-8')()
+        self.__buffer = ''
+        self.__pos = 0
+        self.__exhausted = False
+        self.__items = self.__parse()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self.__items)
+    next = __next__
+
+    def close(self):
+        '''Stops reading and releases the underlying connection'''
+        self.__items.close()
+        if self.__close is not None:
+            self.__close()
+            self.__close = None
+
+    def __parse(self):
+        '''Generator walking the top level object and its items array'''
+        self.__expect('{')
+        if self.__peek() == '}':
+            self.__pos += 1
+            return
+        while True:
+            key = self.__value()
+            self.__expect(':')
+            if key == self.__key:
+                self.__expect('[')
+                if self.__peek() == ']':
+                    self.__pos += 1
+                else:
+                    while True:
+                        yield self.__value()
+                        if self.__separator(']'):
+                            break
+            else:
+                self.fields[key] = self.__value()
+            if self.__separator('}'):
+                break
+        # drain the rest of the body so the connection can be reused
+        for chunk in self.__chunks:
+            pass
+        if self.__close is not None:
+            self.__close()
+            self.__close = None
+
+    def __peek(self):
+        '''Returns the next non whitespace character'''
+        while True:
+            self.__pos = _WHITESPACE.match(self.__buffer, self.__pos).end()
+            if self.__pos < len(self.__buffer):
+                return self.__buffer[self.__pos]
+            if not self.__read():
+                raise ValueError('Unexpected end of json stream')
+
+    def __expect(self, character):
+        if self.__peek() != character:
+            raise ValueError('Expected %r at %s' % (character, self.__pos))
+        self.__pos += 1
+
+    def __separator(self, closing):
+        '''Consumes a comma or the closing bracket, returning True for the latter'''
+        character = self.__peek()
+        self.__pos += 1
+        if character == closing:
+            return True
+        if character != ',':
+            raise ValueError('Expected , or %r at %s' % (closing, self.__pos))
+        return False
+
+    def __value(self):
+        '''Decodes the next json value, reading more of the body as needed'''
+        self.__peek()
+        while True:
+            try:
+                value, end = self.__decoder.raw_decode(self.__buffer, self.__pos)
+                # a number at the end of the buffer may continue in the next chunk
+                if end < len(self.__buffer) or self.__exhausted:
+                    break
+            except ValueError:
+                if self.__exhausted:
+                    raise
+            self.__read()
+        self.__pos = end
+        return value
+
+    def __read(self):
+        '''Appends the next chunk to the buffer, returning False at the end'''
+        for chunk in self.__chunks:
+            if not isinstance(chunk, type(u'')):
+                chunk = self.__utf8.decode(chunk)
+            if chunk:
+                self.__buffer = self.__buffer[self.__pos:] + chunk
+                self.__pos = 0
+                return True
+        self.__exhausted = True
+        return False
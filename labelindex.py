@@ -0,0 +1,134 @@
+'''In-memory index of subscriptions by label and labels by subscription'''
+
+import threading
+from collections import OrderedDict
+
+from subscriptions import feed_id, label_name
+
+
+class LabelIndex(object):
+    '''
+    Bidirectional index of the subscriptions and their labels (folders),
+    built from a subscription/list and a tag/list response, so folder views
+    and label filters are answered without a request. Labels are keyed by
+    name and feeds by stream id. Edits made through the client are applied
+    with the add, remove and other update methods to keep it current
+    '''
+    def __init__(self, subscriptions=None, tags=None):
+        self.__lock = threading.Lock()
+        self.load(subscriptions or [], tags or [])
+
+    def load(self, subscriptions, tags):
+        '''Rebuilds the index from the subscriptions and tags lists of the responses'''
+        feeds = OrderedDict()
+        feed_labels = {}
+        label_feeds = OrderedDict()
+        label_tags = OrderedDict()
+        for tag in tags:
+            label_tags[label_name(tag['id'])] = dict(tag)
+            if '/label/' in tag['id']:
+                label_feeds[label_name(tag['id'])] = set()
+        for subscription in subscriptions:
+            feeds[subscription['id']] = dict(subscription)
+            labels = feed_labels[subscription['id']] = set()
+            for category in subscription.get('categories', []):
+                if '/label/' in category['id']:
+                    label = category.get('label') or label_name(category['id'])
+                    labels.add(label)
+                    label_feeds.setdefault(label, set()).add(subscription['id'])
+        with self.__lock:
+            self.__feeds = feeds
+            self.__feed_labels = feed_labels
+            self.__label_feeds = label_feeds
+            self.__tags = label_tags
+
+    def labels_of(self, feed):
+        '''Returns the labels of a feed url or id'''
+        with self.__lock:
+            return frozenset(self.__feed_labels.get(feed_id(feed), ()))
+
+    def feeds_of(self, label):
+        '''Returns the ids of the feeds with a label, given as a name or tag id'''
+        with self.__lock:
+            return frozenset(self.__label_feeds.get(label_name(label), ()))
+
+    def labels(self):
+        '''Returns the label names, in tag list order'''
+        with self.__lock:
+            return list(self.__label_feeds)
+
+    def tags(self):
+        '''Returns the tag list entries, labels and states, as last loaded'''
+        with self.__lock:
+            return list(self.__tags.values())
+
+    def get_feed(self, feed):
+        '''Returns the subscription of a feed url or id, or None'''
+        with self.__lock:
+            return self.__feeds.get(feed_id(feed))
+
+    def feeds(self):
+        '''Returns the subscriptions, in subscription list order'''
+        with self.__lock:
+            return list(self.__feeds.values())
+
+    def __contains__(self, feed):
+        with self.__lock:
+            return feed_id(feed) in self.__feeds
+
+    def __len__(self):
+        with self.__lock:
+            return len(self.__feeds)
+
+    def add(self, feed, label):
+        '''Records that a feed was given a label'''
+        stream_id, label = feed_id(feed), label_name(label)
+        with self.__lock:
+            self.__feed_labels.setdefault(stream_id, set()).add(label)
+            self.__label_feeds.setdefault(label, set()).add(stream_id)
+
+    def remove(self, feed, label):
+        '''Records that a label was removed from a feed'''
+        stream_id, label = feed_id(feed), label_name(label)
+        with self.__lock:
+            self.__feed_labels.get(stream_id, set()).discard(label)
+            self.__label_feeds.get(label, set()).discard(stream_id)
+
+    def add_feed(self, subscription, labels=()):
+        '''Records a new subscription, a dict with at least its id'''
+        stream_id = feed_id(subscription['id'])
+        with self.__lock:
+            self.__feeds[stream_id] = dict(subscription, id=stream_id)
+            self.__feed_labels.setdefault(stream_id, set())
+        for label in labels:
+            self.add(stream_id, label)
+
+    def remove_feed(self, feed):
+        '''Records that a feed was unsubscribed'''
+        stream_id = feed_id(feed)
+        with self.__lock:
+            self.__feeds.pop(stream_id, None)
+            for label in self.__feed_labels.pop(stream_id, ()):
+                self.__label_feeds.get(label, set()).discard(stream_id)
+
+    def rename_feed(self, feed, title):
+        '''Records a new feed title'''
+        with self.__lock:
+            subscription = self.__feeds.get(feed_id(feed))
+            if subscription is not None:
+                subscription['title'] = title
+
+    def remove_label(self, label):
+        '''Records that a label was deleted, removing it from every feed'''
+        label = label_name(label)
+        with self.__lock:
+            for stream_id in self.__label_feeds.pop(label, ()):
+                self.__feed_labels[stream_id].discard(label)
+            self.__tags.pop(label, None)
+
+    def set_shared(self, label, shared):
+        '''Records that a label was made public or private'''
+        with self.__lock:
+            tag = self.__tags.get(label_name(label))
+            if tag is not None:
+                tag['shared'] = shared
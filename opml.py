@@ -0,0 +1,47 @@
+'''Incremental parsing of OPML subscription lists'''
+
+from collections import OrderedDict
+
+
+def iter_opml(source):
+    '''
+    Yields (feed_url, title, folder) for each feed outline of an OPML
+    document, a path or file object, as it is parsed. folder is the title of
+    the innermost enclosing outline, or None for feeds at the top level.
+    Parsed outlines are dropped so memory stays flat for large documents
+    '''
+    try:
+        import xml.etree.cElementTree as ElementTree
+    except ImportError:
+        import xml.etree.ElementTree as ElementTree
+    folders = []
+    for event, element in ElementTree.iterparse(source, events=('start', 'end')):
+        if element.tag != 'outline':
+            continue
+        feed_url = element.get('xmlUrl')
+        if event == 'start':
+            title = element.get('title') or element.get('text')
+            if feed_url is None:
+                folders.append(title)
+            else:
+                yield feed_url, title or feed_url, folders[-1] if folders else None
+        else:
+            if feed_url is None:
+                folders.pop()
+            element.clear()
+
+
+def read_opml(source):
+    '''
+    Returns an OrderedDict, in document order, of the feeds of an OPML
+    document by url, each a dict of its title and the labels (folders) it
+    is listed under
+    '''
+    feeds = OrderedDict()
+    for feed_url, title, folder in iter_opml(source):
+        feed = feeds.get(feed_url)
+        if feed is None:
+            feed = feeds[feed_url] = {'title': title, 'labels': []}
+        if folder is not None and folder not in feed['labels']:
+            feed['labels'].append(folder)
+    return feeds
@@ -0,0 +1,278 @@
+'''Persistent HTTP connection pool usable as a restClient transport'''
+
+import select
+import socket
+import ssl
+import threading
+from time import time
+try:
+    import httplib
+    from urlparse import urlsplit
+    from urllib import urlencode
+except ImportError:
+    import http.client as httplib
+    from urllib.parse import urlsplit, urlencode
+
+# methods safe to resend when a kept alive socket turns out to be closed
+_RETRY_METHODS = ('GET', 'HEAD')
+
+
+def _dropped(connection):
+    '''Checks if the server closed an idle connection, which then reads as ready'''
+    if connection.sock is None:
+        return True
+    try:
+        return bool(select.select([connection.sock], [], [], 0)[0])
+    except (ValueError, socket.error):
+        return True
+
+
+class PoolTimeout(Exception):
+    '''Raised when no connection became free within the wait timeout'''
+    pass
+
+
+class HttpResponse(object):
+    '''
+    Response with the attributes restClient expects. Streamed responses
+    have no body; their content is read through chunks instead. timings
+    holds the seconds spent on the dns, connect, tls and ttfb (time to
+    first byte) phases, the first three only for a new connection
+    '''
+    def __init__(self, status, headers, body, chunks=None, timings=None):
+        self.status_int = status
+        self.headers = dict((k.lower(), v) for k, v in headers)
+        self.body = body
+        self.chunks = chunks
+        self.timings = timings
+
+
+class BodyReader(object):
+    '''Iterates a response body in chunks, releasing its connection at the end'''
+    def __init__(self, response, release, chunk_size=64 * 1024):
+        self.__response = response
+        self.__release = release
+        self.__chunk_size = chunk_size
+
+    def __iter__(self):
+        try:
+            while self.__release is not None:
+                chunk = self.__response.read(self.__chunk_size)
+                if not chunk:
+                    self.__done(not self.__response.will_close)
+                    break
+                yield chunk
+        except:
+            self.__done(False)
+            raise
+
+    def close(self):
+        '''Releases the connection, closing it if the body was not fully read'''
+        self.__done(False)
+
+    def __done(self, reusable):
+        if self.__release is not None:
+            self.__release(reusable)
+            self.__release = None
+
+
+class ConnectionPool(object):
+    '''
+    Keeps HTTP(S) connections alive between requests so that successive
+    calls to the same host skip the TCP and TLS handshakes. At most
+    max_connections sockets are opened per host; further requests wait for
+    one to be released. Idle sockets are closed after idle_timeout seconds.
+    A pool may be shared by several clients through the 'pool' config key.
+    '''
+    def __init__(self, max_connections=10, idle_timeout=60, keep_alive=True,
+        timeout=30, wait_timeout=None):
+        self.__max_connections = max_connections
+        self.__idle_timeout = idle_timeout
+        self.__keep_alive = keep_alive
+        self.__timeout = timeout
+        self.__wait_timeout = wait_timeout
+        self.__ssl_context = None
+        self.__idle = {}
+        self.__open = {}
+        self.__condition = threading.Condition()
+        self.__stats = {
+            'requests': 0,
+            'reused': 0,
+            'created': 0,
+            'wait_time': 0.0}
+
+    def request(self, method, uri, headers=None, body=None, stream=False, **params):
+        '''
+        Performs a request over a pooled connection. With stream set, a
+        successful response is returned before its body is read, see
+        HttpResponse.chunks
+        '''
+        parts = urlsplit(uri)
+        key = (parts.scheme, parts.hostname, parts.port)
+        path = parts.path or '/'
+        query = parts.query
+        if params:
+            query = '%s&%s' % (query, urlencode(params)) if query else urlencode(params)
+        if query:
+            path = '%s?%s' % (path, query)
+        headers = dict(headers or {})
+        if isinstance(body, dict):
+            body = urlencode(body)
+            headers.setdefault('Content-Type', 'application/x-www-form-urlencoded')
+        if not self.__keep_alive:
+            headers['Connection'] = 'close'
+
+        connection, reused = self.__acquire(key)
+        timings = {}
+        try:
+            if reused and method not in _RETRY_METHODS and _dropped(connection):
+                # writes are never resent, so skip a socket the server already closed
+                connection.close()
+                connection, reused = self.__connect(key), False
+            try:
+                if not reused:
+                    self.__open_socket(key, connection, timings)
+                start = time()
+                connection.request(method, path, body, headers)
+                response = connection.getresponse()
+            except (httplib.HTTPException, socket.error):
+                if not reused or method not in _RETRY_METHODS:
+                    raise
+                # the server closed an idle keep-alive socket, retry on a new one
+                connection.close()
+                connection = self.__connect(key)
+                self.__open_socket(key, connection, timings)
+                start = time()
+                connection.request(method, path, body, headers)
+                response = connection.getresponse()
+            timings['ttfb'] = time() - start
+            if stream and response.status == 200:
+                return HttpResponse(response.status, response.getheaders(), None,
+                    BodyReader(response, lambda reusable: self.__release(key, connection, reusable)),
+                    timings)
+            content = response.read()
+        except:
+            self.__release(key, connection, False)
+            raise
+        self.__release(key, connection, not response.will_close)
+        if not isinstance(content, str):
+            content = content.decode('utf-8')
+        return HttpResponse(response.status, response.getheaders(), content, timings=timings)
+
+    def stats(self):
+        '''Returns reuse ratio, total wait time and socket counts'''
+        with self.__condition:
+            stats = dict(self.__stats)
+            stats['open_sockets'] = sum(self.__open.values())
+            stats['idle_sockets'] = sum(len(c) for c in self.__idle.values())
+        stats['reuse_ratio'] = float(stats['reused']) / stats['requests'] if stats['requests'] else 0.0
+        return stats
+
+    def close(self):
+        '''Closes all idle connections'''
+        with self.__condition:
+            for key, idle in self.__idle.items():
+                for connection, last_used in idle:
+                    connection.close()
+                self.__open[key] -= len(idle)
+            self.__idle = {}
+            self.__condition.notify_all()
+
+    def __acquire(self, key):
+        '''Returns an idle connection for key or opens a new one'''
+        start = time()
+        connection = None
+        with self.__condition:
+            while True:
+                idle = self.__idle.get(key)
+                while idle:
+                    connection, last_used = idle.pop()
+                    if time() - last_used < self.__idle_timeout:
+                        break
+                    connection.close()
+                    connection = None
+                    self.__open[key] -= 1
+                if connection is not None or self.__open.get(key, 0) < self.__max_connections:
+                    break
+                remaining = None
+                if self.__wait_timeout is not None:
+                    remaining = self.__wait_timeout - (time() - start)
+                    if remaining <= 0:
+                        raise PoolTimeout('No free connection to %s' % key[1])
+                self.__condition.wait(remaining)
+            if connection is None:
+                self.__open[key] = self.__open.get(key, 0) + 1
+            self.__stats['requests'] += 1
+            self.__stats['wait_time'] += time() - start
+            if connection is not None:
+                self.__stats['reused'] += 1
+                return connection, True
+        try:
+            return self.__connect(key), False
+        except:
+            with self.__condition:
+                self.__open[key] -= 1
+                self.__condition.notify()
+            raise
+
+    def __connect(self, key):
+        '''Creates a new connection for key'''
+        scheme, host, port = key
+        connection_class = httplib.HTTPSConnection if scheme == 'https' else httplib.HTTPConnection
+        with self.__condition:
+            self.__stats['created'] += 1
+        return connection_class(host, port, timeout=self.__timeout)
+
+    def __open_socket(self, key, connection, timings):
+        '''Connects connection's socket, timing the dns, connect and tls phases'''
+        scheme, host, port = key
+        start = time()
+        addresses = socket.getaddrinfo(host, port or connection.default_port, 0, socket.SOCK_STREAM)
+        resolved = time()
+        sock = self.__connect_any(addresses)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        connected = time()
+        if scheme == 'https':
+            with self.__condition:
+                if self.__ssl_context is None:
+                    self.__ssl_context = ssl.create_default_context()
+            try:
+                sock = self.__ssl_context.wrap_socket(sock, server_hostname=host)
+            except:
+                sock.close()
+                raise
+        connection.sock = sock
+        timings['dns'] = resolved - start
+        timings['connect'] = connected - resolved
+        timings['tls'] = time() - connected
+
+    def __connect_any(self, addresses):
+        '''
+        Connects to the first reachable of the getaddrinfo results, eg
+        falling back from IPv6 to IPv4, as socket.create_connection does
+        '''
+        error = None
+        for family, socktype, proto, canonname, address in addresses:
+            sock = None
+            try:
+                sock = socket.socket(family, socktype, proto)
+                sock.settimeout(self.__timeout)
+                sock.connect(address)
+                return sock
+            except socket.error as e:
+                error = e
+                if sock is not None:
+                    sock.close()
+        if error is None:
+            error = socket.error('getaddrinfo returned no address')
+        raise error
+
+    def __release(self, key, connection, reusable):
+        '''Returns connection to the idle list or closes it'''
+        with self.__condition:
+            if reusable and self.__keep_alive:
+                self.__idle.setdefault(key, []).append((connection, time()))
+            else:
+                connection.close()
+                self.__open[key] -= 1
+            self.__condition.notify()
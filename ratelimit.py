@@ -0,0 +1,134 @@
+'''Client side rate limiting, retry policy and coalescing of requests'''
+
+import random
+import threading
+import time
+try:
+    from urlparse import urlsplit
+except ImportError:
+    from urllib.parse import urlsplit
+
+
+class TokenBucket(object):
+    '''
+    Allows rate requests per second on average with bursts of up to burst
+    requests. reserve takes a token and returns how long the caller must
+    wait before using it, so waiting can be done with time.sleep or
+    asyncio.sleep; acquire does the sleeping
+    '''
+    def __init__(self, rate, burst=None, clock=time.time):
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(1, rate))
+        self.__clock = clock
+        self.__tokens = self.burst
+        self.__updated = clock()
+        self.__lock = threading.Lock()
+
+    def reserve(self, tokens=1):
+        '''Takes tokens, returning the seconds to wait until they are available'''
+        with self.__lock:
+            now = self.__clock()
+            self.__tokens = min(self.burst, self.__tokens + (now - self.__updated) * self.rate)
+            self.__updated = now
+            self.__tokens -= tokens
+            return max(0.0, -self.__tokens / self.rate)
+
+    def acquire(self, tokens=1):
+        '''Blocks until tokens are available'''
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+
+class HostRateLimiter(object):
+    '''
+    A TokenBucket per host. Share one between clients, through the
+    'host_rate_limit' config key, to limit their combined rate to a host
+    '''
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst
+        self.__buckets = {}
+        self.__lock = threading.Lock()
+
+    def bucket(self, uri):
+        '''Returns the bucket of the host of uri'''
+        host = urlsplit(uri).netloc
+        with self.__lock:
+            bucket = self.__buckets.get(host)
+            if bucket is None:
+                bucket = self.__buckets[host] = TokenBucket(self.rate, self.burst)
+            return bucket
+
+
+class RetryPolicy(object):
+    '''
+    Decides whether a failed idempotent request is sent again and after how
+    long. Responses with a status in statuses and transport errors are
+    retried up to retries times, waiting a random time of up to
+    backoff * 2 ** attempt seconds (full jitter), capped at max_backoff, or
+    the Retry-After the server asked for
+    '''
+    STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(self, retries=3, backoff=0.5, max_backoff=30, statuses=STATUSES):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.statuses = statuses
+
+    def should_retry(self, attempt, response=None, error=None, errors=(EnvironmentError,)):
+        '''
+        Checks if attempt, counted from 0, may be followed by another. errors
+        are the exception types the transport raises for network failures
+        '''
+        if attempt >= self.retries:
+            return False
+        if error is not None:
+            return isinstance(error, errors)
+        return response.status_int in self.statuses
+
+    def delay(self, attempt, response=None):
+        '''Returns the seconds to wait before retrying attempt'''
+        retry_after = response.headers.get('retry-after') if response is not None else None
+        if retry_after is not None and retry_after.isdigit():
+            return min(float(retry_after), self.max_backoff)
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+
+class Coalescer(object):
+    '''
+    Runs one call per key at a time. Callers asking for a key already being
+    fetched wait for that call and share its result or exception, so the
+    result must not be mutated by callers. stats counts the calls made and
+    the callers that joined one
+    '''
+    def __init__(self):
+        self.__calls = {}
+        self.__lock = threading.Lock()
+        self.stats = {'calls': 0, 'coalesced': 0}
+
+    def do(self, key, func):
+        with self.__lock:
+            call = self.__calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.__calls[key] = {'done': threading.Event()}
+                self.stats['calls'] += 1
+            else:
+                self.stats['coalesced'] += 1
+        if not leader:
+            call['done'].wait()
+            if 'error' in call:
+                raise call['error']
+            return call['result']
+        try:
+            call['result'] = func()
+            return call['result']
+        except Exception as e:
+            call['error'] = e
+            raise
+        finally:
+            with self.__lock:
+                del self.__calls[key]
+            call['done'].set()
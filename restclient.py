@@ -1,13 +1,129 @@
-import anyjson
-import restkit
+from itertools import chain
+from time import sleep, time
+from fanout import in_background
+from jsonbackend import select_decoder
+from jsonstream import ItemStream
+from ratelimit import Coalescer, HostRateLimiter, RetryPolicy, TokenBucket
+try:
+    from urllib import urlencode
+except ImportError:
+    from urllib.parse import urlencode
+
+
+class RestError(Exception):
+    '''Raised when a request did not return a usable response'''
+    def __init__(self, response):
+        Exception.__init__(self, 'Unexpected response: %s' % getattr(response, 'status_int', response))
+        self.response = response
+
+
+def _atom_item_stream(chunks, close=None):
+    '''The default xml parser, importing atom on the first atom feed'''
+    from atom import AtomItemStream
+    return AtomItemStream(chunks, close)
 
 class restClient(object):
     """Client object for making requests."""
+    # default per-endpoint ttls used when the cache is configured by a dict
+    _CACHE_TTLS = {}
+
     def __init__(self, config):
-        """Sets up config and restkit based client"""
+        """
+        Sets up config. Requests are sent with a restkit client, which is
+        imported and created on the first request. If the 'pool' key holds a
+        ConnectionPool, or a dict of ConnectionPool options, requests are
+        sent over its persistent connections instead. The 'cache' key takes
+        a ResponseCache, a dict of its options or True to cache GET requests
+        to endpoints with a ttl. 'json_decoder' names the json module used
+        to decode responses, see jsonbackend.select_decoder, and 'xml_parser'
+        is called with the body chunks of atom feeds, see AtomItemStream.
+        'hooks' is a list of callables given a RequestEvent after every
+        request, see instrumentation.HistogramSink. See _setup_limits for
+        rate limiting, retries and coalescing
+        """
         self._config = config
-        self._client = restkit.RestClient()
-        return self
+        pool = config['pool'] if 'pool' in config else None
+        if isinstance(pool, dict):
+            from pool import ConnectionPool
+            pool = ConnectionPool(**pool)
+        self._pool = pool
+        self._transport_client = pool
+        self._setup_responses(config)
+        self.__shared = Coalescer()
+        self._setup_limits(config)
+
+    def _setup_responses(self, config):
+        '''Reads the 'cache', 'json_decoder', 'xml_parser' and 'hooks' keys, shared with asyncRestClient'''
+        cache = config['cache'] if 'cache' in config else None
+        if cache is True:
+            cache = {}
+        if isinstance(cache, dict):
+            from cache import ResponseCache
+            options = {'ttls': self._CACHE_TTLS}
+            options.update(cache)
+            cache = ResponseCache(**options)
+        self._cache = cache
+        decoder = config['json_decoder'] if 'json_decoder' in config else None
+        self._decode = self._select_decoder if decoder in (None, 'auto') else select_decoder(decoder)
+        self._xml_parser = config['xml_parser'] if 'xml_parser' in config else _atom_item_stream
+        self._hooks = list(config['hooks']) if 'hooks' in config else []
+
+    @property
+    def _client(self):
+        '''The transport, creating the restkit client on first use'''
+        if self._transport_client is None:
+            import restkit
+            self._transport_client = restkit.RestClient()
+        return self._transport_client
+
+    def _select_decoder(self, body):
+        '''
+        Stands in for _decode until the first json response is decoded, as
+        picking the fastest installed decoder benchmarks them
+        '''
+        self._decode = select_decoder(None)
+        return self._decode(body)
+
+    def _setup_limits(self, config):
+        '''
+        Reads the 'rate_limit' key, a TokenBucket or dict of its options
+        limiting the requests of this client (ie account), 'host_rate_limit',
+        a HostRateLimiter or dict of its options limiting requests per host,
+        'retry', a RetryPolicy, dict of its options or True to retry failed
+        GETs, and 'coalesce', set to share the result of a GET with identical
+        GETs made while it is in flight. Coalesced callers get the same
+        deserialized object
+        '''
+        rate_limit = config['rate_limit'] if 'rate_limit' in config else None
+        if isinstance(rate_limit, dict):
+            rate_limit = TokenBucket(**rate_limit)
+        self._rate_limit = rate_limit
+        host_rate_limit = config['host_rate_limit'] if 'host_rate_limit' in config else None
+        if isinstance(host_rate_limit, dict):
+            host_rate_limit = HostRateLimiter(**host_rate_limit)
+        self._host_rate_limit = host_rate_limit
+        retry = config['retry'] if 'retry' in config else None
+        if retry is True:
+            retry = {}
+        if isinstance(retry, dict):
+            retry = RetryPolicy(**retry)
+        self._retry = retry
+        self._coalescer = Coalescer() if 'coalesce' in config and config['coalesce'] else None
+
+    def _coalesce_key(self, uri, deserialize, headers, params):
+        '''Identifies identical GETs, ignoring the ck cache buster'''
+        return (uri, deserialize,
+            tuple(sorted((k, v) for k, v in params.items() if k != 'ck')),
+            tuple(sorted(headers.items())))
+
+    def _throttle_delay(self, uri):
+        '''Takes a token from the rate limits, returning the seconds to wait'''
+        wait = 0.0
+        if self._rate_limit is not None:
+            wait = self._rate_limit.reserve()
+        if self._host_rate_limit is not None:
+            wait = max(wait, self._host_rate_limit.bucket(uri).reserve())
+        return wait
 
     def _is_response(self, response, status_code):
         '''Checks if response status code is same as requested value'''
@@ -15,33 +131,228 @@ class restClient(object):
 
     def _deserialize_response(self, response):
         '''
-            Deserializes response into native python objects via anyjson or
-            via feedparser.parse method if xml. Xml parser can be overridden
-            via configuration using the 'xml_parser' key
+            Deserializes response into native python objects via the json decoder or
+            via the xml parser if an atom feed, giving a dict of the feed fields
+            and its 'items'. Xml parser can be overridden via configuration using
+            the 'xml_parser' key
         '''
         if self._is_response(response, 200):
             if (response.headers['content-type'].startswith('text/javascript') or response.headers['content-type'].startswith('text/html') and response.body.startswith('{')):
-                return anyjson.deserialize(response.body)   
-            elif response.headers['content-type'].startswith('text/xml'):
-                return response.body
+                return self._decode(response.body)
+            elif self.__is_xml(response) and self.__is_atom(response.body):
+                items = self._xml_parser([response.body])
+                page = {'items': list(items)}
+                page.update(getattr(items, 'fields', {}))
+                return page
             else:
                 return response.body
         return response
 
-    def request(self, method, uri, headers={}, body=None, deserialize=True, **params):
-        '''Wrapper method around restkit client. Deserializes response'''
-        if method == 'GET':
-            response = self._client.request(
-                method,
-                uri,
-                headers=headers,
-                **params)
-        elif method == 'POST':
-                response = self._client.request(
-                    method, 
-                    uri, 
-                    headers=headers, body=body)
+    def __is_xml(self, response):
+        '''Checks for an xml or atom content type'''
+        content_type = response.headers['content-type']
+        return content_type.startswith('text/xml') or content_type.startswith('application/atom+xml')
+
+    def __is_atom(self, head):
+        '''Checks if the start of an xml body is an atom feed'''
+        from atom import is_atom
+        return is_atom(head)
+
+    def _stream_response(self, response, key='items'):
+        '''
+        Returns an ItemStream decoding the items, or the array under key, of
+        a json response, or the xml parser's stream for an atom feed, as its
+        body is read. Only the connection pool transport streams bodies off
+        the socket; for others the stream decodes the already read body
+        '''
+        chunks = getattr(response, 'chunks', None)
+        if chunks is None:
+            if not self._is_response(response, 200):
+                return response
+            chunks, close = [response.body], None
+        else:
+            close = chunks.close
+        if response.headers['content-type'].startswith('text/javascript'):
+            return ItemStream(chunks, close, key)
+        if self.__is_xml(response):
+            chunks = iter(chunks)
+            head = next(chunks, u'')
+            chunks = chain([head], chunks)
+            if self.__is_atom(head):
+                return self._xml_parser(chunks, close)
+        if response.body is None:
+            body = [c if isinstance(c, type(u'')) else c.decode('utf-8') for c in chunks]
+            response.body = u''.join(body)
+        return self._deserialize_response(response)
+
+    def request(self, method, uri, headers={}, body=None, deserialize=True, stream=False, **params):
+        '''
+        Wrapper method around restkit client. Deserializes response, or with
+        stream set returns an ItemStream yielding its items as they are read.
+        stream may also name another array of the response to iterate
+        '''
+        if self._coalescer is not None and method == 'GET' and not stream:
+            return self._coalescer.do(self._coalesce_key(uri, deserialize, headers, params),
+                lambda: self.__request(method, uri, headers, body, deserialize, stream, params))
+        return self.__request(method, uri, headers, body, deserialize, stream, params)
+
+    def __request(self, method, uri, headers, body, deserialize, stream, params):
+        '''Sends a request, reporting it to the hooks'''
+        if not self._hooks:
+            return self.__handle(self.__send(method, uri, headers, body, stream, params), deserialize, stream)
+        from instrumentation import RequestEvent, endpoint_name
+        event = RequestEvent(method, endpoint_name(uri))
+        start = time()
+        try:
+            response = self.__send(method, uri, headers, body, stream, params)
+        except Exception as e:
+            event.error = e
+            event.total = time() - start
+            self._emit(event)
+            raise
+        received = time()
+        self._measure(event, response, body)
+        result = self.__handle(response, deserialize, stream)
+        if not stream:
+            event.deserialize = time() - received
+        event.total = time() - start
+        self._emit(event)
+        return result
+
+    def __handle(self, response, deserialize, stream):
+        '''Deserializes or streams a response as requested'''
+        if stream:
+            return self._stream_response(response, stream if stream is not True else 'items')
         return self._deserialize_response(response) if deserialize is True else response
 
+    def __send(self, method, uri, headers, body, stream, params):
+        '''Sends a request, through the cache if it has a ttl, returning its response'''
+        if method == 'GET':
+            ttl = self._cache.ttl_for(uri) if self._cache is not None else None
+            if ttl is not None and not stream:
+                return self.__cached_get(uri, headers, ttl, params)
+        return self.__transport(method, uri, headers, body, stream and self._pool is not None, params)
+
+    def __transport(self, method, uri, headers, body, stream, params):
+        '''
+        Sends a request over the transport once the rate limits allow it,
+        retrying GETs according to the retry policy
+        '''
+        retry = self._retry if method == 'GET' else None
+        attempt = 0
+        while True:
+            wait = self._throttle_delay(uri)
+            if wait > 0:
+                sleep(wait)
+            try:
+                if method == 'POST':
+                    return self._client.request(
+                        method,
+                        uri,
+                        headers=headers, body=body)
+                elif stream:
+                    response = self._client.request(
+                        method,
+                        uri,
+                        headers=headers,
+                        stream=True,
+                        **params)
+                else:
+                    response = self._client.request(
+                        method,
+                        uri,
+                        headers=headers,
+                        **params)
+            except Exception as e:
+                if retry is None or not retry.should_retry(attempt, error=e):
+                    raise
+                sleep(retry.delay(attempt))
+            else:
+                if retry is None or not retry.should_retry(attempt, response):
+                    return response
+                sleep(retry.delay(attempt, response))
+            attempt += 1
+
+    def __cached_get(self, uri, headers, ttl, params):
+        '''GETs uri through the response cache, revalidating stale entries'''
+        # a cache buster would give every request a new key
+        params.pop('ck', None)
+        key = self._cache.key(uri, params, headers)
+        entry, fresh = self._cache.get(key)
+        if not fresh:
+            if entry is not None:
+                headers = dict(headers)
+                headers.update(self._cache.validators(entry))
+            response = self.__transport('GET', uri, headers, None, False, params)
+            if response.status_int == 304 and entry is not None:
+                entry = self._cache.revalidated(key, ttl, entry)
+            elif response.status_int == 200:
+                entry = self._cache.store(key, ttl, 200, response.headers, response.body)
+            else:
+                return response
+        from pool import HttpResponse
+        return HttpResponse(entry['status'], entry['headers'].items(), entry['body'])
+
+    def get_cache_stats(self):
+        '''Returns response cache counters, or None without a cache'''
+        return self._cache.stats() if self._cache is not None else None
+
+    def get_pool_stats(self):
+        '''Returns connection pool statistics, or None without a pool'''
+        return self._pool.stats() if self._pool is not None else None
+
+    def add_hook(self, hook):
+        '''Registers a callable given a RequestEvent after every request'''
+        self._hooks.append(hook)
+
+    def remove_hook(self, hook):
+        self._hooks.remove(hook)
+
+    def _measure(self, event, response, body):
+        '''Copies status, sizes and transport timings of response into event'''
+        event.status = response.status_int
+        if body is not None:
+            event.bytes_out = len(body) if not isinstance(body, dict) else len(urlencode(body))
+        if response.body is not None:
+            event.bytes_in = len(response.body)
+        timings = getattr(response, 'timings', None)
+        if timings is not None:
+            event.dns = timings.get('dns')
+            event.connect = timings.get('connect')
+            event.tls = timings.get('tls')
+            event.ttfb = timings.get('ttfb')
+
+    def _emit(self, event):
+        '''Passes event to the hooks, a failing hook does not fail the request'''
+        for hook in self._hooks:
+            try:
+                hook(event)
+            except Exception:
+                pass
+
+    def _then(self, result, callback):
+        '''
+        Applies callback to the result of a request. Methods that post-process
+        a response chain through this so that asynchronous transports can
+        override it to chain onto a pending result instead
+        '''
+        return callback(result)
+
+    def _gather(self, results):
+        '''Collects the results of several independent requests'''
+        return list(results)
+
+    def _share(self, key, func):
+        '''
+        Calls func, or while a call for key is in flight shares its result,
+        eg one token fetch for concurrent writes, see ratelimit.Coalescer
+        '''
+        return self.__shared.do(key, func)
+
+    def _spawn(self, target):
+        '''Runs target in the background, ignoring any failure'''
+        in_background(target)
+
     def debug(self, debuglevel):
+        import restkit
         restkit.debuglevel = debuglevel
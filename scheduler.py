@@ -0,0 +1,109 @@
+'''Refreshing of feeds driven by their unread counts'''
+
+import random
+from time import time
+
+
+class _FeedState(object):
+    '''Polling state of one feed'''
+    __slots__ = ('newest', 'fetched', 'interval', 'due')
+
+    def __init__(self, interval, due):
+        self.newest = None
+        self.fetched = None
+        self.interval = interval
+        self.due = due
+
+
+class RefreshScheduler(object):
+    '''
+    Decides which feeds to fetch from the cheap unread-count call. Each poll
+    compares the newestItemTimestampUsec of every feed with the value seen
+    when it was last fetched and fetches the feeds whose timestamp moved
+    straight away. A fetched feed has its interval divided by backoff; a
+    feed found unchanged once its interval has elapsed has it multiplied,
+    within min_interval and max_interval seconds, so run polls less and
+    less often while every feed is idle. Intervals are randomised by
+    jitter, a fraction of the interval, to spread the polls out.
+    '''
+    def __init__(self, client, num=20, min_interval=60, max_interval=6 * 3600,
+        backoff=2.0, jitter=0.1, concurrency=8, clock=time):
+        self.__client = client
+        self.__num = num
+        self.__min_interval = min_interval
+        self.__max_interval = max_interval
+        self.__backoff = backoff
+        self.__jitter = jitter
+        self.__concurrency = concurrency
+        self.__clock = clock
+        self.__feeds = {}
+        self.counts = {}
+        self.stats = {
+            'polls': 0,
+            'fetches': 0,
+            'skipped': 0,
+            'errors': 0}
+
+    def poll(self):
+        '''
+        Fetches the unread counts then the contents of the changed feeds.
+        Returns a dict of feed contents by feed id
+        '''
+        unread_counts = self.__client.get_unread_count()
+        now = self.__clock()
+        self.stats['polls'] += 1
+        self.counts = {}
+        due = []
+        for u in unread_counts['unreadcounts']:
+            self.counts[u['id']] = u['count']
+            if not u['id'].startswith('feed/'):
+                continue
+            feed = self.__feeds.get(u['id'])
+            if feed is None:
+                feed = self.__feeds[u['id']] = _FeedState(self.__min_interval, now)
+            feed.newest = int(u.get('newestItemTimestampUsec', 0))
+            if feed.newest != feed.fetched:
+                # the unread count already shows the change, no reason to wait
+                due.append(u['id'])
+            elif feed.due <= now:
+                # nothing new since the last fetch, look again later
+                self.__reschedule(feed, feed.interval * self.__backoff, now)
+                self.stats['skipped'] += 1
+        contents = {}
+        if due:
+            for result in self.__client.fetch_all_feeds(self.__num, self.__concurrency, feed_ids=due):
+                feed = self.__feeds[result.key]
+                if result.error is not None:
+                    # keep the feed changed so it is fetched at the next poll
+                    self.stats['errors'] += 1
+                    continue
+                feed.fetched = feed.newest
+                self.__reschedule(feed, feed.interval / self.__backoff, now)
+                self.stats['fetches'] += 1
+                contents[result.key] = result.result
+        return contents
+
+    def next_poll(self):
+        '''Returns the seconds until the next feed is due'''
+        if not self.__feeds:
+            return 0
+        return max(0, min(f.due for f in self.__feeds.values()) - self.__clock())
+
+    def get_interval(self, feed_id):
+        '''Returns the current polling interval of a feed'''
+        return self.__feeds[feed_id].interval
+
+    def run(self, callback, stop):
+        '''
+        Polls until the stop event is set, calling callback with the contents
+        returned by each poll that fetched something
+        '''
+        while not stop.is_set():
+            contents = self.poll()
+            if contents:
+                callback(contents)
+            stop.wait(max(self.next_poll(), self.__min_interval))
+
+    def __reschedule(self, feed, interval, now):
+        feed.interval = min(max(interval, self.__min_interval), self.__max_interval)
+        feed.due = now + feed.interval * (1 + self.__jitter * (2 * random.random() - 1))
@@ -0,0 +1,293 @@
+'''Local full-text index of items for offline search'''
+
+import json
+import math
+import re
+import threading
+import unicodedata
+try:
+    from html import unescape
+except ImportError:
+    from HTMLParser import HTMLParser
+    unescape = HTMLParser().unescape
+
+from subscriptions import feed_id
+
+# search scopes and the tag they filter on; folder and feed filter on the target
+SCOPES = {
+    'all': None,
+    'read': 'state/com.google/read',
+    'starred': 'state/com.google/starred',
+    'shared': 'state/com.google/broadcast',
+    'followed': 'state/com.google/broadcast-friends',
+    'notes': 'state/com.google/created',
+    'folder': None,
+    'feed': None}
+
+_USER_PREFIX = re.compile(r'^user/[^/]+/')
+_MARKUP = re.compile(r'<[^>]*>')
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS items (
+    rowid INTEGER PRIMARY KEY,
+    id TEXT UNIQUE NOT NULL,
+    stream_id TEXT,
+    crawl_time_msec INTEGER NOT NULL DEFAULT 0,
+    data TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS items_stream ON items (stream_id);
+CREATE TABLE IF NOT EXISTS item_tags (
+    tag TEXT NOT NULL,
+    item_rowid INTEGER NOT NULL,
+    PRIMARY KEY (tag, item_rowid));
+CREATE INDEX IF NOT EXISTS item_tags_item ON item_tags (item_rowid);
+CREATE VIRTUAL TABLE IF NOT EXISTS item_text USING fts5 (title, body, author);
+'''
+
+
+def _tag(tag):
+    '''Normalises a category, tag id or label name, eg to label/news'''
+    if not tag.startswith('user/'):
+        return 'label/' + tag
+    return _USER_PREFIX.sub('', tag)
+
+
+def _text(item):
+    '''Returns the title, body and author of an item as plain text'''
+    body = item.get('content') or item.get('summary') or {}
+    return tuple(unescape(_MARKUP.sub(' ', value or '')) for value in
+        (item.get('title'), body.get('content'), item.get('author')))
+
+
+def _tokens(text):
+    '''Splits text into lower case words without accents, as fts5's unicode61 tokenizer does'''
+    text = unicodedata.normalize('NFKD', text.lower())
+    return _WORD.findall(''.join(c for c in text if not unicodedata.combining(c)))
+
+
+def _terms(query):
+    '''Returns the (word, prefix) terms of a query; a trailing * matches word prefixes'''
+    terms = []
+    for part in query.split():
+        terms.extend((token, False) for token in _tokens(part))
+        if terms and part.endswith('*'):
+            terms[-1] = (terms[-1][0], True)
+    return terms
+
+
+def _filter(scope, target):
+    '''Returns the (tag, stream id) a search within scope is restricted to'''
+    if scope not in SCOPES:
+        raise ValueError('Unknown search scope %s' % scope)
+    if scope == 'feed':
+        return None, feed_id(target)
+    if scope == 'folder':
+        return _tag(target), None
+    return SCOPES[scope], None
+
+
+def fts5_available():
+    '''Checks whether the sqlite3 module was built with the FTS5 extension'''
+    try:
+        import sqlite3
+        db = sqlite3.connect(':memory:')
+        try:
+            db.execute('CREATE VIRTUAL TABLE probe USING fts5 (text)')
+        finally:
+            db.close()
+    except Exception:
+        return False
+    return True
+
+
+class SqliteSearchIndex(object):
+    '''
+    Full-text index of item titles, bodies and authors in an SQLite FTS5
+    table, with the item states, labels and feed alongside so searches can
+    be limited to the same scopes as the remote search. Matches are ranked
+    by bm25. path may name a file to keep the index between runs
+    '''
+    def __init__(self, path=':memory:'):
+        import sqlite3
+        self.__db = sqlite3.connect(path, check_same_thread=False)
+        self.__lock = threading.Lock()
+        with self.__lock:
+            self.__db.executescript(_SCHEMA)
+
+    def add_items(self, items):
+        '''Indexes items, replacing earlier copies, returning how many were indexed'''
+        count = 0
+        with self.__lock:
+            with self.__db:
+                for item in items:
+                    row = (item['origin']['streamId'] if 'origin' in item else None,
+                        int(item.get('crawlTimeMsec', 0)), json.dumps(item))
+                    found = self.__db.execute('SELECT rowid FROM items WHERE id = ?', (item['id'],)).fetchone()
+                    if found is None:
+                        rowid = self.__db.execute('INSERT INTO items (stream_id, crawl_time_msec, data, id) '
+                            'VALUES (?, ?, ?, ?)', row + (item['id'],)).lastrowid
+                    else:
+                        rowid = found[0]
+                        self.__db.execute('UPDATE items SET stream_id = ?, crawl_time_msec = ?, data = ? '
+                            'WHERE rowid = ?', row + (rowid,))
+                        self.__db.execute('DELETE FROM item_text WHERE rowid = ?', (rowid,))
+                        self.__db.execute('DELETE FROM item_tags WHERE item_rowid = ?', (rowid,))
+                    self.__db.execute('INSERT INTO item_text (rowid, title, body, author) VALUES (?, ?, ?, ?)',
+                        (rowid,) + _text(item))
+                    self.__db.executemany('INSERT OR IGNORE INTO item_tags VALUES (?, ?)',
+                        [(_tag(c), rowid) for c in item.get('categories', [])])
+                    count += 1
+        return count
+
+    def set_tag(self, item_ids, tag, present=True):
+        '''Records a tag, eg a state or label, added to or removed from items'''
+        tag = _tag(tag)
+        with self.__lock:
+            with self.__db:
+                rowids = [row[0] for item_id in item_ids for row in
+                    self.__db.execute('SELECT rowid FROM items WHERE id = ?', (item_id,))]
+                if present:
+                    self.__db.executemany('INSERT OR IGNORE INTO item_tags VALUES (?, ?)',
+                        [(tag, rowid) for rowid in rowids])
+                else:
+                    self.__db.executemany('DELETE FROM item_tags WHERE tag = ? AND item_rowid = ?',
+                        [(tag, rowid) for rowid in rowids])
+
+    def search(self, query, scope='all', target=None, num=20):
+        '''Returns up to num items matching every word of query within scope, best first'''
+        tag, stream_id = _filter(scope, target)
+        terms = _terms(query)
+        if not terms:
+            return []
+        sql = 'SELECT items.data FROM item_text JOIN items ON items.rowid = item_text.rowid ' \
+            'WHERE item_text MATCH ?'
+        args = [' '.join('"%s"%s' % (word, '*' if prefix else '') for word, prefix in terms)]
+        if tag is not None:
+            sql += ' AND EXISTS (SELECT 1 FROM item_tags WHERE item_tags.tag = ? AND item_tags.item_rowid = items.rowid)'
+            args.append(tag)
+        if stream_id is not None:
+            sql += ' AND items.stream_id = ?'
+            args.append(stream_id)
+        sql += ' ORDER BY bm25(item_text), items.crawl_time_msec DESC'
+        if num is not None:
+            sql += ' LIMIT %d' % num
+        with self.__lock:
+            rows = self.__db.execute(sql, args).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def __len__(self):
+        with self.__lock:
+            return self.__db.execute('SELECT COUNT(*) FROM items').fetchone()[0]
+
+    def close(self):
+        with self.__lock:
+            self.__db.close()
+
+
+class MemorySearchIndex(object):
+    '''
+    Pure Python counterpart of SqliteSearchIndex for interpreters without
+    FTS5, an inverted index of words to the items holding them, ranked by
+    tf-idf. It is held in memory only
+    '''
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__items = {}
+        self.__postings = {}
+
+    def add_items(self, items):
+        '''Indexes items, replacing earlier copies, returning how many were indexed'''
+        count = 0
+        with self.__lock:
+            for item in items:
+                self.__remove(item['id'])
+                words = {}
+                for word in _tokens(' '.join(_text(item))):
+                    words[word] = words.get(word, 0) + 1
+                for word, frequency in words.items():
+                    self.__postings.setdefault(word, {})[item['id']] = frequency
+                self.__items[item['id']] = {
+                    'item': item,
+                    'stream_id': item['origin']['streamId'] if 'origin' in item else None,
+                    'crawl_time_msec': int(item.get('crawlTimeMsec', 0)),
+                    'tags': set(_tag(c) for c in item.get('categories', [])),
+                    'words': words}
+                count += 1
+        return count
+
+    def set_tag(self, item_ids, tag, present=True):
+        '''Records a tag, eg a state or label, added to or removed from items'''
+        tag = _tag(tag)
+        with self.__lock:
+            for item_id in item_ids:
+                entry = self.__items.get(item_id)
+                if entry is None:
+                    continue
+                if present:
+                    entry['tags'].add(tag)
+                else:
+                    entry['tags'].discard(tag)
+
+    def search(self, query, scope='all', target=None, num=20):
+        '''Returns up to num items matching every word of query within scope, best first'''
+        tag, stream_id = _filter(scope, target)
+        terms = _terms(query)
+        if not terms:
+            return []
+        with self.__lock:
+            scores = None
+            for word, prefix in terms:
+                words = [w for w in self.__postings if w.startswith(word)] if prefix else [word]
+                matches = {}
+                for w in words:
+                    postings = self.__postings.get(w, {})
+                    idf = math.log(1.0 + len(self.__items) / float(len(postings) or 1))
+                    for item_id, frequency in postings.items():
+                        matches[item_id] = matches.get(item_id, 0.0) + frequency * idf
+                if scores is None:
+                    scores = matches
+                else:
+                    scores = dict((item_id, score + matches[item_id])
+                        for item_id, score in scores.items() if item_id in matches)
+            entries = [(score, self.__items[item_id]) for item_id, score in scores.items()]
+            entries = [(score, entry) for score, entry in entries
+                if (tag is None or tag in entry['tags'])
+                and (stream_id is None or entry['stream_id'] == stream_id)]
+        entries.sort(key=lambda e: (-e[0], -e[1]['crawl_time_msec']))
+        return [entry['item'] for score, entry in entries[:num]]
+
+    def __remove(self, item_id):
+        entry = self.__items.pop(item_id, None)
+        if entry is not None:
+            for word in entry['words']:
+                postings = self.__postings[word]
+                del postings[item_id]
+                if not postings:
+                    del self.__postings[word]
+
+    def __len__(self):
+        with self.__lock:
+            return len(self.__items)
+
+    def close(self):
+        pass
+
+
+def open_index(path=None, engine='auto'):
+    '''
+    Returns a search index using engine, 'fts5', 'memory' or 'auto' for
+    FTS5 when sqlite3 has it. path names a file for the FTS5 index; the
+    memory engine cannot keep one so 'auto' only falls back to it without
+    a path
+    '''
+    if engine == 'auto':
+        engine = 'fts5' if path is not None or fts5_available() else 'memory'
+    if engine == 'fts5':
+        if not fts5_available():
+            raise ValueError('sqlite3 was built without FTS5')
+        return SqliteSearchIndex(path if path is not None else ':memory:')
+    if engine == 'memory':
+        if path is not None:
+            raise ValueError('The memory search index cannot be kept in %s' % path)
+        return MemorySearchIndex()
+    raise ValueError('Unknown search index engine %s' % engine)
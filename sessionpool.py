@@ -0,0 +1,128 @@
+'''Pool of logged in clients for many accounts'''
+
+import hashlib
+import hmac
+import os
+import threading
+from collections import OrderedDict
+from time import time
+
+from fanout import fan_out
+from googlereader import GoogleReaderClient
+from pool import ConnectionPool
+from ratelimit import Coalescer
+
+
+class LoginError(Exception):
+    '''Raised when an account could not be logged in'''
+    pass
+
+
+class ReaderSessionPool(object):
+    '''
+    Hands out logged in GoogleReaderClients by username. Accounts are
+    logged in on first use, concurrent requests for an account still
+    logging in wait for that login, and sessions are reused until
+    session_ttl seconds after login. All clients send their requests over
+    one ConnectionPool. At most max_sessions sessions are kept; the least
+    recently used ones are dropped beyond that. A session is only handed
+    to callers giving the password it was logged in with; another password
+    logs in again. config holds the options shared by every client, eg
+    client_id, cache or rate_limit
+    '''
+    def __init__(self, config, max_sessions=1000, session_ttl=14 * 24 * 3600, pool=None, clock=time):
+        self.__config = dict(config)
+        if pool is None:
+            pool = self.__config['pool'] if 'pool' in self.__config else {}
+        if isinstance(pool, dict):
+            pool = ConnectionPool(**pool)
+        self.__config['pool'] = pool
+        self.__config['defer_login'] = True
+        self.__max_sessions = max_sessions
+        self.__session_ttl = session_ttl
+        self.__clock = clock
+        self.__sessions = OrderedDict()
+        self.__lock = threading.Lock()
+        self.__logins = Coalescer()
+        # keys the password digests, which are only compared within this process
+        self.__secret = os.urandom(32)
+        self.stats = {
+            'hits': 0,
+            'logins': 0,
+            'expired': 0,
+            'evicted': 0,
+            'mismatches': 0}
+
+    def get(self, username, password):
+        '''
+        Returns the logged in client of an account, logging it in if needed
+        or if password differs from the one the session was logged in with
+        '''
+        digest = self.__digest(password)
+        with self.__lock:
+            session = self.__sessions.get(username)
+            if session is not None:
+                if session['expires'] <= self.__clock():
+                    del self.__sessions[username]
+                    self.stats['expired'] += 1
+                elif hmac.compare_digest(session['digest'], digest):
+                    self.__sessions.pop(username)
+                    self.__sessions[username] = session
+                    self.stats['hits'] += 1
+                    return session['client']
+                else:
+                    self.stats['mismatches'] += 1
+        # only callers giving the same password share a login
+        return self.__logins.do((username, digest), lambda: self.__login(username, password, digest))
+
+    def login_all(self, accounts, concurrency=16):
+        '''
+        Logs in (username, password) accounts concurrently ahead of use.
+        Returns a dict of the LoginErrors, or other errors, by username
+        '''
+        passwords = dict(accounts)
+        errors = {}
+        for result in fan_out(lambda username: self.get(username, passwords[username]), passwords, concurrency):
+            if result.error is not None:
+                errors[result.key] = result.error
+        return errors
+
+    def invalidate(self, username):
+        '''Drops the session of an account, eg after its SID was rejected'''
+        with self.__lock:
+            self.__sessions.pop(username, None)
+
+    def __len__(self):
+        with self.__lock:
+            return len(self.__sessions)
+
+    def get_pool_stats(self):
+        '''Returns the statistics of the shared connection pool'''
+        return self.__config['pool'].stats()
+
+    def close(self):
+        '''Drops all sessions and closes the idle pooled connections'''
+        with self.__lock:
+            self.__sessions.clear()
+        self.__config['pool'].close()
+
+    def __digest(self, password):
+        '''Returns a keyed hash of password, never stored or compared in the clear'''
+        return hmac.new(self.__secret, password.encode('utf-8'), hashlib.sha256).digest()
+
+    def __login(self, username, password, digest):
+        config = dict(self.__config, username=username, password=password)
+        client = GoogleReaderClient(config)
+        # a client reusing a session from an 'auth_cache' is already logged in
+        if client.get_auth() is None and client.login() is not True:
+            raise LoginError('Login failed for %s' % username)
+        with self.__lock:
+            self.stats['logins'] += 1
+            self.__sessions[username] = {
+                'client': client,
+                'digest': digest,
+                'expires': self.__clock() + self.__session_ttl}
+            while len(self.__sessions) > self.__max_sessions:
+                self.__sessions.popitem(last=False)
+                self.stats['evicted'] += 1
+        return client
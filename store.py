@@ -0,0 +1,174 @@
+'''Local SQLite store of items kept in sync incrementally'''
+
+import json
+import sqlite3
+import threading
+
+from restclient import RestError
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS items (
+    id TEXT PRIMARY KEY,
+    stream_id TEXT,
+    crawl_time_msec INTEGER NOT NULL DEFAULT 0,
+    published INTEGER,
+    read INTEGER NOT NULL DEFAULT 0,
+    starred INTEGER NOT NULL DEFAULT 0,
+    data TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS items_stream ON items (stream_id, crawl_time_msec);
+CREATE INDEX IF NOT EXISTS items_crawl ON items (crawl_time_msec);
+CREATE INDEX IF NOT EXISTS items_state ON items (read, crawl_time_msec);
+CREATE TABLE IF NOT EXISTS item_labels (
+    item_id TEXT NOT NULL,
+    label TEXT NOT NULL,
+    PRIMARY KEY (item_id, label));
+CREATE INDEX IF NOT EXISTS item_labels_label ON item_labels (label, item_id);
+CREATE TABLE IF NOT EXISTS sync_state (
+    stream TEXT PRIMARY KEY,
+    watermark INTEGER NOT NULL DEFAULT 0,
+    pending_watermark INTEGER NOT NULL DEFAULT 0,
+    continuation TEXT);
+'''
+
+_READ_STATE = '/state/com.google/read'
+_STARRED_STATE = '/state/com.google/starred'
+
+
+def _labels(categories):
+    '''Returns the label names found in item categories'''
+    return [c.split('/label/', 1)[1] for c in categories if '/label/' in c]
+
+
+class ItemStore(object):
+    '''
+    SQLite store of items, indexed by id, stream id, crawl time, read state
+    and label. sync fetches only items crawled since the previous sync using
+    the ot= parameter, so once populated, reads such as the unread items of
+    a label are served locally. Read state changes made elsewhere are not
+    picked up by sync; changes made through GoogleFeedReader are applied to
+    the store as they are made.
+    '''
+    def __init__(self, path=':memory:'):
+        self.__db = sqlite3.connect(path, check_same_thread=False)
+        self.__lock = threading.Lock()
+        with self.__lock:
+            self.__db.executescript(_SCHEMA)
+
+    def add_items(self, items):
+        '''Inserts or updates items, returning how many were stored'''
+        rows = []
+        labels = []
+        for item in items:
+            categories = item.get('categories', [])
+            rows.append((
+                item['id'],
+                item['origin']['streamId'] if 'origin' in item else None,
+                int(item.get('crawlTimeMsec', 0)),
+                item.get('published'),
+                int(any(c.endswith(_READ_STATE) for c in categories)),
+                int(any(c.endswith(_STARRED_STATE) for c in categories)),
+                json.dumps(item)))
+            labels.extend((item['id'], label) for label in _labels(categories))
+        with self.__lock:
+            with self.__db:
+                self.__db.executemany('INSERT OR REPLACE INTO items VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+                self.__db.executemany('DELETE FROM item_labels WHERE item_id = ?', [(r[0],) for r in rows])
+                self.__db.executemany('INSERT OR IGNORE INTO item_labels VALUES (?, ?)', labels)
+        return len(rows)
+
+    def get_items(self, label=None, stream_id=None, unread_only=False, starred_only=False, num=None, order='n'):
+        '''Returns stored items, newest first unless order is 'o' '''
+        query = 'SELECT data FROM items'
+        clauses = []
+        args = []
+        if label is not None:
+            query += ' JOIN item_labels ON item_labels.item_id = items.id'
+            clauses.append('item_labels.label = ?')
+            args.append(label)
+        if stream_id is not None:
+            clauses.append('items.stream_id = ?')
+            args.append(stream_id)
+        if unread_only:
+            clauses.append('items.read = 0')
+        if starred_only:
+            clauses.append('items.starred = 1')
+        if clauses:
+            query += ' WHERE ' + ' AND '.join(clauses)
+        query += ' ORDER BY items.crawl_time_msec %s' % ('ASC' if order == 'o' else 'DESC')
+        if num is not None:
+            query += ' LIMIT %d' % num
+        with self.__lock:
+            rows = self.__db.execute(query, args).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def count_unread(self, label=None):
+        '''Returns the number of unread items, optionally within a label'''
+        if label is None:
+            query, args = 'SELECT COUNT(*) FROM items WHERE read = 0', ()
+        else:
+            query = 'SELECT COUNT(*) FROM items JOIN item_labels ON item_labels.item_id = items.id ' \
+                'WHERE items.read = 0 AND item_labels.label = ?'
+            args = (label,)
+        with self.__lock:
+            return self.__db.execute(query, args).fetchone()[0]
+
+    def set_read(self, item_ids, read=True):
+        '''Records a read state change made through the client'''
+        with self.__lock:
+            with self.__db:
+                self.__db.executemany('UPDATE items SET read = ? WHERE id = ?',
+                    [(int(read), item_id) for item_id in item_ids])
+
+    def set_label(self, item_ids, label, present=True):
+        '''Records a label added to or removed from items'''
+        with self.__lock:
+            with self.__db:
+                if present:
+                    self.__db.executemany('INSERT OR IGNORE INTO item_labels VALUES (?, ?)',
+                        [(item_id, label) for item_id in item_ids])
+                else:
+                    self.__db.executemany('DELETE FROM item_labels WHERE item_id = ? AND label = ?',
+                        [(item_id, label) for item_id in item_ids])
+
+    def get_sync_state(self, stream):
+        '''Returns (watermark, pending_watermark, continuation) for stream'''
+        with self.__lock:
+            row = self.__db.execute('SELECT watermark, pending_watermark, continuation FROM sync_state WHERE stream = ?',
+                (stream,)).fetchone()
+        return row if row is not None else (0, 0, None)
+
+    def sync(self, client, state='reading-list', label=None, page_size=200):
+        '''
+        Fetches the items crawled since the previous sync of the state or
+        label, oldest first, and stores them. The continuation token is
+        saved after every page so an interrupted sync resumes where it
+        stopped. Returns the number of items fetched
+        '''
+        stream = 'label/%s' % label if label is not None else 'state/%s' % state
+        watermark, pending_watermark, continuation = self.get_sync_state(stream)
+        count = 0
+        while True:
+            page = client.get_items_by_state_or_label(state, page_size, 'o',
+                label=label,
+                continuation=continuation,
+                start_time=watermark // 1000 if watermark else None)
+            if not isinstance(page, dict):
+                raise RestError(page)
+            count += self.add_items(page['items'])
+            for item in page['items']:
+                pending_watermark = max(pending_watermark, int(item.get('crawlTimeMsec', 0)))
+            continuation = page.get('continuation')
+            if continuation is None:
+                self.__save_sync_state(stream, max(watermark, pending_watermark), 0, None)
+                return count
+            self.__save_sync_state(stream, watermark, pending_watermark, continuation)
+
+    def __save_sync_state(self, stream, watermark, pending_watermark, continuation):
+        with self.__lock:
+            with self.__db:
+                self.__db.execute('INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?, ?)',
+                    (stream, watermark, pending_watermark, continuation))
+
+    def close(self):
+        with self.__lock:
+            self.__db.close()
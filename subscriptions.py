@@ -0,0 +1,84 @@
+'''Planning of subscription edits against a desired state'''
+
+SUBSCRIBE = 'subscribe'
+UNSUBSCRIBE = 'unsubscribe'
+EDIT = 'edit'
+
+
+class SubscriptionEdit(object):
+    '''
+    All the changes to one feed, sent as a single subscription/edit
+    request: the action, the new title or None to leave it, and the label
+    names to add and remove
+    '''
+    __slots__ = ('feed_id', 'action', 'title', 'add_labels', 'remove_labels')
+
+    def __init__(self, feed_id, action, title=None, add_labels=None, remove_labels=None):
+        self.feed_id = feed_id
+        self.action = action
+        self.title = title
+        self.add_labels = add_labels or []
+        self.remove_labels = remove_labels or []
+
+    def __eq__(self, other):
+        return isinstance(other, SubscriptionEdit) and \
+            all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return 'SubscriptionEdit(%r, %s, title=%r, add=%r, remove=%r)' % (
+            self.feed_id, self.action, self.title, self.add_labels, self.remove_labels)
+
+
+def feed_id(feed):
+    '''Returns the stream id of a feed url or id'''
+    return feed if feed.startswith('feed/') else 'feed/' + feed
+
+
+def label_name(label):
+    '''Returns the name of a label given as a name or tag id'''
+    return label.split('/label/', 1)[1] if label.startswith('user/') and '/label/' in label else label
+
+
+def plan_subscriptions(subscriptions, desired, prune=True):
+    '''
+    Returns the SubscriptionEdits turning subscriptions, the list from a
+    subscription/list response, into desired: a dict of feed urls or ids to
+    dicts with an optional 'title' and 'labels', eg from opml.read_opml.
+    Missing feeds are subscribed, titles and labels given are brought in
+    line, with the labels of a feed given replacing its current ones, and
+    feeds not in desired are unsubscribed if prune is set. Feeds already as
+    desired get no edit
+    '''
+    current = {}
+    for subscription in subscriptions:
+        current[subscription['id']] = subscription
+    plan = []
+    wanted = set()
+    for feed, state in desired.items():
+        state = state or {}
+        stream_id = feed_id(feed)
+        wanted.add(stream_id)
+        title = state.get('title')
+        labels = [label_name(l) for l in state['labels']] if state.get('labels') is not None else None
+        subscription = current.get(stream_id)
+        if subscription is None:
+            plan.append(SubscriptionEdit(stream_id, SUBSCRIBE, title, labels))
+            continue
+        if title == subscription.get('title'):
+            title = None
+        add, remove = [], []
+        if labels is not None:
+            current_labels = [c.get('label') or label_name(c['id'])
+                for c in subscription.get('categories', []) if '/label/' in c['id']]
+            add = [l for l in labels if l not in current_labels]
+            remove = [l for l in current_labels if l not in labels]
+        if title is not None or add or remove:
+            plan.append(SubscriptionEdit(stream_id, EDIT, title, add, remove))
+    if prune:
+        for subscription in subscriptions:
+            if subscription['id'] not in wanted:
+                plan.append(SubscriptionEdit(subscription['id'], UNSUBSCRIBE))
+    return plan
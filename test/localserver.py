@@ -0,0 +1,106 @@
+'''Local HTTP server standing in for the Reader API in the client tests'''
+
+import unittest
+import json
+import os
+import sys
+import threading
+try:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import parse_qs, urlparse
+except ImportError:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import parse_qs, urlparse
+
+# insert application path
+app_path = os.path.join(os.path.realpath(os.path.dirname(__file__)), '../')
+sys.path.insert(0, app_path)
+
+from googlereader import GoogleReaderClient
+
+
+class ReaderHandler(BaseHTTPRequestHandler):
+    '''
+    Base of the request handlers of the tests, keeping connections alive
+    as the Reader API does. Subclasses define do_GET and do_POST and keep
+    what they record in class attributes
+    '''
+    protocol_version = 'HTTP/1.1'
+    wbufsize = -1
+
+    def url_path(self):
+        '''Returns the path of the request without its query'''
+        return urlparse(self.path).path
+
+    def query(self):
+        '''Returns the query parameters, keeping the first value of each'''
+        return dict((k, v[0]) for k, v in parse_qs(urlparse(self.path).query).items())
+
+    def body(self):
+        '''Reads the request body as text'''
+        return self.rfile.read(int(self.headers['Content-Length'])).decode('utf-8')
+
+    def form(self):
+        '''Reads the urlencoded request body into a dict of lists'''
+        return parse_qs(self.body())
+
+    def cookie_sid(self):
+        '''Returns the SID cookie sent with the request'''
+        return self.headers['Cookie'].split(' SID=')[1].split(';')[0]
+
+    def respond(self, body, status=200, content_type=None, headers=None):
+        '''Sends body, json encoding it unless it is a string'''
+        if not isinstance(body, (type(u''), bytes)):
+            body, content_type = json.dumps(body), content_type or 'text/javascript'
+        if not isinstance(body, bytes):
+            body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type or 'text/plain')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class ThreadedServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class ServerTestCase(unittest.TestCase):
+    '''
+    Serves handler on a local port during each test. new_client builds a
+    GoogleReaderClient of it, logged in as user 42 over a connection pool
+    '''
+    handler = None
+
+    def setUp(self):
+        '''Setups for each test'''
+        self.server = ThreadedServer(('127.0.0.1', 0), self.handler)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.url = 'http://127.0.0.1:%s' % self.server.server_port
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def config(self, **config):
+        '''Returns the client config for the server, updated with config'''
+        options = {
+            'client_id': 'test',
+            'json_decoder': 'json',
+            'pool': {},
+            'auth': {'sid': 'sid', 'user_id': '42'},
+            'base_url': self.url}
+        options.update(config)
+        return options
+
+    def new_client(self, **config):
+        return GoogleReaderClient(self.config(**config))
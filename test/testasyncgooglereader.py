@@ -0,0 +1,189 @@
+import unittest
+import io
+
+from localserver import ReaderHandler, ServerTestCase
+
+try:
+    import asyncio
+    import aiohttp
+    from asyncgooglereader import AsyncGoogleReaderClient
+except ImportError:
+    aiohttp = None
+
+ITEMS = [{'id': 'tag:google.com,2005:reader/item/%016x' % i, 'title': 'Item %s' % i,
+    'summary': {'content': 'Generators %s' % i}} for i in range(1, 6)]
+
+OPML = b'''<?xml version="1.0" encoding="UTF-8"?>
+<opml version="1.0"><body>
+  <outline text="News">
+    <outline title="Daily" type="rss" xmlUrl="http://daily.example.com/rss"/>
+    <outline title="Broken" type="rss" xmlUrl="http://broken.example.com/rss"/>
+  </outline>
+</body></opml>'''
+
+ATOM = '''<?xml version="1.0"?>
+<feed xmlns:gr="http://www.google.com/schemas/reader/atom/" xmlns="http://www.w3.org/2005/Atom">
+<title>Daily</title>
+<gr:continuation>CJ2sqcX9n50C</gr:continuation>
+<entry><id>tag:google.com,2005:reader/item/1</id><title>First</title></entry>
+<entry><id>tag:google.com,2005:reader/item/2</id><title>Second</title></entry>
+</feed>'''
+
+
+class AsyncHandler(ReaderHandler):
+    '''A small Reader API, recording the method, path and form of requests'''
+    requests = []
+
+    def do_GET(self):
+        path, params = self.url_path(), self.query()
+        AsyncHandler.requests.append(('GET', path, params))
+        if path.endswith('/user-info'):
+            self.respond({'userId': '42'})
+        elif path.endswith('/unread-count'):
+            self.respond({'max': 1000, 'unreadcounts': []})
+        elif path.endswith('/subscription/list'):
+            self.respond({'subscriptions': [{'id': 'feed/http://daily.example.com/rss'}]})
+        elif '/atom/feed/' in path:
+            self.respond(ATOM, content_type='application/atom+xml')
+        elif '/stream/contents/' in path:
+            start, num = int(params.get('c', 0)), int(params['n'])
+            page = {'items': ITEMS[start:start + num]}
+            if start + num < len(ITEMS):
+                page['continuation'] = str(start + num)
+            self.respond(page)
+        elif path.endswith('/search/items/ids'):
+            self.respond({'results': [{'id': str(i)} for i in (2, 4)]})
+        else:
+            self.respond('faketoken')
+
+    def do_POST(self):
+        path, form = self.url_path(), self.form()
+        AsyncHandler.requests.append(('POST', path, form))
+        if path.endswith('/ClientLogin'):
+            self.respond('SID=fakesid\nLSID=x\nAuth=y\n')
+        elif path.endswith('/stream/items/contents'):
+            self.respond({'items': [ITEMS[int(i) - 1] for i in form['i']]})
+        elif 'broken' in form.get('s', [''])[0]:
+            self.respond('Error', 500)
+        else:
+            self.respond('OK')
+
+
+@unittest.skipIf(aiohttp is None, 'aiohttp is not installed')
+class TestAsyncGoogleReaderClient(ServerTestCase):
+    '''Test class for the asyncio client against a local server'''
+    handler = AsyncHandler
+
+    def setUp(self):
+        '''Setups for each test'''
+        AsyncHandler.requests = []
+        ServerTestCase.setUp(self)
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+        ServerTestCase.tearDown(self)
+
+    def new_client(self, **config):
+        options = self.config(username='ann@example.com', password='secret', auth=None)
+        del options['pool']
+        options.update(config)
+        return AsyncGoogleReaderClient(options)
+
+    def run_with(self, client, coroutine):
+        '''Runs coroutine on the test loop, closing the client's session afterwards'''
+        async def run():
+            try:
+                return await coroutine(client)
+            finally:
+                await client.close()
+        return self.loop.run_until_complete(run())
+
+    def paths(self):
+        return [(method, path.split('/')[-1]) for method, path, params in AsyncHandler.requests]
+
+    def testDeferredLogin(self):
+        '''Nothing is sent on construction; login chains the user info request'''
+        client = self.new_client()
+        self.assertEqual(AsyncHandler.requests, [])
+        async def login(client):
+            self.assertTrue(await client.login())
+            return await client.get_unread_count()
+        self.assertEqual(self.run_with(client, login)['max'], 1000)
+        self.assertEqual(self.paths(), [('POST', 'ClientLogin'), ('GET', 'user-info'), ('GET', 'unread-count')])
+        self.assertEqual(client.get_auth(), {'sid': 'fakesid', 'user_id': '42'})
+
+    def testWriteBehindRejected(self):
+        '''The write-behind queue needs threads and is refused'''
+        self.assertRaises(ValueError, self.new_client, write_behind=True)
+
+    def testThenAndGather(self):
+        '''Batched edits share one token and are gathered into a list'''
+        async def edit(client):
+            return await client.edit_tags_bulk(['1', '2', '3'], add='starred', batch_size=2)
+        results = self.run_with(self.new_client(auth={'sid': 'sid', 'user_id': '42'}), edit)
+        self.assertEqual(results, [(['1', '2'], 'OK'), (['3'], 'OK')])
+        self.assertEqual(self.paths(), [('GET', 'token'), ('POST', 'edit-tag'), ('POST', 'edit-tag')])
+
+    def testSpawn(self):
+        '''Spawned targets run on the loop and their failures are ignored'''
+        ran = []
+        async def fail():
+            ran.append('fail')
+            raise IOError('refused')
+        async def spawn(client):
+            client._spawn(fail)
+            client._spawn(lambda: ran.append('sync'))
+            await asyncio.sleep(0.01)
+        self.run_with(self.new_client(), spawn)
+        self.assertEqual(sorted(ran), ['fail', 'sync'])
+
+    def testAtomFeed(self):
+        '''Atom feeds are parsed with the xml parser into a page of items'''
+        async def fetch(client):
+            return await client.get_feed_contents('feed/http://daily.example.com/rss', use_atom=True)
+        page = self.run_with(self.new_client(auth={'sid': 'sid', 'user_id': '42'}), fetch)
+        self.assertEqual([item['title'] for item in page['items']], ['First', 'Second'])
+        self.assertEqual(page['continuation'], 'CJ2sqcX9n50C')
+
+    def testResponseCache(self):
+        '''The cache key answers repeated GETs of endpoints with a ttl'''
+        async def fetch(client):
+            return [await client.get_subscription_list() for i in range(2)]
+        lists = self.run_with(self.new_client(auth={'sid': 'sid', 'user_id': '42'}, cache=True), fetch)
+        self.assertEqual(lists[0], lists[1])
+        self.assertEqual(self.paths(), [('GET', 'list')])
+
+    def testIterItems(self):
+        '''Pages are followed through continuation tokens up to limit'''
+        async def collect(client):
+            return [item['title'] async for item in client.iter_items(page_size=2, limit=3, prefetch=True)]
+        titles = self.run_with(self.new_client(auth={'sid': 'sid', 'user_id': '42'}), collect)
+        self.assertEqual(titles, ['Item 1', 'Item 2', 'Item 3'])
+
+    def testImportOPML(self):
+        '''Subscriptions are edited concurrently and failures reported per feed'''
+        async def run(client):
+            return await client.import_OPML(io.BytesIO(OPML), concurrency=2)
+        report = self.run_with(self.new_client(auth={'sid': 'sid', 'user_id': '42'}), run)
+        self.assertEqual(list(report), ['http://daily.example.com/rss', 'http://broken.example.com/rss'])
+        self.assertEqual(report['http://daily.example.com/rss'].result, 'OK')
+        self.assertTrue(report['http://broken.example.com/rss'].error is not None)
+        edits = [params for method, path, params in AsyncHandler.requests if method == 'POST']
+        self.assertEqual(sorted(e['a'][0] for e in edits), ['user/-/label/News'] * 2)
+
+    def testSearchLocal(self):
+        '''Nothing matches locally so search is used, and its items are indexed'''
+        async def run(client):
+            remote = await client.search_local('generators', num=5)
+            local = await client.search_local('generators', num=5, fallback=False)
+            return remote, local
+        client = self.new_client(auth={'sid': 'sid', 'user_id': '42'}, search_index={'engine': 'memory'})
+        remote, local = self.run_with(client, run)
+        self.assertEqual(sorted(item['title'] for item in remote), ['Item 2', 'Item 4'])
+        self.assertEqual(sorted(item['title'] for item in local), ['Item 2', 'Item 4'])
+        self.assertEqual([path for method, path in self.paths()].count('ids'), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+import os
+import sys
+
+# insert application path
+app_path = os.path.join(os.path.realpath(os.path.dirname(__file__)), '../')
+sys.path.insert(0, app_path)
+
+from atom import AtomItemStream, is_atom
+
+FEED = '''<?xml version="1.0"?>
+<feed xmlns:gr="http://www.google.com/schemas/reader/atom/" xmlns="http://www.w3.org/2005/Atom">
+<id>tag:google.com,2005:reader/feed/http://example.com/rss</id>
+<title>Example</title>
+<gr:continuation>CJ2sqcX9n50C</gr:continuation>
+<updated>2010-01-01T10:00:00Z</updated>
+<entry gr:crawl-timestamp-msec="1262340000000">
+<id>tag:google.com,2005:reader/item/5d0cfa30041d4348</id>
+<category term="user/01234/state/com.google/reading-list" label="reading-list"/>
+<title type="html">First &amp; item</title>
+<published>2010-01-01T10:00:00Z</published>
+<link rel="alternate" href="http://example.com/1" type="text/html"/>
+<summary type="html">&lt;p&gt;Hello&lt;/p&gt;</summary>
+<author><name>Joe</name></author>
+<source gr:stream-id="feed/http://example.com/rss">
+<title type="html">Example</title>
+<link rel="alternate" href="http://example.com/" type="text/html"/>
+</source>
+</entry>
+<entry><id>tag:google.com,2005:reader/item/2</id><title>Second</title></entry>
+</feed>'''
+
+
+class TestAtomItemStream(unittest.TestCase):
+    '''Test class for the atom feed parser'''
+
+    def testItemsHaveJsonShape(self):
+        '''Entries are converted to json shaped items'''
+        items = list(AtomItemStream([FEED]))
+        self.assertEqual(len(items), 2)
+        item = items[0]
+        self.assertEqual(item['id'], 'tag:google.com,2005:reader/item/5d0cfa30041d4348')
+        self.assertEqual(item['crawlTimeMsec'], '1262340000000')
+        self.assertEqual(item['categories'], ['user/01234/state/com.google/reading-list'])
+        self.assertEqual(item['title'], 'First & item')
+        self.assertEqual(item['published'], 1262340000)
+        self.assertEqual(item['alternate'], [{'href': 'http://example.com/1', 'type': 'text/html'}])
+        self.assertEqual(item['summary']['content'], '<p>Hello</p>')
+        self.assertEqual(item['author'], 'Joe')
+        self.assertEqual(item['origin']['streamId'], 'feed/http://example.com/rss')
+        self.assertEqual(item['origin']['htmlUrl'], 'http://example.com/')
+
+    def testFeedFields(self):
+        '''Feed level fields are available after iteration'''
+        stream = AtomItemStream([FEED[i:i + 16] for i in range(0, len(FEED), 16)])
+        list(stream)
+        self.assertEqual(stream.fields['continuation'], 'CJ2sqcX9n50C')
+        self.assertEqual(stream.fields['updated'], 1262340000)
+
+    def testIsAtom(self):
+        '''Atom feeds are told apart from other xml'''
+        self.assertTrue(is_atom(FEED))
+        self.assertFalse(is_atom('<object><list name="subscriptions"/></object>'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import unittest
+import os
+import shutil
+import tempfile
+
+from localserver import ReaderHandler, ServerTestCase
+from authcache import AuthCache, Fernet, generate_key
+from googlereader import GoogleReaderClient
+
+
+class SessionHandler(ReaderHandler):
+    '''Accepts only the SID handed out by the latest login'''
+    requests = []
+    sid = 'fresh'
+
+    def do_POST(self):
+        self.body()
+        SessionHandler.requests.append('login')
+        self.respond('SID=%s\nLSID=x\n' % SessionHandler.sid)
+
+    def do_GET(self):
+        path = self.url_path()
+        SessionHandler.requests.append(path)
+        if self.cookie_sid() != SessionHandler.sid:
+            self.respond('Unauthorized', 401, 'text/html')
+        elif path.endswith('user-info'):
+            self.respond({'userId': '42'})
+        else:
+            self.respond({'tags': []})
+
+
+@unittest.skipIf(Fernet is None, 'cryptography is not installed')
+class TestAuthCache(unittest.TestCase):
+    '''Test class for the encrypted session cache'''
+
+    def setUp(self):
+        '''Setups for each test'''
+        self.path = tempfile.mkdtemp()
+        self.key = generate_key()
+        self.now = 0
+        self.cache = AuthCache(self.path, self.key, ttl=60, clock=lambda: self.now)
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def testEntriesAreEncrypted(self):
+        '''Stored sessions are not readable without the key'''
+        self.cache.set('user@example.com', {'sid': 'secretsid', 'user_id': '42'})
+        self.assertEqual(self.cache.get('user@example.com'), {'sid': 'secretsid', 'user_id': '42'})
+        for name in os.listdir(self.path):
+            with open(os.path.join(self.path, name), 'rb') as f:
+                data = f.read()
+            self.assertFalse(b'secretsid' in data or b'user@example.com' in data)
+        other = AuthCache(self.path, generate_key())
+        self.assertEqual(other.get('user@example.com'), None)
+
+    def testEntriesExpire(self):
+        '''Sessions are not reused after ttl'''
+        self.cache.set('user', {'sid': 'sid', 'user_id': '42'})
+        self.now = 61
+        self.assertEqual(self.cache.get('user'), None)
+        self.assertEqual(self.cache.get('nobody'), None)
+
+    def testPasswordMustMatch(self):
+        '''Sessions stored with a password are only returned for that password'''
+        self.cache.set('user', {'sid': 'sid', 'user_id': '42'}, 'secret')
+        self.assertEqual(self.cache.get('user', 'secret'), {'sid': 'sid', 'user_id': '42'})
+        self.assertEqual(self.cache.get('user', 'guess'), None)
+        self.assertEqual(self.cache.get('user'), {'sid': 'sid', 'user_id': '42'})
+        self.cache.set('other', {'sid': 'sid', 'user_id': '43'})
+        self.assertEqual(self.cache.get('other', 'guess'), None)
+
+
+@unittest.skipIf(Fernet is None, 'cryptography is not installed')
+class TestClientAuthCache(ServerTestCase):
+    '''Test class for clients starting from a cached session'''
+    handler = SessionHandler
+
+    def setUp(self):
+        '''Setups for each test'''
+        SessionHandler.requests = []
+        SessionHandler.sid = 'fresh'
+        ServerTestCase.setUp(self)
+        self.path = tempfile.mkdtemp()
+        self.cache = AuthCache(self.path, generate_key(), ttl=60)
+
+    def tearDown(self):
+        ServerTestCase.tearDown(self)
+        shutil.rmtree(self.path)
+
+    def testClientReusesAndRenewsSession(self):
+        '''A client starts from the cached session and logs in again when it is rejected'''
+        config = self.config(username='user', password='secret', auth=None, auth_cache=self.cache)
+        GoogleReaderClient(config)
+        self.assertEqual(SessionHandler.requests, ['login', '/reader/api/0/user-info'])
+        self.assertEqual(self.cache.get('user'), {'sid': 'fresh', 'user_id': '42'})
+
+        SessionHandler.requests = []
+        client = GoogleReaderClient(config)
+        self.assertEqual(SessionHandler.requests, [])
+        SessionHandler.sid = 'renewed'
+        self.assertEqual(client.get_tag_list(), {'tags': []})
+        self.assertEqual(SessionHandler.requests, ['/reader/api/0/tag/list', 'login',
+            '/reader/api/0/user-info', '/reader/api/0/tag/list'])
+        self.assertEqual(self.cache.get('user')['sid'], 'renewed')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+import os
+import shutil
+import sys
+import tempfile
+
+# insert application path
+app_path = os.path.join(os.path.realpath(os.path.dirname(__file__)), '../')
+sys.path.insert(0, app_path)
+
+from cache import MemoryCache, ResponseCache
+
+
+class TestResponseCache(unittest.TestCase):
+    '''Test class for the response cache'''
+
+    def setUp(self):
+        '''Setups for each test'''
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def testTtlLookup(self):
+        '''Only endpoints with a ttl are cached'''
+        cache = ResponseCache({'/api/0/tag/list': 60})
+        self.assertEqual(cache.ttl_for('https://www.google.com/reader/api/0/tag/list'), 60)
+        self.assertEqual(cache.ttl_for('https://www.google.com/reader/api/0/token'), None)
+
+    def testInvalidate(self):
+        '''Invalidating an endpoint changes the keys of its requests only'''
+        cache = ResponseCache({'/api/0/tag/list': 60, '/api/0/subscription/list': 60})
+        tags = 'https://www.google.com/reader/api/0/tag/list'
+        subscriptions = 'https://www.google.com/reader/api/0/subscription/list'
+        tags_key = cache.key(tags, {'output': 'json'}, {})
+        subscriptions_key = cache.key(subscriptions, {'output': 'json'}, {})
+        cache.invalidate(subscriptions)
+        self.assertEqual(cache.key(tags, {'output': 'json'}, {}), tags_key)
+        self.assertNotEqual(cache.key(subscriptions, {'output': 'json'}, {}), subscriptions_key)
+
+    def testFreshEntryIsHit(self):
+        '''Stored responses are served until they expire'''
+        cache = ResponseCache()
+        cache.store('key', 60, 200, {}, '{}')
+        entry, fresh = cache.get('key')
+        self.assertTrue(fresh)
+        self.assertEqual(entry['body'], '{}')
+        self.assertEqual(cache.stats()['hits'], 1)
+
+    def testStaleEntryIsRevalidated(self):
+        '''Stale responses with an ETag are revalidated, not dropped'''
+        cache = ResponseCache()
+        cache.store('key', 0, 200, {'etag': '"v1"'}, '{}')
+        entry, fresh = cache.get('key')
+        self.assertFalse(fresh)
+        self.assertEqual(cache.validators(entry), {'If-None-Match': '"v1"'})
+        entry = cache.revalidated('key', 60, entry)
+        self.assertTrue(cache.get('key')[1])
+
+    def testStaleEntryWithoutValidatorIsMiss(self):
+        '''Stale responses without validators are refetched'''
+        cache = ResponseCache()
+        cache.store('key', 0, 200, {}, '{}')
+        self.assertEqual(cache.get('key'), (None, False))
+
+    def testDiskBackend(self):
+        '''Entries survive in the on-disk backend'''
+        ResponseCache(path=self.path).store('key', 60, 200, {}, '{}')
+        entry, fresh = ResponseCache(path=self.path).get('key')
+        self.assertEqual(entry['body'], '{}')
+
+    def testMemoryBudget(self):
+        '''Least recently used entries are evicted over the byte budget'''
+        cache = MemoryCache(max_bytes=10)
+        cache.set('a', {'size': 6})
+        cache.set('b', {'size': 6})
+        self.assertEqual(cache.get('a'), None)
+        self.assertEqual(cache.evictions, 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import unittest
+
+from localserver import ReaderHandler, ServerTestCase
+from restclient import RestError
+
+
+class EditHandler(ReaderHandler):
+    '''Answers token and edit-tag requests, recording the edit bodies'''
+    bodies = []
+    token_status = 200
+
+    def do_GET(self):
+        self.respond('faketoken', EditHandler.token_status)
+
+    def do_POST(self):
+        EditHandler.bodies.append(self.body())
+        self.respond('OK')
+
+
+class TestEditTagsBulk(ServerTestCase):
+    '''Test class for batched item tag edits'''
+    handler = EditHandler
+
+    def setUp(self):
+        '''Setups for each test'''
+        EditHandler.bodies = []
+        EditHandler.token_status = 200
+        ServerTestCase.setUp(self)
+        self.client = self.new_client(edit_batch_size=2)
+
+    def testBatches(self):
+        '''One request is sent per batch, holding its ids, feeds and tags'''
+        results = self.client.edit_tags_bulk(['1', ('2', 'feed/http://a.example.com/rss'), '3'],
+            add='news', remove=['user/-/state/com.google/read', 'user/-/state/com.google/starred'])
+        self.assertEqual(results, [(['1', '2'], 'OK'), (['3'], 'OK')])
+        tags = 'a=user%2F-%2Flabel%2Fnews&r=user%2F-%2Fstate%2Fcom.google%2Fread' \
+            '&r=user%2F-%2Fstate%2Fcom.google%2Fstarred&T=faketoken'
+        self.assertEqual(EditHandler.bodies, [
+            'i=1&i=2&s=feed%2Fhttp%3A%2F%2Fa.example.com%2Frss&' + tags,
+            'i=3&' + tags])
+
+    def testBatchSize(self):
+        '''batch_size overrides the configured size'''
+        results = self.client.edit_tags_bulk(['1', '2', '3'], add='news', batch_size=3)
+        self.assertEqual(results, [(['1', '2', '3'], 'OK')])
+        self.assertEqual(self.client.mark_as_read_bulk(['1', '2', '3'], batch_size=1),
+            [(['1'], 'OK'), (['2'], 'OK'), (['3'], 'OK')])
+        self.assertTrue(EditHandler.bodies[-1].startswith('i=3&a=user%2F42%2Fstate%2Fcom.google%2Fread&'))
+
+    def testMarkAsRead(self):
+        '''A single item is marked read with the read state, as in bulk'''
+        self.assertEqual(self.client.mark_as_read('1'), 'OK')
+        self.assertEqual(self.client.mark_as_read('2', 'http://a.example.com/rss'), 'OK')
+        self.assertTrue('a=user%2F42%2Fstate%2Fcom.google%2Fread' in EditHandler.bodies[0])
+        self.assertTrue('a=user%2F42%2Fstate%2Fcom.google%2Fread' in EditHandler.bodies[1])
+        self.assertTrue('s=feed%2Fhttp%3A%2F%2Fa.example.com%2Frss' in EditHandler.bodies[1])
+
+    def testInvalidArguments(self):
+        '''Nothing is sent without a tag or with an empty batch size'''
+        self.assertRaises(ValueError, self.client.edit_tags_bulk, ['1'])
+        self.assertRaises(ValueError, self.client.edit_tags_bulk, ['1'], add=[], remove=[])
+        self.assertRaises(ValueError, self.client.edit_tags_bulk, ['1'], add='news', batch_size=0)
+        self.assertEqual(self.client.edit_tags_bulk([], add='news'), [])
+        self.assertEqual(EditHandler.bodies, [])
+
+    def testFailedTokenIsNotCached(self):
+        '''A token request that fails raises RestError and is not reused'''
+        EditHandler.token_status = 500
+        self.assertRaises(RestError, self.client.edit_tags_bulk, ['1'], add='news')
+        self.assertEqual(EditHandler.bodies, [])
+        EditHandler.token_status = 200
+        self.assertEqual(self.client.edit_tags_bulk(['1'], add='news'), [(['1'], 'OK')])
+        self.assertEqual(EditHandler.bodies, ['i=1&a=user%2F-%2Flabel%2Fnews&T=faketoken'])
+
+
+class TestWriteBehind(ServerTestCase):
+    '''Test class for item edits queued by the write_behind config key'''
+    handler = EditHandler
+
+    def setUp(self):
+        '''Setups for each test'''
+        EditHandler.bodies = []
+        ServerTestCase.setUp(self)
+        self.client = self.new_client(write_behind={'flush_interval': 60})
+
+    def tearDown(self):
+        self.client.close()
+        ServerTestCase.tearDown(self)
+
+    def testEditsAreQueued(self):
+        '''Edits are acknowledged at once and sent when the client closes'''
+        with self.client as client:
+            self.assertEqual(client.add_tag('1', 'news'), 'OK')
+            self.assertEqual(client.mark_as_read('2'), 'OK')
+            self.assertEqual(client.mark_as_read_bulk(['3', ('4', 'feed/http://a.example.com/rss')]),
+                [(['3', '4'], 'OK')])
+            self.assertEqual(EditHandler.bodies, [])
+            self.assertEqual(client.get_write_stats()['depth'], 4)
+        self.assertEqual(EditHandler.bodies, [
+            'i=1&a=user%2F-%2Flabel%2Fnews&T=faketoken',
+            'i=2&i=3&i=4&s=feed%2Fhttp%3A%2F%2Fa.example.com%2Frss&a=user%2F-%2Fstate%2Fcom.google%2Fread&T=faketoken'])
+        self.assertEqual(self.client.get_write_stats()['sent'], 4)
+        self.assertRaises(ValueError, self.client.add_tag, '5', 'news')
+
+
+if __name__ == '__main__':
+    unittest.main()
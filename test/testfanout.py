@@ -0,0 +1,77 @@
+import unittest
+import os
+import sys
+import threading
+import time
+
+# insert application path
+app_path = os.path.join(os.path.realpath(os.path.dirname(__file__)), '../')
+sys.path.insert(0, app_path)
+
+from fanout import fan_out, FetchTimeout
+
+
+class TestFanOut(unittest.TestCase):
+    '''Test class for the parallel fetcher'''
+
+    def testAllKeysAreFetched(self):
+        '''Every key yields one result, errors included'''
+        def fetch(key):
+            if key == 3:
+                raise ValueError(key)
+            return key * 2
+        results = dict((r.key, r) for r in fan_out(fetch, range(10), concurrency=4))
+        self.assertEqual(sorted(results), list(range(10)))
+        self.assertEqual(results[2].result, 4)
+        self.assertTrue(isinstance(results[3].error, ValueError))
+
+    def testFetchesRunConcurrently(self):
+        '''Slow fetches overlap up to the concurrency limit'''
+        start = time.time()
+        list(fan_out(lambda key: time.sleep(0.1), range(8), concurrency=8))
+        self.assertTrue(time.time() - start < 0.5)
+
+    def testSlowFetchTimesOut(self):
+        '''Fetches exceeding the timeout are reported as FetchTimeout'''
+        def fetch(key):
+            time.sleep(1 if key == 'slow' else 0)
+            return key
+        start = time.time()
+        results = dict((r.key, r) for r in fan_out(fetch, ['slow', 'fast'], timeout=0.2))
+        self.assertTrue(time.time() - start < 0.8)
+        self.assertTrue(isinstance(results['slow'].error, FetchTimeout))
+        self.assertEqual(results['fast'].result, 'fast')
+
+    def testCancelStopsFetching(self):
+        '''Setting the cancel event stops further fetches'''
+        cancel = threading.Event()
+        fetched = []
+        def fetch(key):
+            fetched.append(key)
+            time.sleep(0.01)
+            return key
+        for result in fan_out(fetch, range(100), concurrency=2, cancel=cancel):
+            cancel.set()
+        self.assertTrue(len(fetched) < 10)
+
+    def testKeysAreConsumedLazily(self):
+        '''Fetches start while the keys are still being produced'''
+        started = []
+        def keys():
+            for key in range(4):
+                yield key
+                time.sleep(0.05)
+            self.assertTrue(len(started) >= 3)
+        results = list(fan_out(started.append, keys(), concurrency=2))
+        self.assertEqual(len(results), 4)
+
+    def testFailingKeysAreRaised(self):
+        '''An error producing the keys is raised to the consumer'''
+        def keys():
+            yield 1
+            raise ValueError('no more keys')
+        self.assertRaises(ValueError, list, fan_out(lambda key: key, keys()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+import os
+import sys
+
+# insert application path
+app_path = os.path.join(os.path.realpath(os.path.dirname(__file__)), '../')
+sys.path.insert(0, app_path)
+
+from googlereader import GoogleReaderFeedItem
+
+ITEM = {
+    'id': 'tag:google.com,2005:reader/item/5d0cfa30041d4348',
+    'title': 'Item',
+    'author': 'Joe',
+    'published': 1262340000,
+    'updated': 1262340000,
+    'crawlTimeMsec': '1262340000000',
+    'categories': ['user/01234/state/com.google/reading-list'],
+    'alternate': [{'href': 'http://example.com/1', 'type': 'text/html'}],
+    'summary': {'direction': 'ltr', 'content': '<p>%s</p>' % ('Hello ' * 100)},
+    'comments': [],
+    'origin': {'streamId': 'feed/http://example.com/rss', 'title': 'Example'}}
+
+
+class TestGoogleReaderFeedItem(unittest.TestCase):
+    '''Test class for the slotted feed item model'''
+
+    def testDataMatchesResponse(self):
+        '''data rebuilds the fields of the response item'''
+        data = GoogleReaderFeedItem(ITEM, None).data
+        for p in ['id', 'title', 'author', 'published', 'crawlTimeMsec', 'categories', 'alternate', 'summary', 'comments']:
+            self.assertEqual(data[p], ITEM[p])
+        self.assertFalse('content' in data)
+
+    def testOriginStreamId(self):
+        '''The origin stream id is kept'''
+        self.assertEqual(GoogleReaderFeedItem(ITEM, None).stream_id, 'feed/http://example.com/rss')
+
+    def testSummaryIsDecodedOnAccess(self):
+        '''Compressed summaries are decoded when read'''
+        self.assertEqual(GoogleReaderFeedItem(ITEM, None).summary, ITEM['summary'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+
+from localserver import ReaderHandler, ServerTestCase
+from restclient import RestError
+
+SUBSCRIPTIONS = [
+    {'id': 'feed/http://a.example.com/rss', 'title': 'A'},
+    {'id': 'feed/http://broken.example.com/rss', 'title': 'Broken'}]
+
+
+class FeedHandler(ReaderHandler):
+    '''Serves the subscription list and feed contents, recording the paths'''
+    paths = []
+
+    def do_GET(self):
+        path = self.url_path()
+        FeedHandler.paths.append(path)
+        if path.endswith('/subscription/list'):
+            self.respond({'subscriptions': SUBSCRIPTIONS})
+        elif 'broken' in path:
+            self.respond('Error', 500)
+        else:
+            self.respond({'items': [{'id': str(i)} for i in range(int(self.query()['n']))]})
+
+
+class TestFetchAllFeeds(ServerTestCase):
+    '''Test class for fetching every feed concurrently'''
+    handler = FeedHandler
+
+    def setUp(self):
+        '''Setups for each test'''
+        FeedHandler.paths = []
+        ServerTestCase.setUp(self)
+        self.client = self.new_client()
+
+    def testSubscribedFeeds(self):
+        '''Every subscription is fetched; a failed feed is reported with a RestError'''
+        results = dict((r.key, r) for r in self.client.fetch_all_feeds(num=3, concurrency=2))
+        self.assertEqual(sorted(results), sorted(s['id'] for s in SUBSCRIPTIONS))
+        self.assertEqual(len(results['feed/http://a.example.com/rss'].result['items']), 3)
+        self.assertEqual(results['feed/http://a.example.com/rss'].error, None)
+        broken = results['feed/http://broken.example.com/rss']
+        self.assertTrue(isinstance(broken.error, RestError))
+        self.assertEqual(broken.error.response.status_int, 500)
+        self.assertEqual(FeedHandler.paths[0], '/reader/api/0/subscription/list')
+        self.assertEqual(len(FeedHandler.paths), 3)
+
+    def testFeedIds(self):
+        '''Only the given feeds are fetched, without the subscription list'''
+        results = list(self.client.fetch_all_feeds(feed_ids=['feed/http://a.example.com/rss']))
+        self.assertEqual([r.key for r in results], ['feed/http://a.example.com/rss'])
+        self.assertEqual(FeedHandler.paths, ['/reader/api/0/stream/contents/feed/http://a.example.com/rss'])
+
+
+if __name__ == '__main__':
+    unittest.main()
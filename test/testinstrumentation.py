@@ -0,0 +1,59 @@
+import unittest
+import os
+import sys
+
+# insert application path
+app_path = os.path.join(os.path.realpath(os.path.dirname(__file__)), '../')
+sys.path.insert(0, app_path)
+
+from instrumentation import HistogramSink, PrometheusExporter, RequestEvent, endpoint_name
+
+
+def event(endpoint, total, status=200):
+    e = RequestEvent('GET', endpoint)
+    e.status = status
+    e.total = total
+    e.bytes_in = 100
+    return e
+
+
+class TestInstrumentation(unittest.TestCase):
+    '''Test class for request events and metric sinks'''
+
+    def testEndpointName(self):
+        '''Stream ids are left out of endpoint names'''
+        self.assertEqual(endpoint_name('https://www.google.com/reader/api/0/unread-count?all=true'),
+            '/api/0/unread-count')
+        self.assertEqual(endpoint_name('https://www.google.com/reader/api/0/stream/contents/feed/http://a.com/rss'),
+            '/api/0/stream/contents')
+        self.assertEqual(endpoint_name('https://www.google.com/reader/atom/feed/http://a.com/rss'), '/atom')
+        self.assertEqual(endpoint_name('https://www.google.com/accounts/ClientLogin'), '/accounts/ClientLogin')
+
+    def testHistogramPercentiles(self):
+        '''Percentiles come from the bucket bounds'''
+        sink = HistogramSink()
+        for i in range(99):
+            sink(event('/api/0/tag/list', 0.004))
+        sink(event('/api/0/tag/list', 2.0))
+        self.assertEqual(sink.percentile('/api/0/tag/list', 'total', 0.5), 0.005)
+        self.assertEqual(sink.percentile('/api/0/tag/list', 'total', 1.0), 2.5)
+        self.assertEqual(sink.percentile('/api/0/tag/list', 'ttfb', 0.5), None)
+        snapshot = sink.snapshot()
+        self.assertEqual(snapshot['requests'][('/api/0/tag/list', 200)], 100)
+        self.assertEqual(snapshot['bytes'][('/api/0/tag/list', 'in')], 10000)
+
+    def testPrometheusText(self):
+        '''Exporter renders cumulative buckets and counters'''
+        exporter = PrometheusExporter()
+        exporter(event('/api/0/tag/list', 0.004))
+        exporter(event('/api/0/tag/list', 0.02, status=500))
+        text = exporter.render()
+        self.assertTrue('googlereader_request_duration_seconds_bucket{endpoint="/api/0/tag/list",phase="total",le="0.005"} 1\n' in text)
+        self.assertTrue('googlereader_request_duration_seconds_bucket{endpoint="/api/0/tag/list",phase="total",le="+Inf"} 2\n' in text)
+        self.assertTrue('googlereader_request_duration_seconds_count{endpoint="/api/0/tag/list",phase="total"} 2\n' in text)
+        self.assertTrue('googlereader_requests_total{endpoint="/api/0/tag/list",status="500"} 1\n' in text)
+        self.assertTrue('googlereader_transferred_bytes_total{endpoint="/api/0/tag/list",direction="in"} 200\n' in text)
+
+
+if __name__ == '__main__':
+    unittest.main()
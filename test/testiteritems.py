@@ -0,0 +1,88 @@
+import unittest
+import time
+
+from localserver import ReaderHandler, ServerTestCase
+from restclient import RestError
+
+ITEMS = [{'id': 'item%s' % i, 'title': 'Item %s' % i} for i in range(7)]
+
+
+class PagedHandler(ReaderHandler):
+    '''Serves ITEMS n at a time, the continuation token being the offset'''
+    requests = []
+
+    def do_GET(self):
+        params = self.query()
+        params['path'] = self.url_path()
+        PagedHandler.requests.append(params)
+        if params['path'].endswith('/label/broken'):
+            self.respond('', 500)
+            return
+        start = int(params.get('c', 0))
+        num = int(params['n'])
+        page = {'items': ITEMS[start:start + num]}
+        if start + num < len(ITEMS):
+            page['continuation'] = str(start + num)
+        self.respond(page)
+
+
+class TestIterItems(ServerTestCase):
+    '''Test class for paging through streams with iter_items'''
+    handler = PagedHandler
+
+    def setUp(self):
+        '''Setups for each test'''
+        PagedHandler.requests = []
+        ServerTestCase.setUp(self)
+        self.client = self.new_client()
+
+    def testStreamWithLimit(self):
+        '''Streamed pages stop at limit and request only what is left'''
+        items = list(self.client.iter_items(page_size=3, limit=5, stream=True))
+        self.assertEqual([i['id'] for i in items], ['item0', 'item1', 'item2', 'item3', 'item4'])
+        self.assertEqual([(r['n'], r.get('c')) for r in PagedHandler.requests], [('3', None), ('2', '3')])
+
+    def testContinuation(self):
+        '''Pages are followed until the stream has no continuation token'''
+        items = list(self.client.iter_items(page_size=3))
+        self.assertEqual([i['id'] for i in items], ['item%s' % i for i in range(7)])
+        self.assertEqual([r.get('c') for r in PagedHandler.requests], [None, '3', '6'])
+        self.assertTrue(PagedHandler.requests[0]['path'].endswith('/user/42/state/com.google/reading-list'))
+
+    def testLimit(self):
+        '''Only the items up to limit are requested'''
+        items = list(self.client.iter_items(page_size=3, limit=4))
+        self.assertEqual(len(items), 4)
+        self.assertEqual([(r['n'], r.get('c')) for r in PagedHandler.requests], [('3', None), ('1', '3')])
+
+    def testStreamsAndExcludeState(self):
+        '''Labels, feeds and exclude_state are passed on every page'''
+        list(self.client.iter_items(label='news', exclude_state='read', page_size=5))
+        self.assertEqual([r['xt'] for r in PagedHandler.requests], ['user/-/state/com.google/read'] * 2)
+        self.assertTrue(PagedHandler.requests[1]['path'].endswith('/user/42/label/news'))
+        PagedHandler.requests = []
+        list(self.client.iter_items(feed_id='feed/http://a.example.com/rss', page_size=5))
+        self.assertTrue(PagedHandler.requests[1]['path'].endswith('/stream/contents/feed/http://a.example.com/rss'))
+        self.assertEqual(PagedHandler.requests[1]['c'], '5')
+
+    def testPrefetch(self):
+        '''The next page is requested before the current one is consumed'''
+        items = self.client.iter_items(page_size=3, limit=5, prefetch=True)
+        self.assertEqual(next(items)['id'], 'item0')
+        # the prefetch runs on a worker thread
+        for i in range(100):
+            if len(PagedHandler.requests) == 2:
+                break
+            time.sleep(0.01)
+        self.assertEqual([(r['n'], r.get('c')) for r in PagedHandler.requests], [('3', None), ('2', '3')])
+        self.assertEqual([i['id'] for i in items], ['item1', 'item2', 'item3', 'item4'])
+        self.assertEqual(len(PagedHandler.requests), 2)
+
+    def testErrorResponse(self):
+        '''A page that is not a stream raises RestError'''
+        items = self.client.iter_items(label='broken')
+        self.assertRaises(RestError, list, items)
+
+
+if __name__ == '__main__':
+    unittest.main()
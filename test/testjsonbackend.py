@@ -0,0 +1,42 @@
+import unittest
+import json
+import os
+import sys
+
+# insert application path
+app_path = os.path.join(os.path.realpath(os.path.dirname(__file__)), '../')
+sys.path.insert(0, app_path)
+
+from jsonbackend import available_decoders, benchmark, sample_payload, select_decoder
+
+
+class TestJsonBackend(unittest.TestCase):
+    '''Test class for json decoder selection'''
+
+    def testStdlibIsAvailable(self):
+        '''The stdlib decoder is always available'''
+        self.assertTrue('json' in available_decoders())
+
+    def testSelectByName(self):
+        '''Decoders are selected by module name'''
+        self.assertEqual(select_decoder('json'), json.loads)
+        self.assertRaises(ValueError, select_decoder, 'nosuchjson')
+
+    def testCallableIsUsed(self):
+        '''A callable is used as the decoder'''
+        decode = lambda body: {}
+        self.assertEqual(select_decoder(decode), decode)
+
+    def testAutoSelection(self):
+        '''Automatically selected decoder decodes Reader payloads'''
+        payload = sample_payload()
+        self.assertEqual(select_decoder()(payload), json.loads(payload))
+
+    def testBenchmark(self):
+        '''Benchmark times every decoder'''
+        decoders = {'json': json.loads}
+        timings = benchmark([sample_payload(2)], decoders, repeat=1)
+        self.assertEqual(list(timings), ['json'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+import json
+import os
+import sys
+
+# insert application path
+app_path = os.path.join(os.path.realpath(os.path.dirname(__file__)), '../')
+sys.path.insert(0, app_path)
+
+from jsonstream import ItemStream
+
+PAGE = {
+    'id': 'user/-/state/com.google/reading-list',
+    'updated': 1262304000,
+    'items': [{'id': 'item%s' % i, 'title': u'Caf\xe9 %s' % i, 'crawlTimeMsec': '1262304000%03d' % i} for i in range(50)],
+    'continuation': 'CLm1pcrKoZ8C'}
+
+
+class TestItemStream(unittest.TestCase):
+    '''Test class for incremental json decoding'''
+
+    def chunks(self, size):
+        body = json.dumps(PAGE).encode('utf-8')
+        return [body[i:i + size] for i in range(0, len(body), size)]
+
+    def testItemsAndFields(self):
+        '''Items are yielded in order and fields kept afterwards'''
+        for size in (1, 13, 4096):
+            stream = ItemStream(self.chunks(size))
+            self.assertEqual(list(stream), PAGE['items'])
+            self.assertEqual(stream.fields['continuation'], 'CLm1pcrKoZ8C')
+            self.assertEqual(stream.fields['updated'], 1262304000)
+
+    def testEmptyItems(self):
+        '''Pages without items yield nothing'''
+        stream = ItemStream(['{"items": [], "id": "feed/x"}'])
+        self.assertEqual(list(stream), [])
+        self.assertEqual(stream.fields, {'id': 'feed/x'})
+
+    def testTruncatedBody(self):
+        '''A truncated body raises ValueError'''
+        self.assertRaises(ValueError, list, ItemStream(['{"items": [{"id": 1}']))
+
+    def testClose(self):
+        '''Closing a partly read stream releases it'''
+        closed = []
+        stream = ItemStream(self.chunks(64), lambda: closed.append(True))
+        next(stream)
+        stream.close()
+        self.assertEqual(closed, [True])
+
+    def testOtherArray(self):
+        '''Array under another key is iterated'''
+        body = json.dumps({'results': [{'id': '-1'}, {'id': '2'}], 'items': []})
+        stream = ItemStream([body[:7], body[7:]], key='results')
+        self.assertEqual([r['id'] for r in stream], ['-1', '2'])
+        self.assertEqual(stream.fields['items'], [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,166 @@
+import unittest
+import copy
+
+from localserver import ReaderHandler, ServerTestCase
+from googlereader import GoogleFeedReader
+from labelindex import LabelIndex
+
+SUBSCRIPTIONS = [
+    {'id': 'feed/http://a.example.com/rss', 'title': 'A', 'categories': [
+        {'id': 'user/42/label/news', 'label': 'news'}]},
+    {'id': 'feed/http://b.example.com/rss', 'title': 'B', 'categories': [
+        {'id': 'user/42/label/news', 'label': 'news'},
+        {'id': 'user/42/label/tech', 'label': 'tech'}]},
+    {'id': 'feed/http://c.example.com/rss', 'title': 'C', 'categories': []}]
+
+TAGS = [
+    {'id': 'user/42/state/com.google/starred', 'sortid': 'FFFFFFFF'},
+    {'id': 'user/42/label/news', 'sortid': '00000001', 'shared': False},
+    {'id': 'user/42/label/tech', 'sortid': '00000002', 'shared': False},
+    {'id': 'user/42/label/empty', 'sortid': '00000003', 'shared': False}]
+
+
+class FakeClient(object):
+    '''Answers the requests GoogleFeedReader makes, counting list fetches'''
+    def __init__(self):
+        self.fetches = 0
+
+    def get_unread_count(self):
+        return {'max': 1000, 'unreadcounts': []}
+
+    def get_subscription_list(self):
+        self.fetches += 1
+        return {'subscriptions': SUBSCRIPTIONS}
+
+    def get_tag_list(self):
+        self.fetches += 1
+        return {'tags': TAGS}
+
+    def add_label_to_feed(self, title, feed_url, label):
+        return 'OK'
+
+    def remove_label_from_feed(self, title, feed_url, label):
+        return 'OK'
+
+    def unsubscribe_from_feed(self, title, feed_url):
+        return 'OK'
+
+    def delete_tag(self, tag):
+        return 'OK'
+
+    def invalidate_lists(self):
+        pass
+
+    def mark_as_read_bulk(self, items):
+        '''Answers in batches of two, failing the second batch'''
+        return [(items[0:2], 'OK'), (items[2:4], 'Error')][:(len(items) + 1) // 2]
+
+
+class TestLabelIndex(unittest.TestCase):
+    '''Test class for the label index'''
+
+    def testLookups(self):
+        '''Labels and feeds are looked up both ways'''
+        index = LabelIndex(SUBSCRIPTIONS, TAGS)
+        self.assertEqual(index.labels_of('http://b.example.com/rss'), frozenset(['news', 'tech']))
+        self.assertEqual(index.feeds_of('user/42/label/news'),
+            frozenset(['feed/http://a.example.com/rss', 'feed/http://b.example.com/rss']))
+        self.assertEqual(index.feeds_of('empty'), frozenset())
+        self.assertEqual(index.labels(), ['news', 'tech', 'empty'])
+        self.assertEqual(len(index.tags()), 4)
+        self.assertEqual(len(index), 3)
+
+    def testIncrementalUpdates(self):
+        '''Edits update both directions'''
+        index = LabelIndex(SUBSCRIPTIONS, TAGS)
+        index.add('feed/http://c.example.com/rss', 'user/-/label/tech')
+        index.remove('feed/http://b.example.com/rss', 'tech')
+        self.assertEqual(index.feeds_of('tech'), frozenset(['feed/http://c.example.com/rss']))
+        index.remove_label('news')
+        self.assertEqual(index.labels_of('http://a.example.com/rss'), frozenset())
+        self.assertFalse('news' in index.labels())
+        index.remove_feed('http://c.example.com/rss')
+        self.assertEqual(index.feeds_of('tech'), frozenset())
+        self.assertFalse('http://c.example.com/rss' in index)
+        index.add_feed({'id': 'http://d.example.com/rss', 'title': 'D'}, ['tech'])
+        self.assertEqual(index.get_feed('feed/http://d.example.com/rss')['title'], 'D')
+        self.assertEqual(index.feeds_of('tech'), frozenset(['feed/http://d.example.com/rss']))
+
+    def testFeedReaderViews(self):
+        '''Folders and label filters are served from one load of the lists'''
+        client = FakeClient()
+        reader = GoogleFeedReader(client)
+        folders = reader.get_tags()
+        self.assertEqual([f.data['title'] for f in folders], ['starred', 'news', 'tech', 'empty'])
+        self.assertEqual(folders[2].get_feeds(), frozenset(['feed/http://b.example.com/rss']))
+        feed = reader.get_feeds_by_label('tech')[0]
+        self.assertEqual(feed.get_categories(), {'news': 'news', 'tech': 'tech'})
+        self.assertTrue(feed.remove_label('tech'))
+        self.assertEqual(folders[2].get_feeds(), frozenset())
+        self.assertTrue(reader.get_subscriptions()[0].add_label('tech'))
+        self.assertEqual([f.data['streamId'] for f in reader.get_feeds_by_label('tech')],
+            ['feed/http://a.example.com/rss'])
+        self.assertTrue(folders[1].delete())
+        self.assertEqual(feed.get_categories(), {})
+        self.assertEqual(client.fetches, 2)
+        reader.get_label_index(refresh=True)
+        self.assertEqual(client.fetches, 4)
+
+    def testMarkAsRead(self):
+        '''Items marked as read leave unread_items; any failed batch is reported'''
+        reader = GoogleFeedReader(FakeClient())
+        reader.unread_items = dict((i, {'id': i}) for i in '1234')
+        self.assertTrue(reader.mark_as_read(i for i in '12'))
+        self.assertEqual(sorted(reader.unread_items), ['3', '4'])
+        self.assertFalse(reader.mark_as_read(iter('1234')))
+        self.assertEqual(sorted(reader.unread_items), ['3', '4'])
+
+
+class ListHandler(ReaderHandler):
+    '''Serves subscriptions, a copy of SUBSCRIPTIONS, applying label edits to it'''
+    subscriptions = []
+
+    def do_GET(self):
+        path = self.url_path()
+        if path.endswith('/subscription/list'):
+            self.respond({'subscriptions': ListHandler.subscriptions})
+        elif path.endswith('/tag/list'):
+            self.respond({'tags': TAGS})
+        elif path.endswith('/unread-count'):
+            self.respond({'max': 1000, 'unreadcounts': []})
+        else:
+            self.respond('faketoken')
+
+    def do_POST(self):
+        form = self.form()
+        for subscription in ListHandler.subscriptions:
+            if subscription['id'] == form['s'][0] and 'a' in form:
+                subscription['categories'].append({'id': form['a'][0], 'label': form['a'][0].split('/')[-1]})
+        self.respond('OK')
+
+
+class TestRefreshWithCache(ServerTestCase):
+    '''Test class for reloading the label index through a response cache'''
+    handler = ListHandler
+
+    def setUp(self):
+        '''Setups for each test'''
+        ListHandler.subscriptions = copy.deepcopy(SUBSCRIPTIONS)
+        ServerTestCase.setUp(self)
+        self.client = self.new_client(cache=True)
+
+    def testRefreshKeepsEdits(self):
+        '''A refresh reloads the lists instead of the cached ones'''
+        reader = GoogleFeedReader(self.client)
+        self.assertTrue(reader.get_subscriptions()[2].add_label('tech'))
+        self.client.get_subscription_list()
+        # changed by another client once the list was cached again
+        ListHandler.subscriptions[0]['categories'] = []
+        index = reader.get_label_index(refresh=True)
+        self.assertEqual(index.feeds_of('tech'),
+            frozenset(['feed/http://b.example.com/rss', 'feed/http://c.example.com/rss']))
+        self.assertEqual(index.labels_of('http://a.example.com/rss'), frozenset())
+
+
+if __name__ == '__main__':
+    unittest.main()
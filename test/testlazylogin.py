@@ -0,0 +1,132 @@
+import unittest
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from localserver import ReaderHandler, ServerTestCase, app_path
+
+
+class LoginHandler(ReaderHandler):
+    '''
+    Answers ClientLogin, user-info, token, edit-tag and unread-count,
+    recording requests. Requests with an expired SID are refused, as are
+    edits with the token of another session or while stale_token is set
+    '''
+    requests = []
+    expired = []
+    stale_token = False
+
+    def do_POST(self):
+        body = self.body()
+        if '/edit-tag' in self.path:
+            token = body.split('&T=')[1]
+            LoginHandler.requests.append(token)
+            if self.cookie_sid() in LoginHandler.expired:
+                self.respond('Unauthorized', 401)
+            elif LoginHandler.stale_token or token != 'token-' + self.cookie_sid():
+                LoginHandler.stale_token = False
+                self.respond('Unauthorized', 401, headers={'X-Reader-Google-Bad-Token': 'true'})
+            else:
+                self.respond('OK')
+            return
+        time.sleep(0.05)
+        LoginHandler.requests.append(self.path)
+        self.respond('SID=lazysid\nLSID=x\n')
+
+    def do_GET(self):
+        path = self.url_path()
+        LoginHandler.requests.append(path)
+        if path.endswith('/user-info'):
+            self.respond({'userId': '42'})
+        elif self.cookie_sid() in LoginHandler.expired:
+            self.respond('Unauthorized', 401)
+        elif path.endswith('/token'):
+            self.respond('token-' + self.cookie_sid())
+        else:
+            self.respond({'sid': self.cookie_sid()})
+
+
+class TestLazyStartup(ServerTestCase):
+    '''Test class for deferring imports and login until first use'''
+    handler = LoginHandler
+
+    def setUp(self):
+        '''Setups for each test'''
+        LoginHandler.requests = []
+        LoginHandler.expired = ['expired']
+        LoginHandler.stale_token = False
+        ServerTestCase.setUp(self)
+
+    def testFirstRequestLogsIn(self):
+        '''Construction sends nothing, concurrent first requests share one login'''
+        client = self.new_client(username='lazy', password='secret', auth=None, lazy_login=True)
+        self.assertEqual(LoginHandler.requests, [])
+        self.assertEqual(client.get_auth(), None)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(client.get_unread_count())) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [{'sid': 'lazysid'}] * 4)
+        self.assertEqual(client.get_auth(), {'sid': 'lazysid', 'user_id': '42'})
+        self.assertEqual(LoginHandler.requests[:2], ['/accounts/ClientLogin', '/reader/api/0/user-info'])
+        self.assertEqual(LoginHandler.requests.count('/accounts/ClientLogin'), 1)
+
+    def testRejectedSessionsShareOneLogin(self):
+        '''Concurrent requests refused with an expired SID log in again once'''
+        client = self.new_client(username='lazy', password='secret', auth={'sid': 'expired', 'user_id': '42'})
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(client.get_unread_count())) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [{'sid': 'lazysid'}] * 4)
+        self.assertEqual(LoginHandler.requests.count('/accounts/ClientLogin'), 1)
+
+    def testReloginDropsToken(self):
+        '''The edit token of the rejected session is not reused after logging in again'''
+        client = self.new_client(username='lazy', password='secret', auth={'sid': 'oldsid', 'user_id': '42'})
+        self.assertEqual(client.add_tag('1', 'news'), 'OK')
+        LoginHandler.expired.append('oldsid')
+        self.assertEqual(client.get_unread_count(), {'sid': 'lazysid'})
+        self.assertEqual(client.add_tag('2', 'news'), 'OK')
+        tokens = [r for r in LoginHandler.requests if r.startswith('token-')]
+        self.assertEqual(tokens, ['token-oldsid', 'token-lazysid'])
+
+    def testRejectedPostGetsNewToken(self):
+        '''A POST refused with an expired SID is sent again once, with the token of the new session'''
+        client = self.new_client(username='lazy', password='secret', auth={'sid': 'oldsid', 'user_id': '42'})
+        self.assertEqual(client.add_tag('1', 'news'), 'OK')
+        LoginHandler.expired.append('oldsid')
+        del LoginHandler.requests[:]
+        self.assertEqual(client.add_tag('2', 'news'), 'OK')
+        self.assertEqual(LoginHandler.requests, ['token-oldsid', '/accounts/ClientLogin',
+            '/reader/api/0/user-info', '/reader/api/0/token', 'token-lazysid'])
+
+    def testStaleTokenKeepsSession(self):
+        '''A POST refused for its token alone fetches a new token without logging in again'''
+        client = self.new_client(username='lazy', password='secret', auth={'sid': 'lazysid', 'user_id': '42'})
+        self.assertEqual(client.add_tag('1', 'news'), 'OK')
+        LoginHandler.stale_token = True
+        del LoginHandler.requests[:]
+        self.assertEqual(client.add_tag('2', 'news'), 'OK')
+        self.assertEqual(LoginHandler.requests, ['token-lazysid', '/reader/api/0/token', 'token-lazysid'])
+
+    def testImportLeavesOptionalModulesOut(self):
+        '''restkit, cryptography, the xml parser and the transport modules are imported on first use'''
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join([app_path] + ([env['PYTHONPATH']] if 'PYTHONPATH' in env else []))
+        output = subprocess.check_output([sys.executable, '-c',
+            'import sys, googlereader; print(" ".join(sorted(sys.modules)))'], env=env)
+        modules = output.decode('utf-8').split()
+        for name in ('restkit', 'cryptography', 'xml.etree.ElementTree', 'pool', 'ssl', 'http.client',
+                'cache', 'atom', 'instrumentation'):
+            self.assertFalse(name in modules, name)
+
+
+if __name__ == '__main__':
+    unittest.main()
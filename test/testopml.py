@@ -0,0 +1,88 @@
+import unittest
+import io
+
+from localserver import ReaderHandler, ServerTestCase
+from opml import iter_opml, read_opml
+from restclient import RestError
+
+OPML = b'''<?xml version="1.0" encoding="UTF-8"?>
+<opml version="1.0">
+  <head><title>Subscriptions</title></head>
+  <body>
+    <outline title="Loose" text="Loose" type="rss" xmlUrl="http://loose.example.com/rss"/>
+    <outline title="News" text="News">
+      <outline title="Daily" text="Daily" type="rss" xmlUrl="http://daily.example.com/rss"/>
+      <outline text="Broken" type="rss" xmlUrl="http://broken.example.com/rss"/>
+    </outline>
+    <outline text="Tech">
+      <outline title="Daily" type="rss" xmlUrl="http://daily.example.com/rss"/>
+    </outline>
+  </body>
+</opml>'''
+
+
+class TestOpml(unittest.TestCase):
+    '''Test class for OPML parsing'''
+
+    def testIterOpml(self):
+        '''Feeds are yielded in order with their enclosing folder'''
+        self.assertEqual(list(iter_opml(io.BytesIO(OPML))), [
+            ('http://loose.example.com/rss', 'Loose', None),
+            ('http://daily.example.com/rss', 'Daily', 'News'),
+            ('http://broken.example.com/rss', 'Broken', 'News'),
+            ('http://daily.example.com/rss', 'Daily', 'Tech')])
+
+    def testReadOpmlMergesFolders(self):
+        '''A feed listed in several folders gets all of them as labels'''
+        feeds = read_opml(io.BytesIO(OPML))
+        self.assertEqual(list(feeds), ['http://loose.example.com/rss',
+            'http://daily.example.com/rss', 'http://broken.example.com/rss'])
+        self.assertEqual(feeds['http://daily.example.com/rss'], {'title': 'Daily', 'labels': ['News', 'Tech']})
+        self.assertEqual(feeds['http://loose.example.com/rss']['labels'], [])
+
+
+class SubscribeHandler(ReaderHandler):
+    '''Answers token and subscription edit requests, recording the edits'''
+    edits = []
+    tokens = 0
+
+    def do_GET(self):
+        SubscribeHandler.tokens += 1
+        self.respond('faketoken')
+
+    def do_POST(self):
+        form = self.form()
+        SubscribeHandler.edits.append(form)
+        if 'broken' in form['s'][0]:
+            self.respond('Error', 500)
+        else:
+            self.respond('OK')
+
+
+class TestImportOpml(ServerTestCase):
+    '''Test class for subscribing to the feeds of an OPML document'''
+    handler = SubscribeHandler
+
+    def setUp(self):
+        '''Setups for each test'''
+        SubscribeHandler.edits = []
+        SubscribeHandler.tokens = 0
+        ServerTestCase.setUp(self)
+
+    def testImportOpml(self):
+        '''Each feed is subscribed and labelled in one request'''
+        report = self.new_client().import_OPML(io.BytesIO(OPML), concurrency=3)
+        self.assertEqual(list(report), ['http://loose.example.com/rss',
+            'http://daily.example.com/rss', 'http://broken.example.com/rss'])
+        self.assertEqual(report['http://loose.example.com/rss'].result, 'OK')
+        self.assertTrue(isinstance(report['http://broken.example.com/rss'].error, RestError))
+        self.assertEqual(len(SubscribeHandler.edits), 3)
+        self.assertEqual(SubscribeHandler.tokens, 1)
+        daily = [edit for edit in SubscribeHandler.edits if edit['s'] == ['feed/http://daily.example.com/rss']][0]
+        self.assertEqual(daily['ac'], ['subscribe'])
+        self.assertEqual(daily['t'], ['Daily'])
+        self.assertEqual(daily['a'], ['user/-/label/News', 'user/-/label/Tech'])
+        self.assertEqual(daily['T'], ['faketoken'])
+
+if __name__ == '__main__':
+    unittest.main()
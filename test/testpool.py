@@ -0,0 +1,118 @@
+import unittest
+import socket
+import time
+try:
+    import httplib
+except ImportError:
+    import http.client as httplib
+
+from localserver import ReaderHandler, ServerTestCase
+from pool import ConnectionPool
+
+
+class EchoHandler(ReaderHandler):
+    '''
+    Echoes the request path over a keep-alive connection. /close closes
+    the socket after answering, without telling the client, and /drop
+    closes it without answering
+    '''
+    posts = []
+
+    def do_GET(self):
+        self.echo()
+
+    def do_POST(self):
+        EchoHandler.posts.append(self.body())
+        self.echo()
+
+    def echo(self):
+        if self.path == '/drop':
+            self.close_connection = True
+            return
+        self.respond(self.path)
+        if self.path == '/close':
+            self.close_connection = True
+
+
+class TestConnectionPool(ServerTestCase):
+    '''Test class for the persistent connection pool'''
+    handler = EchoHandler
+
+    def setUp(self):
+        '''Setups for each test'''
+        EchoHandler.posts = []
+        ServerTestCase.setUp(self)
+
+    def testConnectionIsReused(self):
+        '''Successive requests share one socket'''
+        pool = ConnectionPool()
+        for i in range(3):
+            response = pool.request('GET', self.url + '/path', n=i)
+            self.assertEqual(response.body, '/path?n=%s' % i)
+        self.assertFalse('connect' in response.timings)
+        self.assertTrue(response.timings['ttfb'] > 0)
+        stats = pool.stats()
+        self.assertEqual(stats['created'], 1)
+        self.assertEqual(stats['reused'], 2)
+        self.assertEqual(stats['open_sockets'], 1)
+        pool.close()
+
+    def testKeepAliveDisabled(self):
+        '''Sockets are closed after each request without keep-alive'''
+        pool = ConnectionPool(keep_alive=False)
+        pool.request('GET', self.url + '/')
+        pool.request('GET', self.url + '/')
+        self.assertEqual(pool.stats()['created'], 2)
+        self.assertEqual(pool.stats()['open_sockets'], 0)
+
+    def testIdleConnectionsExpire(self):
+        '''Idle sockets older than idle_timeout are not reused'''
+        pool = ConnectionPool(idle_timeout=0)
+        pool.request('GET', self.url + '/')
+        pool.request('GET', self.url + '/')
+        self.assertEqual(pool.stats()['reused'], 0)
+        pool.close()
+
+    def testFallsBackToNextAddress(self):
+        '''An unreachable address is skipped for the next one resolved'''
+        closed = socket.socket()
+        closed.bind(('127.0.0.1', 0))
+        unreachable = closed.getsockname()
+        closed.close()
+        getaddrinfo = socket.getaddrinfo
+        def resolve(host, port, *args):
+            return [(socket.AF_INET, socket.SOCK_STREAM, 6, '', unreachable),
+                (socket.AF_INET, socket.SOCK_STREAM, 6, '', ('127.0.0.1', port))]
+        socket.getaddrinfo = resolve
+        try:
+            pool = ConnectionPool()
+            self.assertEqual(pool.request('GET', self.url + '/path').body, '/path')
+        finally:
+            socket.getaddrinfo = getaddrinfo
+        pool.close()
+
+
+    def testStaleSocketIsRetriedForGet(self):
+        '''A GET sent on a socket the server closed is resent on a new one'''
+        pool = ConnectionPool()
+        pool.request('GET', self.url + '/close')
+        self.assertEqual(pool.request('GET', self.url + '/path').body, '/path')
+        self.assertEqual(pool.stats()['created'], 2)
+        pool.close()
+
+    def testPostIsNotResent(self):
+        '''A POST is sent on a new socket if the idle one was closed, and never resent'''
+        pool = ConnectionPool()
+        pool.request('GET', self.url + '/close')
+        # let the close reach the client
+        time.sleep(0.05)
+        self.assertEqual(pool.request('POST', self.url + '/path', body={'a': '1'}).body, '/path')
+        self.assertEqual(pool.stats()['created'], 2)
+        self.assertRaises((httplib.HTTPException, socket.error), pool.request,
+            'POST', self.url + '/drop', body={'a': '2'})
+        self.assertEqual(EchoHandler.posts, ['a=1', 'a=2'])
+        pool.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
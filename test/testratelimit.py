@@ -0,0 +1,142 @@
+import unittest
+import os
+import sys
+import threading
+import time
+
+# insert application path
+app_path = os.path.join(os.path.realpath(os.path.dirname(__file__)), '../')
+sys.path.insert(0, app_path)
+
+from localserver import ReaderHandler, ServerTestCase
+from ratelimit import Coalescer, HostRateLimiter, RetryPolicy, TokenBucket
+from restclient import restClient
+
+
+class Response(object):
+    def __init__(self, status, headers=None):
+        self.status_int = status
+        self.headers = headers or {}
+
+
+class TestTokenBucket(unittest.TestCase):
+    '''Test class for the token bucket rate limiter'''
+
+    def setUp(self):
+        '''Setups for each test'''
+        self.now = 0.0
+        self.bucket = TokenBucket(10, burst=2, clock=lambda: self.now)
+
+    def testBurstIsFree(self):
+        '''Requests within the burst do not wait'''
+        self.assertEqual(self.bucket.reserve(), 0)
+        self.assertEqual(self.bucket.reserve(), 0)
+        self.assertAlmostEqual(self.bucket.reserve(), 0.1)
+        self.assertAlmostEqual(self.bucket.reserve(), 0.2)
+
+    def testTokensRefill(self):
+        '''Tokens come back at rate per second up to the burst'''
+        for i in range(3):
+            self.bucket.reserve()
+        self.now = 10.0
+        self.assertEqual(self.bucket.reserve(), 0)
+        self.assertEqual(self.bucket.reserve(), 0)
+        self.assertTrue(self.bucket.reserve() > 0)
+
+    def testHostBuckets(self):
+        '''Each host has its own bucket'''
+        limiter = HostRateLimiter(1)
+        self.assertTrue(limiter.bucket('http://a.com/x') is limiter.bucket('http://a.com/y'))
+        self.assertFalse(limiter.bucket('http://a.com/x') is limiter.bucket('http://b.com/x'))
+
+
+class TestRetryPolicy(unittest.TestCase):
+    '''Test class for the retry policy'''
+
+    def testRetriedStatuses(self):
+        '''Throttling and server errors are retried a limited number of times'''
+        policy = RetryPolicy(retries=2)
+        self.assertTrue(policy.should_retry(0, Response(503)))
+        self.assertTrue(policy.should_retry(1, Response(429)))
+        self.assertFalse(policy.should_retry(2, Response(503)))
+        self.assertFalse(policy.should_retry(0, Response(404)))
+        self.assertTrue(policy.should_retry(0, error=IOError('reset')))
+        self.assertFalse(policy.should_retry(0, error=ValueError('bad')))
+
+    def testDelay(self):
+        '''Delays back off exponentially, or follow Retry-After'''
+        policy = RetryPolicy(backoff=1, max_backoff=5)
+        for attempt in range(6):
+            self.assertTrue(0 <= policy.delay(attempt) <= min(5, 2 ** attempt))
+        self.assertEqual(policy.delay(0, Response(429, {'retry-after': '3'})), 3)
+
+
+class DropHandler(ReaderHandler):
+    '''Closes every connection without answering, recording the methods'''
+    methods = []
+
+    def do_GET(self):
+        DropHandler.methods.append('GET')
+        self.close_connection = True
+
+    def do_POST(self):
+        self.body()
+        DropHandler.methods.append('POST')
+        self.close_connection = True
+
+
+class TestRetriedRequests(ServerTestCase):
+    '''Test class for retrying requests after network errors'''
+    handler = DropHandler
+
+    def setUp(self):
+        '''Setups for each test'''
+        DropHandler.methods = []
+        ServerTestCase.setUp(self)
+        self.client = restClient({'pool': {}, 'retry': {'retries': 2, 'backoff': 0}})
+
+    def testGetIsRetried(self):
+        '''A GET is sent again up to retries times'''
+        self.assertRaises(EnvironmentError, self.client.request, 'GET', self.url + '/list')
+        self.assertEqual(DropHandler.methods, ['GET'] * 3)
+
+    def testPostIsSentOnce(self):
+        '''A POST is not sent again, the server may have applied it'''
+        self.assertRaises(EnvironmentError, self.client.request, 'POST', self.url + '/edit', body={'a': '1'})
+        self.assertEqual(DropHandler.methods, ['POST'])
+
+
+class TestCoalescer(unittest.TestCase):
+    '''Test class for sharing in-flight calls'''
+
+    def testConcurrentCallsShareResult(self):
+        '''Callers of a key in flight get the result of the same call'''
+        coalescer = Coalescer()
+        calls = []
+        release = threading.Event()
+        def fetch():
+            calls.append(True)
+            release.wait()
+            return {'count': len(calls)}
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(coalescer.do('key', fetch))) for i in range(5)]
+        for thread in threads:
+            thread.start()
+        while coalescer.stats['calls'] + coalescer.stats['coalesced'] < 5:
+            time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{'count': 1}] * 5)
+        self.assertEqual(coalescer.do('key', fetch), {'count': 2})
+
+    def testErrorIsShared(self):
+        '''A failing call raises in the caller'''
+        def fail():
+            raise IOError('down')
+        self.assertRaises(IOError, Coalescer().do, 'key', fail)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+import os
+import sys
+
+# insert application path
+app_path = os.path.join(os.path.realpath(os.path.dirname(__file__)), '../')
+sys.path.insert(0, app_path)
+
+from fanout import FetchResult
+from scheduler import RefreshScheduler
+
+
+class FakeClient(object):
+    '''Returns canned unread counts and records feed fetches'''
+
+    def __init__(self):
+        self.newest = {'feed/a': 1, 'feed/b': 1}
+        self.fetched = []
+        self.failing = set()
+
+    def get_unread_count(self):
+        return {'max': 1000, 'unreadcounts': [
+            {'id': feed_id, 'count': 1, 'newestItemTimestampUsec': str(newest)}
+            for feed_id, newest in self.newest.items()]}
+
+    def fetch_all_feeds(self, num, concurrency, feed_ids):
+        for feed_id in feed_ids:
+            self.fetched.append(feed_id)
+            if feed_id in self.failing:
+                yield FetchResult(feed_id, None, ValueError(feed_id), 0)
+            else:
+                yield FetchResult(feed_id, {'items': []}, None, 0)
+
+
+class TestRefreshScheduler(unittest.TestCase):
+    '''Test class for the unread count driven scheduler'''
+
+    def setUp(self):
+        '''Setups for each test'''
+        self.now = 0
+        self.client = FakeClient()
+        self.scheduler = RefreshScheduler(self.client, min_interval=10, max_interval=100,
+            jitter=0, clock=lambda: self.now)
+
+    def testOnlyChangedFeedsAreFetched(self):
+        '''Feeds whose newest timestamp did not move are not fetched'''
+        self.assertEqual(sorted(self.scheduler.poll()), ['feed/a', 'feed/b'])
+        self.client.newest['feed/a'] = 2
+        self.now = 10
+        self.assertEqual(list(self.scheduler.poll()), ['feed/a'])
+        self.assertEqual(self.client.fetched.count('feed/b'), 1)
+
+    def testIdleFeedsBackOff(self):
+        '''Polling interval grows while a feed stays unchanged'''
+        self.scheduler.poll()
+        for self.now in (10, 30, 70, 150, 250):
+            self.scheduler.poll()
+        self.assertEqual(self.scheduler.get_interval('feed/a'), 100)
+        self.assertEqual(self.scheduler.next_poll(), 100)
+
+    def testChangedFeedsAreFetchedAtOnce(self):
+        '''A change seen in the unread counts is fetched before the interval elapses'''
+        self.scheduler.poll()
+        for self.now in (10, 30, 70, 150, 250):
+            self.scheduler.poll()
+        self.client.newest['feed/a'] = 2
+        self.now = 260
+        self.assertEqual(list(self.scheduler.poll()), ['feed/a'])
+        self.assertEqual(self.scheduler.get_interval('feed/a'), 50)
+        self.assertEqual(self.client.fetched.count('feed/b'), 1)
+
+    def testFailedFetchIsRetried(self):
+        '''A feed that failed to fetch is fetched again when next due'''
+        self.client.failing.add('feed/a')
+        self.assertEqual(list(self.scheduler.poll()), ['feed/b'])
+        self.client.failing.clear()
+        self.assertEqual(list(self.scheduler.poll()), ['feed/a'])
+        self.assertEqual(self.scheduler.stats['errors'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
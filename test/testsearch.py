@@ -0,0 +1,88 @@
+import unittest
+
+from localserver import ReaderHandler, ServerTestCase
+from googlereader import _short_id
+from restclient import RestError
+
+# search answers with signed decimal ids, the last one being negative
+SHORT_IDS = ['1', '2', '3', '4', '-1']
+ITEMS = dict((short_id, {'id': 'tag:google.com,2005:reader/item/%016x' % (int(short_id) % (1 << 64)),
+    'title': 'Item %s' % short_id}) for short_id in SHORT_IDS)
+
+
+class SearchHandler(ReaderHandler):
+    '''Answers search id and item contents requests, recording them'''
+    searches = []
+    contents = []
+
+    def do_GET(self):
+        params = self.query()
+        if not self.url_path().endswith('/search/items/ids'):
+            self.respond('faketoken')
+        elif params['q'] == 'broken':
+            self.respond('Error', 500)
+        else:
+            SearchHandler.searches.append(params)
+            self.respond({'results': [{'id': i} for i in SHORT_IDS[:int(params['num'])]]})
+
+    def do_POST(self):
+        ids = self.form()['i']
+        SearchHandler.contents.append(ids)
+        self.respond({'items': [ITEMS[i] for i in ids]})
+
+
+class TestSearch(ServerTestCase):
+    '''Test class for search and the hydrated item cache'''
+    handler = SearchHandler
+
+    def setUp(self):
+        '''Setups for each test'''
+        SearchHandler.searches = []
+        SearchHandler.contents = []
+        ServerTestCase.setUp(self)
+
+    def testShortId(self):
+        '''Long form item ids convert to signed decimal'''
+        self.assertEqual(_short_id('tag:google.com,2005:reader/item/000000000000000a'), '10')
+        self.assertEqual(_short_id('tag:google.com,2005:reader/item/7fffffffffffffff'), str((1 << 63) - 1))
+        self.assertEqual(_short_id('tag:google.com,2005:reader/item/ffffffffffffffff'), '-1')
+
+    def testBatchedHydration(self):
+        '''Contents are fetched chunk_size ids at a time'''
+        items = list(self.new_client().search('python', num=5, chunk_size=2, concurrency=1))
+        self.assertEqual([item['title'] for item in items], ['Item %s' % i for i in SHORT_IDS])
+        self.assertEqual(SearchHandler.contents, [['1', '2'], ['3', '4'], ['-1']])
+        self.assertEqual(SearchHandler.searches, [{'q': 'python', 'num': '5', 'client': 'test', 'output': 'json'}])
+
+    def testScope(self):
+        '''Scopes restrict the search to a state, folder or feed'''
+        client = self.new_client()
+        list(client.search('python', scope='starred', num=1))
+        list(client.search('python', scope='folder', target='news', num=1))
+        list(client.search('python', scope='feed', target='feed/http://a.example.com/rss', num=1))
+        self.assertEqual([s['s'] for s in SearchHandler.searches], ['user/42/state/com.google/starred',
+            'user/42/label/news', 'feed/http://a.example.com/rss'])
+        self.assertRaises(ValueError, list, client.search('python', scope='unknown'))
+
+    def testHydratedItemsAreReused(self):
+        '''Items fetched by an earlier search are not fetched again'''
+        client = self.new_client()
+        list(client.search('python', num=3, concurrency=1))
+        items = list(client.search('python', num=4, concurrency=1))
+        self.assertEqual(len(items), 4)
+        self.assertEqual(SearchHandler.contents, [['1', '2', '3'], ['4']])
+
+    def testCacheSize(self):
+        '''The least recently used items are dropped beyond search_cache_size'''
+        client = self.new_client(search_cache_size=2)
+        list(client.search('python', num=3, concurrency=1))
+        list(client.search('python', num=3, concurrency=1))
+        self.assertEqual(SearchHandler.contents, [['1', '2', '3'], ['1']])
+
+    def testErrorResponse(self):
+        '''A failed id search raises RestError'''
+        self.assertRaises(RestError, list, self.new_client().search('broken'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+import unittest
+
+from localserver import ReaderHandler, ServerTestCase
+from searchindex import MemorySearchIndex, SqliteSearchIndex, fts5_available, open_index
+
+
+def make_item(i, title, body, feed='news', categories=()):
+    return {
+        'id': 'tag:google.com,2005:reader/item/%016x' % i,
+        'title': title,
+        'summary': {'content': body},
+        'author': 'Ann',
+        'crawlTimeMsec': str(1262304000000 + i * 1000),
+        'categories': ['user/01234/state/com.google/reading-list'] + list(categories),
+        'origin': {'streamId': 'feed/http://%s.example.com/rss' % feed}}
+
+ITEMS = [
+    make_item(1, 'Python packaging', '<p>Wheels &amp; eggs</p>', categories=['user/01234/label/tech']),
+    make_item(2, 'Election night', 'Results from every <b>district</b>',
+        categories=['user/01234/state/com.google/read', 'user/01234/label/politics']),
+    make_item(3, 'Python tips', 'Generators everywhere', 'blog',
+        ['user/01234/state/com.google/starred', 'user/01234/label/tech']),
+    make_item(4, 'Café review', 'Espresso in the old town', 'blog')]
+
+
+class SearchIndexTests(object):
+    '''Tests run against each search index engine'''
+
+    def setUp(self):
+        '''Setups for each test'''
+        self.index = self.create_index()
+        self.index.add_items(ITEMS)
+
+    def search(self, query, scope='all', target=None):
+        return [item['title'] for item in self.index.search(query, scope, target)]
+
+    def testWords(self):
+        '''Every word must match, in any field, ignoring case, markup and accents'''
+        self.assertEqual(sorted(self.search('python')), ['Python packaging', 'Python tips'])
+        self.assertEqual(self.search('PYTHON wheels'), ['Python packaging'])
+        self.assertEqual(self.search('eggs'), ['Python packaging'])
+        self.assertEqual(self.search('cafe'), ['Café review'])
+        self.assertEqual(self.search('ann gener*'), ['Python tips'])
+        self.assertEqual(self.search('b district'), [])
+        self.assertEqual(self.search('"('), [])
+
+    def testScopes(self):
+        '''Searches are limited to the scopes of the remote search'''
+        self.assertEqual(self.search('results', 'read'), ['Election night'])
+        self.assertEqual(self.search('python', 'starred'), ['Python tips'])
+        self.assertEqual(sorted(self.search('python', 'folder', 'tech')), ['Python packaging', 'Python tips'])
+        self.assertEqual(self.search('python', 'feed', 'http://blog.example.com/rss'), ['Python tips'])
+        self.assertEqual(self.search('python', 'shared'), [])
+        self.assertRaises(ValueError, self.index.search, 'python', 'everywhere')
+
+    def testUpdates(self):
+        '''Refetched items replace earlier copies and tag edits change scopes'''
+        self.index.add_items([make_item(1, 'Rust packaging', 'Crates')])
+        self.assertEqual(len(self.index), 4)
+        self.assertEqual(self.search('python'), ['Python tips'])
+        self.assertEqual(self.search('crates', 'folder', 'tech'), [])
+        self.index.set_tag([ITEMS[0]['id']], 'user/-/state/com.google/starred')
+        self.index.set_tag([ITEMS[2]['id']], 'user/-/state/com.google/starred', False)
+        self.assertEqual(self.search('packaging', 'starred'), ['Rust packaging'])
+        self.assertEqual(self.search('python', 'starred'), [])
+
+
+@unittest.skipUnless(fts5_available(), 'sqlite3 was built without FTS5')
+class TestSqliteSearchIndex(SearchIndexTests, unittest.TestCase):
+    '''Test class for the FTS5 search index'''
+
+    def create_index(self):
+        return SqliteSearchIndex()
+
+
+class TestMemorySearchIndex(SearchIndexTests, unittest.TestCase):
+    '''Test class for the pure Python search index'''
+
+    def create_index(self):
+        return MemorySearchIndex()
+
+    def testOpenIndex(self):
+        '''The memory engine cannot be kept in a file'''
+        self.assertTrue(isinstance(open_index(engine='memory'), MemorySearchIndex))
+        self.assertRaises(ValueError, open_index, 'index.db', 'memory')
+        self.assertRaises(ValueError, open_index, engine='lucene')
+
+
+class ItemHandler(ReaderHandler):
+    '''Serves ITEMS as the reading list and search results, recording paths'''
+    paths = []
+
+    def do_GET(self):
+        path = self.url_path()
+        ItemHandler.paths.append(path)
+        if '/stream/contents/' in path:
+            self.respond({'items': ITEMS[:2]})
+        elif path.endswith('/search/items/ids'):
+            self.respond({'results': [{'id': '3'}]})
+        else:
+            self.respond('faketoken')
+
+    def do_POST(self):
+        path = self.url_path()
+        ItemHandler.paths.append(path)
+        self.body()
+        if path.endswith('/stream/items/contents'):
+            self.respond({'items': [ITEMS[2]]})
+        else:
+            self.respond('OK')
+
+
+class TestSearchLocal(ServerTestCase):
+    '''Test class for searching items indexed by the client'''
+    handler = ItemHandler
+
+    def setUp(self):
+        '''Setups for each test'''
+        ItemHandler.paths = []
+        ServerTestCase.setUp(self)
+        self.client = self.new_client(search_index={'engine': 'memory'}, auth={'sid': 'sid', 'user_id': '01234'})
+
+    def testIndexedItems(self):
+        '''Fetched items are searched without a request and tag edits change scopes'''
+        self.client.get_all_items(num=2)
+        ItemHandler.paths = []
+        self.assertEqual([i['title'] for i in self.client.search_local('election', 'read')], ['Election night'])
+        self.client.remove_tag(ITEMS[1]['id'], 'politics')
+        self.assertEqual(self.client.search_local('election', 'folder', 'politics', fallback=False), [])
+        self.assertEqual(ItemHandler.paths, ['/reader/api/0/token', '/reader/api/0/edit-tag'])
+
+    def testFallback(self):
+        '''Searches nothing matches locally go to the server and are indexed'''
+        self.assertEqual([i['title'] for i in self.client.search_local('generators')], ['Python tips'])
+        self.assertEqual(ItemHandler.paths[0], '/reader/api/0/search/items/ids')
+        ItemHandler.paths = []
+        self.assertEqual([i['title'] for i in self.client.search_local('generators', 'starred')], ['Python tips'])
+        self.assertEqual(ItemHandler.paths, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+import time
+
+from localserver import ReaderHandler, ServerTestCase
+from sessionpool import LoginError, ReaderSessionPool
+
+
+class LoginHandler(ReaderHandler):
+    '''Answers ClientLogin and user-info, counting logins'''
+    logins = []
+
+    def do_POST(self):
+        form = self.form()
+        time.sleep(0.05)
+        LoginHandler.logins.append(form['Email'][0])
+        if form['Passwd'][0] == 'secret':
+            self.respond('SID=sid-%s\nLSID=x\n' % form['Email'][0])
+        else:
+            self.respond('Error=BadAuthentication\n', 403)
+
+    def do_GET(self):
+        self.respond({'userId': self.cookie_sid()})
+
+
+class TestReaderSessionPool(ServerTestCase):
+    '''Test class for the multi-account session pool'''
+    handler = LoginHandler
+
+    def setUp(self):
+        '''Setups for each test'''
+        LoginHandler.logins = []
+        ServerTestCase.setUp(self)
+        self.now = 0
+        self.sessions = ReaderSessionPool(self.config(auth=None),
+            max_sessions=3, session_ttl=60, clock=lambda: self.now)
+
+    def tearDown(self):
+        self.sessions.close()
+        ServerTestCase.tearDown(self)
+
+    def testSessionIsReused(self):
+        '''An account logs in once until its session expires'''
+        client = self.sessions.get('a', 'secret')
+        self.assertEqual(client.get_auth(), {'sid': 'sid-a', 'user_id': 'sid-a'})
+        self.assertTrue(self.sessions.get('a', 'secret') is client)
+        self.now = 61
+        self.assertFalse(self.sessions.get('a', 'secret') is client)
+        self.assertEqual(LoginHandler.logins, ['a', 'a'])
+
+    def testPasswordMustMatch(self):
+        '''A session is not handed to a caller with another password'''
+        client = self.sessions.get('a', 'secret')
+        self.assertRaises(LoginError, self.sessions.get, 'a', 'guess')
+        self.assertTrue(self.sessions.get('a', 'secret') is client)
+        self.assertEqual(LoginHandler.logins, ['a', 'a'])
+        self.assertEqual(self.sessions.stats['mismatches'], 1)
+
+    def testConcurrentLogins(self):
+        '''Accounts log in concurrently, each once, over shared sockets'''
+        start = time.time()
+        errors = self.sessions.login_all([('a', 'secret'), ('b', 'secret'), ('c', 'wrong')])
+        self.assertTrue(time.time() - start < 0.15)
+        self.assertEqual(list(errors), ['c'])
+        self.assertTrue(isinstance(errors['c'], LoginError))
+        self.assertEqual(sorted(LoginHandler.logins), ['a', 'b', 'c'])
+        self.assertEqual(len(self.sessions), 2)
+
+    def testLeastRecentlyUsedIsEvicted(self):
+        '''Sessions beyond max_sessions are dropped, oldest use first'''
+        for username in 'abc':
+            self.sessions.get(username, 'secret')
+        self.sessions.get('a', 'secret')
+        self.sessions.get('d', 'secret')
+        self.assertEqual(len(self.sessions), 3)
+        self.sessions.get('a', 'secret')
+        self.sessions.get('b', 'secret')
+        self.assertEqual(LoginHandler.logins, ['a', 'b', 'c', 'd', 'b'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+import os
+import sys
+
+# insert application path
+app_path = os.path.join(os.path.realpath(os.path.dirname(__file__)), '../')
+sys.path.insert(0, app_path)
+
+from store import ItemStore
+
+
+def make_item(i, label='news', read=False):
+    categories = ['user/01234/state/com.google/reading-list', 'user/01234/label/%s' % label]
+    if read:
+        categories.append('user/01234/state/com.google/read')
+    return {
+        'id': 'item%s' % i,
+        'crawlTimeMsec': str(1262304000000 + i * 1000),
+        'categories': categories,
+        'origin': {'streamId': 'feed/http://example.com/%s' % label}}
+
+
+class PagedClient(object):
+    '''Serves items crawled since ot= in pages of page_size'''
+    def __init__(self, items):
+        self.items = items
+        self.requests = []
+
+    def get_items_by_state_or_label(self, state, num, order='n', label=None, continuation=None, start_time=None):
+        self.requests.append((start_time, continuation))
+        items = [i for i in self.items if int(i['crawlTimeMsec']) // 1000 >= (start_time or 0)]
+        start = int(continuation or 0)
+        page = {'items': items[start:start + num]}
+        if start + num < len(items):
+            page['continuation'] = str(start + num)
+        return page
+
+
+class TestItemStore(unittest.TestCase):
+    '''Test class for the local item store'''
+
+    def setUp(self):
+        '''Setups for each test'''
+        self.store = ItemStore()
+
+    def testQueriesByLabelAndState(self):
+        '''Unread items are served by label'''
+        self.store.add_items([make_item(1), make_item(2, read=True), make_item(3, 'sport')])
+        self.assertEqual([i['id'] for i in self.store.get_items(label='news', unread_only=True)], ['item1'])
+        self.assertEqual(self.store.count_unread(), 2)
+        self.store.set_read(['item1'])
+        self.assertEqual(self.store.count_unread('news'), 0)
+
+    def testOrdering(self):
+        '''Items are returned newest first'''
+        self.store.add_items([make_item(1), make_item(2)])
+        self.assertEqual([i['id'] for i in self.store.get_items()], ['item2', 'item1'])
+        self.assertEqual([i['id'] for i in self.store.get_items(order='o', num=1)], ['item1'])
+
+    def testIncrementalSync(self):
+        '''Only items crawled since the last sync are requested'''
+        client = PagedClient([make_item(i) for i in range(5)])
+        self.assertEqual(self.store.sync(client, page_size=2), 5)
+        self.assertEqual(client.requests, [(None, None), (None, '2'), (None, '4')])
+        client.items.append(make_item(10))
+        client.requests = []
+        self.store.sync(client, page_size=2)
+        self.assertEqual(client.requests, [(1262304004, None)])
+        self.assertEqual(len(self.store.get_items()), 6)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import unittest
+
+from localserver import ReaderHandler, ServerTestCase
+from subscriptions import SubscriptionEdit, plan_subscriptions
+
+SUBSCRIPTIONS = [
+    {'id': 'feed/http://a.example.com/rss', 'title': 'A', 'categories': [
+        {'id': 'user/42/label/news', 'label': 'news'}]},
+    {'id': 'feed/http://b.example.com/rss', 'title': 'B', 'categories': [
+        {'id': 'user/42/label/news', 'label': 'news'},
+        {'id': 'user/42/label/tech', 'label': 'tech'}]},
+    {'id': 'feed/http://c.example.com/rss', 'title': 'C', 'categories': []}]
+
+
+class TestPlanSubscriptions(unittest.TestCase):
+    '''Test class for diffing subscriptions against a desired state'''
+
+    def testNoChanges(self):
+        '''An account already as desired needs no edit'''
+        desired = {
+            'http://a.example.com/rss': {'title': 'A', 'labels': ['news']},
+            'feed/http://b.example.com/rss': {'labels': ['tech', 'user/-/label/news']},
+            'http://c.example.com/rss': {}}
+        self.assertEqual(plan_subscriptions(SUBSCRIPTIONS, desired), [])
+
+    def testMinimalEdits(self):
+        '''Each differing feed gets one edit holding all of its changes'''
+        desired = {
+            'http://a.example.com/rss': {'title': 'Renamed', 'labels': ['tech']},
+            'http://b.example.com/rss': None,
+            'http://d.example.com/rss': {'title': 'D', 'labels': ['news']}}
+        plan = plan_subscriptions(SUBSCRIPTIONS, desired)
+        self.assertEqual(len(plan), 3)
+        self.assertTrue(SubscriptionEdit('feed/http://a.example.com/rss', 'edit', 'Renamed', ['tech'], ['news']) in plan)
+        self.assertTrue(SubscriptionEdit('feed/http://d.example.com/rss', 'subscribe', 'D', ['news']) in plan)
+        self.assertEqual(plan[-1], SubscriptionEdit('feed/http://c.example.com/rss', 'unsubscribe'))
+
+    def testWithoutPrune(self):
+        '''Feeds missing from the desired state are kept unless pruning'''
+        plan = plan_subscriptions(SUBSCRIPTIONS, {'http://c.example.com/rss': {'labels': ['misc']}}, prune=False)
+        self.assertEqual(plan, [SubscriptionEdit('feed/http://c.example.com/rss', 'edit', None, ['misc'])])
+
+
+class ListHandler(ReaderHandler):
+    '''Serves SUBSCRIPTIONS and a token, recording list requests and edits'''
+    edits = []
+    lists = []
+
+    def do_GET(self):
+        path = self.url_path()
+        if path.endswith('/list'):
+            ListHandler.lists.append(path.rsplit('/', 2)[1])
+        if path.endswith('/subscription/list'):
+            self.respond({'subscriptions': SUBSCRIPTIONS})
+        else:
+            self.respond('faketoken')
+
+    def do_POST(self):
+        ListHandler.edits.append(self.form())
+        self.respond('OK')
+
+
+class TestReconcile(ServerTestCase):
+    '''Test class for applying a desired state through the client'''
+    handler = ListHandler
+
+    def setUp(self):
+        '''Setups for each test'''
+        ListHandler.edits = []
+        ListHandler.lists = []
+        ServerTestCase.setUp(self)
+        self.client = self.new_client(cache=True)
+        self.desired = {
+            'http://a.example.com/rss': {'labels': ['news']},
+            'http://b.example.com/rss': {'labels': ['tech']},
+            'http://c.example.com/rss': {'title': 'Sea'},
+            'http://d.example.com/rss': {'labels': ['news']}}
+
+    def testDryRun(self):
+        '''A dry run returns the plan and sends no edit'''
+        plan = self.client.reconcile(self.desired, dry_run=True)
+        self.assertEqual([edit.feed_id for edit in plan], ['feed/http://b.example.com/rss',
+            'feed/http://c.example.com/rss', 'feed/http://d.example.com/rss'])
+        self.assertEqual(ListHandler.edits, [])
+
+    def testReconcile(self):
+        '''One request is sent per differing feed'''
+        report = self.client.reconcile(self.desired)
+        self.assertEqual(list(report), ['feed/http://b.example.com/rss',
+            'feed/http://c.example.com/rss', 'feed/http://d.example.com/rss'])
+        self.assertTrue(all(result.result == 'OK' for result in report.values()))
+        edits = dict((edit['s'][0], edit) for edit in ListHandler.edits)
+        self.assertEqual(len(edits), 3)
+        self.assertEqual(edits['feed/http://b.example.com/rss']['r'], ['user/-/label/news'])
+        self.assertEqual(edits['feed/http://c.example.com/rss']['t'], ['Sea'])
+        self.assertEqual(edits['feed/http://d.example.com/rss']['ac'], ['subscribe'])
+
+    def testWritesInvalidateLists(self):
+        '''Cached subscription and tag lists are refetched after the client's own writes'''
+        writes = [
+            lambda: self.client.subscribe_to_feed('D', 'http://d.example.com/rss'),
+            lambda: self.client.subscribe_to_feed(None, 'http://e.example.com/rss', quickAdd=True),
+            lambda: self.client.unsubscribe_from_feed('C', 'http://c.example.com/rss'),
+            lambda: self.client.add_label_to_feed('A', 'http://a.example.com/rss', 'tech'),
+            lambda: self.client.remove_label_from_feed('A', 'http://a.example.com/rss', 'news'),
+            lambda: self.client.edit_feed_title('B2', 'http://b.example.com/rss'),
+            lambda: self.client.delete_tag('news'),
+            lambda: self.client.edit_folder_or_tag('user/-/label/tech', True)]
+        self.client.get_subscription_list()
+        self.client.get_tag_list()
+        for write in writes:
+            ListHandler.lists = []
+            self.client.get_subscription_list()
+            self.client.get_tag_list()
+            self.assertEqual(ListHandler.lists, [])
+            write()
+            self.client.get_subscription_list()
+            self.client.get_tag_list()
+            self.assertEqual(ListHandler.lists, ['subscription', 'tag'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+import os
+import sys
+import threading
+
+# insert application path
+app_path = os.path.join(os.path.realpath(os.path.dirname(__file__)), '../')
+sys.path.insert(0, app_path)
+
+from tokenmanager import TokenManager
+
+
+class TestTokenManager(unittest.TestCase):
+    '''Test class for the edit token cache'''
+
+    def setUp(self):
+        '''Setups for each test'''
+        self.fetched = []
+        self.manager = TokenManager(self.fetch, ttl=60, refresh_margin=0)
+
+    def fetch(self):
+        self.fetched.append(True)
+        return 'token%s' % len(self.fetched)
+
+    def testTokenIsReused(self):
+        '''Cached token is reused until it expires'''
+        self.assertEqual(self.manager.get_token(), 'token1')
+        self.assertEqual(self.manager.get_token(), 'token1')
+        self.assertEqual(self.manager.stats['hits'], 1)
+        self.assertEqual(self.manager.stats['refreshes'], 1)
+
+    def testInvalidateFetchesNewToken(self):
+        '''Rejected token is replaced on next use'''
+        self.manager.get_token()
+        self.manager.invalidate()
+        self.assertEqual(self.manager.get_token(), 'token2')
+        self.assertEqual(self.manager.stats['rejections'], 1)
+
+    def testExpiredTokenIsRefreshed(self):
+        '''Expired token is fetched again'''
+        manager = TokenManager(self.fetch, ttl=0)
+        manager.get_token()
+        self.assertEqual(manager.get_token(), 'token2')
+
+    def testFailedBackgroundRefreshIsRetried(self):
+        '''A background refresh that fails does not stop the next one'''
+        def fetch():
+            self.fetched.append(True)
+            if len(self.fetched) > 1:
+                raise IOError('connection refused')
+            return 'token1'
+        threads = []
+        def spawn(target):
+            threads.append(threading.Thread(target=lambda: self.assertRaises(IOError, target)))
+            threads[-1].start()
+        manager = TokenManager(fetch, ttl=60, refresh_margin=60, spawn=spawn)
+        for i in range(3):
+            self.assertEqual(manager.get_token(), 'token1')
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(self.fetched), 3)
+        self.assertEqual(manager.stats['background_refreshes'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
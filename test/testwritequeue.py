@@ -0,0 +1,111 @@
+import unittest
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+# insert application path
+app_path = os.path.join(os.path.realpath(os.path.dirname(__file__)), '../')
+sys.path.insert(0, app_path)
+
+from writequeue import READ, WriteBehindQueue
+
+
+class FakeClient(object):
+    '''Records edit_tags_bulk calls, answering OK unless failing'''
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+
+    def edit_tags_bulk(self, items, add=None, remove=None):
+        self.calls.append((list(items), add, remove))
+        if self.fail:
+            raise IOError('connection refused')
+        return [([item[0] if isinstance(item, tuple) else item for item in items], 'OK')]
+
+
+class TestWriteBehindQueue(unittest.TestCase):
+    '''Test class for the write-behind queue'''
+
+    def setUp(self):
+        '''Setups for each test'''
+        self.path = tempfile.mkdtemp()
+        self.journal = os.path.join(self.path, 'writes.jsonl')
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def testOpposingEditsCancel(self):
+        '''Adding then removing a tag sends nothing'''
+        client = FakeClient()
+        queue = WriteBehindQueue(client, flush_interval=60)
+        queue.add('1', 'news')
+        queue.remove('1', 'user/01234/label/news')
+        queue.add('2', READ)
+        self.assertEqual(len(queue), 1)
+        self.assertEqual(queue.flush(), 0)
+        self.assertEqual(client.calls, [(['2'], READ, None)])
+        stats = queue.get_stats()
+        self.assertEqual((stats['queued'], stats['cancelled'], stats['sent'], stats['depth']), (3, 1, 1, 0))
+
+    def testFlushGroupsByTag(self):
+        '''One request is sent per tag and action'''
+        client = FakeClient()
+        queue = WriteBehindQueue(client, flush_interval=60)
+        queue.add('1', READ, 'feed/http://a.example.com/rss')
+        queue.add('2', READ)
+        queue.add('1', 'news')
+        queue.remove('3', 'news')
+        queue.flush()
+        self.assertEqual(client.calls, [
+            ([('1', 'feed/http://a.example.com/rss'), '2'], READ, None),
+            (['1'], 'user/-/label/news', None),
+            (['3'], None, 'user/-/label/news')])
+
+    def testFailedEditsStayQueued(self):
+        '''Edits are kept until a flush succeeds'''
+        client = FakeClient(fail=True)
+        queue = WriteBehindQueue(client, flush_interval=60)
+        queue.add('1', READ)
+        self.assertEqual(queue.flush(), 1)
+        self.assertEqual(queue.get_stats()['depth'], 1)
+        client.fail = False
+        self.assertEqual(queue.flush(), 0)
+        self.assertEqual(queue.get_stats()['depth'], 0)
+        self.assertEqual(len(client.calls), 2)
+
+    def testSizeTrigger(self):
+        '''The queue flushes in the background once max_pending are queued'''
+        client = FakeClient()
+        queue = WriteBehindQueue(client, max_pending=3, flush_interval=60)
+        for item_id in '123':
+            queue.add(item_id, READ)
+        for i in range(100):
+            if client.calls:
+                break
+            time.sleep(0.01)
+        self.assertEqual(client.calls, [(['1', '2', '3'], READ, None)])
+        self.assertTrue(queue.get_stats()['last_flush_latency'] is not None)
+        queue.close()
+
+    def testJournalReplay(self):
+        '''Edits queued before a crash are sent by the next queue'''
+        queue = WriteBehindQueue(FakeClient(), flush_interval=60, journal=self.journal)
+        queue.add('1', READ)
+        queue.add('2', 'news')
+        queue.remove('2', 'news')
+        # not flushed nor closed, as if the process died
+        client = FakeClient()
+        replayed = WriteBehindQueue(client, flush_interval=60, journal=self.journal)
+        self.assertEqual(len(replayed), 1)
+        self.assertEqual(replayed.close(), 0)
+        self.assertEqual(client.calls, [(['1'], READ, None)])
+        with open(self.journal) as f:
+            self.assertEqual(f.read(), '')
+        # stop the first queue before its journal is removed with the test directory
+        queue.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+'''Caching of the Google Reader edit token'''
+
+import threading
+from time import time
+from fanout import in_background
+from ratelimit import Coalescer
+
+
+class TokenManager(object):
+    '''
+    Caches the edit token required by every write request. The token is
+    reused until it is older than the configured ttl and is refreshed in the
+    background once it enters the refresh margin, so writes never wait on a
+    token fetch unless the cache is empty or expired.
+    '''
+    def __init__(self, fetch, ttl=1800, refresh_margin=300, then=None, spawn=None, share=None):
+        '''
+        fetch is a callable returning a new token string. then, spawn and
+        share are the owning client's continuation, background and call
+        sharing hooks so that asynchronous transports can be used, see
+        restClient._then
+        '''
+        self.__fetch = fetch
+        self.__then = then or (lambda result, callback: callback(result))
+        # a failed background refresh is ignored, the next get_token call
+        # fetches synchronously once the token has expired
+        self.__spawn = spawn or in_background
+        self.__share = share or Coalescer().do
+        self.__ttl = ttl
+        self.__refresh_margin = min(refresh_margin, ttl)
+        self.__token = None
+        self.__fetched_at = 0
+        self.__lock = threading.Lock()
+        self.__refreshing = False
+        self.stats = {
+            'hits': 0,
+            'refreshes': 0,
+            'background_refreshes': 0,
+            'rejections': 0}
+
+    def get_token(self):
+        '''Returns a valid token, fetching one only if none is cached'''
+        with self.__lock:
+            age = time() - self.__fetched_at
+            if self.__token is not None and age < self.__ttl:
+                self.stats['hits'] += 1
+                if age >= self.__ttl - self.__refresh_margin and not self.__refreshing:
+                    self.__refreshing = True
+                    self.__spawn(self.__background_refresh)
+                return self.__token
+        # concurrent writes finding the cache empty share one fetch
+        return self.__share('token', self.refresh)
+
+    def refresh(self):
+        '''Fetches and caches a new token'''
+        return self.__then(self.__fetch(), self.__store)
+
+    def invalidate(self):
+        '''Drops the cached token after the server rejected it'''
+        with self.__lock:
+            self.__token = None
+            self.stats['rejections'] += 1
+
+    def __store(self, token):
+        '''Caches a freshly fetched token'''
+        with self.__lock:
+            self.__token = token
+            self.__fetched_at = time()
+            self.__refreshing = False
+            self.stats['refreshes'] += 1
+        return token
+
+    def __background_refresh(self):
+        '''
+        Refreshes the token ahead of expiry. Whether it succeeds or fails the
+        next get_token call in the margin may start another; overlapping
+        refreshes share one fetch
+        '''
+        def count(token):
+            with self.__lock:
+                self.stats['background_refreshes'] += 1
+            return token
+        try:
+            return self.__then(self.__share('token', self.refresh), count)
+        finally:
+            with self.__lock:
+                self.__refreshing = False
@@ -0,0 +1,238 @@
+'''Write-behind queue of item tag edits'''
+
+import atexit
+import json
+import os
+import re
+import threading
+import weakref
+from collections import OrderedDict
+from time import time
+
+READ = 'user/-/state/com.google/read'
+STARRED = 'user/-/state/com.google/starred'
+
+_USER_PREFIX = re.compile(r'^user/\d+/')
+
+
+def _tag_id(tag):
+    '''Normalises a label name or tag id so that equal tags compare equal'''
+    if not tag.startswith('user/'):
+        return 'user/-/label/' + tag
+    return _USER_PREFIX.sub('user/-/', tag)
+
+
+def _close_at_exit(queue_ref):
+    '''Sends the edits of a queue never closed before the interpreter exits'''
+    queue = queue_ref()
+    if queue is not None:
+        queue.close()
+
+
+class WriteBehindQueue(object):
+    '''
+    Acknowledges item tag edits, eg read, starred or labels, at once and
+    sends them in the background through the client's edit_tags_bulk. An
+    edit undoing a queued one, such as removing a tag added since the last
+    flush, cancels it so neither is sent. Queued edits are flushed once
+    max_pending are queued or the oldest has waited flush_interval seconds,
+    one edit-tag request per tag and action per batch; edits that fail stay
+    queued for the next flush. journal names a file edits are appended to
+    as they are queued, replayed on start so a crash loses none; set fsync
+    to also survive power loss at the cost of a disk sync per edit. Call
+    close to send what is queued; a queue left open is closed when the
+    interpreter exits
+    '''
+    def __init__(self, client, max_pending=250, flush_interval=1.0, journal=None, fsync=False, clock=time):
+        self.__client = client
+        self.__max_pending = max_pending
+        self.__flush_interval = flush_interval
+        self.__journal_path = journal
+        self.__fsync = fsync
+        self.__clock = clock
+        self.__pending = OrderedDict()
+        self.__oldest = None
+        self.__lock = threading.Lock()
+        self.__flush_lock = threading.Lock()
+        self.__wake = threading.Event()
+        self.__thread = None
+        self.__closed = False
+        self.stats = {
+            'queued': 0,
+            'cancelled': 0,
+            'sent': 0,
+            'failed': 0,
+            'flushes': 0,
+            'last_flush_latency': None,
+            'max_flush_latency': 0.0,
+            'total_flush_latency': 0.0}
+        self.__journal = None
+        atexit.register(_close_at_exit, weakref.ref(self))
+        if journal is not None:
+            self.__replay()
+
+    def add(self, item_id, tag, stream_id=None):
+        '''Queues adding tag, a label name or tag id, to an item'''
+        return self.__queue(item_id, tag, True, stream_id)
+
+    def remove(self, item_id, tag, stream_id=None):
+        '''Queues removing tag from an item'''
+        return self.__queue(item_id, tag, False, stream_id)
+
+    def __len__(self):
+        with self.__lock:
+            return len(self.__pending)
+
+    def get_stats(self):
+        '''Returns the counters, the queue depth and flush latencies in seconds'''
+        with self.__lock:
+            stats = dict(self.stats)
+            stats['depth'] = len(self.__pending)
+        return stats
+
+    def flush(self):
+        '''Sends the queued edits now, returning how many failed and stay queued'''
+        with self.__flush_lock:
+            with self.__lock:
+                pending, self.__pending, self.__oldest = self.__pending, OrderedDict(), None
+            if not pending:
+                return 0
+            start = self.__clock()
+            groups = OrderedDict()
+            for (item_id, tag), (add, stream_id) in pending.items():
+                groups.setdefault((tag, add), []).append((item_id, stream_id) if stream_id else item_id)
+            failed = []
+            for (tag, add), items in groups.items():
+                try:
+                    results = self.__client.edit_tags_bulk(items,
+                        add=tag if add else None, remove=None if add else tag)
+                except Exception:
+                    results = [([item if not isinstance(item, tuple) else item[0] for item in items], None)]
+                for item_ids, response in results:
+                    if response != 'OK':
+                        failed.extend((item_id, tag) for item_id in item_ids)
+            latency = self.__clock() - start
+            with self.__lock:
+                for key in failed:
+                    self.__requeue(key, pending[key])
+                self.stats['sent'] += len(pending) - len(failed)
+                self.stats['failed'] += len(failed)
+                self.stats['flushes'] += 1
+                self.stats['last_flush_latency'] = latency
+                self.stats['max_flush_latency'] = max(self.stats['max_flush_latency'], latency)
+                self.stats['total_flush_latency'] += latency
+                self.__compact()
+            return len(failed)
+
+    def close(self):
+        '''Stops the background thread and flushes the queued edits'''
+        with self.__lock:
+            self.__closed = True
+        self.__wake.set()
+        if self.__thread is not None:
+            self.__thread.join()
+        failed = self.flush()
+        with self.__lock:
+            if self.__journal is not None:
+                self.__journal.close()
+                self.__journal = None
+        return failed
+
+    def __queue(self, item_id, tag, add, stream_id):
+        with self.__lock:
+            if self.__closed:
+                raise ValueError('The write queue is closed')
+            key = (item_id, _tag_id(tag))
+            if self.__journal is not None:
+                self.__journal.write(json.dumps([item_id, key[1], add, stream_id]) + '\n')
+                self.__journal.flush()
+                if self.__fsync:
+                    os.fsync(self.__journal.fileno())
+            self.stats['queued'] += 1
+            self.__apply(key, (add, stream_id))
+            self.__start()
+        self.__wake.set()
+        return True
+
+    def __start(self):
+        '''Starts the background thread on the first queued edit'''
+        if self.__thread is None:
+            self.__thread = threading.Thread(target=self.__run)
+            self.__thread.daemon = True
+            self.__thread.start()
+
+    def __apply(self, key, edit):
+        '''Queues edit, or cancels it against a queued opposite edit'''
+        queued = self.__pending.get(key)
+        if queued is not None and queued[0] != edit[0]:
+            del self.__pending[key]
+            self.stats['cancelled'] += 1
+        else:
+            self.__pending[key] = edit
+        if not self.__pending:
+            self.__oldest = None
+        elif self.__oldest is None:
+            self.__oldest = self.__clock()
+
+    def __requeue(self, key, edit):
+        '''Puts back a failed edit unless a later one replaced or cancelled it'''
+        queued = self.__pending.get(key)
+        if queued is None:
+            self.__pending[key] = edit
+            if self.__oldest is None:
+                self.__oldest = self.__clock()
+        elif queued[0] != edit[0]:
+            # the later edit undoes one the server never applied
+            del self.__pending[key]
+            self.stats['cancelled'] += 1
+
+    def __run(self):
+        '''Background thread flushing on the size and time triggers'''
+        while True:
+            with self.__lock:
+                if self.__closed:
+                    return
+                wait = None
+                due = len(self.__pending) >= self.__max_pending
+                if self.__oldest is not None:
+                    wait = max(0.0, self.__oldest + self.__flush_interval - self.__clock())
+                    due = due or wait == 0
+            if due:
+                if self.flush():
+                    # back off after a failure instead of retrying at once
+                    self.__wake.clear()
+                    self.__wake.wait(self.__flush_interval)
+                continue
+            self.__wake.wait(wait)
+            self.__wake.clear()
+
+    def __replay(self):
+        '''Queues the edits journaled by a previous process'''
+        if os.path.exists(self.__journal_path):
+            with open(self.__journal_path) as f:
+                for line in f:
+                    try:
+                        item_id, tag, add, stream_id = json.loads(line)
+                    except ValueError:
+                        # a line cut short by a crash
+                        continue
+                    self.__apply((item_id, tag), (add, stream_id))
+        with self.__lock:
+            self.__compact()
+            if self.__pending:
+                self.__start()
+
+    def __compact(self):
+        '''Rewrites the journal to hold only the queued edits'''
+        if self.__journal_path is None:
+            return
+        if self.__journal is not None:
+            self.__journal.close()
+        with open(self.__journal_path + '.tmp', 'w') as f:
+            for (item_id, tag), (add, stream_id) in self.__pending.items():
+                f.write(json.dumps([item_id, tag, add, stream_id]) + '\n')
+            if self.__fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.rename(self.__journal_path + '.tmp', self.__journal_path)
+        self.__journal = open(self.__journal_path, 'a')